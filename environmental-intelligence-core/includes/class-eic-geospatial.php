@@ -468,4 +468,108 @@ class EIC_Geospatial {
 
         return $post_id;
     }
+
+    /**
+     * Import NDJSON post batches written by the geospatial processor
+     * 
+     * Each batch is checked against the SHA-256 in its manifest entry and
+     * skipped if a batch with that hash was already imported, so a failed
+     * run can simply be repeated. Pass a subset of batch indexes to split
+     * the work across parallel processes (e.g. one WP-CLI call per range).
+     * 
+     * @param string     $manifest_path Path to the export manifest.json
+     * @param array|null $batch_indexes Batch indexes to import (default: all)
+     * @return array|WP_Error Per-batch result (post count, 'skipped' or WP_Error) keyed by index
+     */
+    public static function import_wordpress_batches( $manifest_path, $batch_indexes = null ) {
+        
+        if ( ! file_exists( $manifest_path ) ) {
+            return new WP_Error( 'file_not_found', __( 'Import manifest not found', 'env-intel-core' ) );
+        }
+
+        $manifest = json_decode( file_get_contents( $manifest_path ), true );
+
+        if ( json_last_error() !== JSON_ERROR_NONE || ! isset( $manifest['batches'] ) ) {
+            return new WP_Error( 'invalid_json', __( 'Invalid import manifest', 'env-intel-core' ) );
+        }
+
+        $export_dir = dirname( $manifest_path );
+        $results = array();
+
+        foreach ( $manifest['batches'] as $batch ) {
+            if ( null !== $batch_indexes && ! in_array( (int) $batch['index'], array_map( 'intval', $batch_indexes ), true ) ) {
+                continue;
+            }
+            $results[ $batch['index'] ] = self::import_wordpress_batch(
+                $export_dir . '/' . basename( $batch['file'] ),
+                $batch['sha256']
+            );
+        }
+
+        return $results;
+    }
+
+    /**
+     * Import one NDJSON batch of posts
+     * 
+     * Posts are matched to existing layers by _eic_feature_key and updated
+     * in place, so re-importing a partially imported batch is safe.
+     * 
+     * @param string $batch_path Path to the batch file
+     * @param string $expected_hash SHA-256 of the batch from the manifest
+     * @return int|string|WP_Error Number of posts imported, 'skipped' or error
+     */
+    public static function import_wordpress_batch( $batch_path, $expected_hash ) {
+        
+        // One option per batch hash, so parallel importers never overwrite each other
+        $done_option = 'eic_imported_batch_' . $expected_hash;
+        if ( get_option( $done_option ) ) {
+            return 'skipped';
+        }
+
+        if ( ! file_exists( $batch_path ) ) {
+            return new WP_Error( 'file_not_found', __( 'Import batch not found', 'env-intel-core' ) );
+        }
+
+        if ( hash_file( 'sha256', $batch_path ) !== $expected_hash ) {
+            return new WP_Error( 'hash_mismatch', __( 'Import batch does not match its manifest hash', 'env-intel-core' ) );
+        }
+
+        $handle = fopen( $batch_path, 'r' );
+        $imported = 0;
+
+        while ( ( $line = fgets( $handle ) ) !== false ) {
+            $post_data = json_decode( $line, true );
+            if ( ! is_array( $post_data ) ) {
+                fclose( $handle );
+                return new WP_Error( 'invalid_json', __( 'Invalid post in import batch', 'env-intel-core' ) );
+            }
+
+            if ( ! empty( $post_data['meta_input']['_eic_feature_key'] ) ) {
+                $existing = get_posts( array(
+                    'post_type' => 'environmental_layer',
+                    'post_status' => 'any',
+                    'posts_per_page' => 1,
+                    'fields' => 'ids',
+                    'meta_key' => '_eic_feature_key',
+                    'meta_value' => $post_data['meta_input']['_eic_feature_key']
+                ) );
+                if ( ! empty( $existing ) ) {
+                    $post_data['ID'] = $existing[0];
+                }
+            }
+
+            $post_id = wp_insert_post( $post_data, true );
+            if ( is_wp_error( $post_id ) ) {
+                fclose( $handle );
+                return $post_id;
+            }
+            $imported++;
+        }
+
+        fclose( $handle );
+        update_option( $done_option, time(), false );
+
+        return $imported;
+    }
 }
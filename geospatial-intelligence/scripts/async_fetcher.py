@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Async Fetcher
+Concurrent HTTP JSON fetching with per-host limits, keep-alive pooling and retries
+"""
+
+import asyncio
+import json
+import random
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp is optional; only the async fetch layer needs it
+    aiohttp = None
+
+
+class FetchError(Exception):
+    """Raised when a request still fails after all retries"""
+
+    def __init__(self, url: str, message: str, status: Optional[int] = None):
+        super().__init__(f"{url}: {message}")
+        self.url = url
+        self.status = status
+
+
+class AsyncFetcher:
+    """Fetch many JSON endpoints concurrently over pooled keep-alive connections"""
+
+    # Statuses worth retrying; everything else fails immediately
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, per_host_limit: int = 8, total_limit: int = 64,
+                 host_limits: Optional[Dict[str, int]] = None,
+                 timeout: float = 30.0, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 keepalive_timeout: float = 30.0, cache=None):
+        """
+        Args:
+            per_host_limit: Default maximum in-flight requests per host
+            total_limit: Maximum pooled connections across all hosts
+            host_limits: Per-host overrides, e.g. {'www.airnowapi.org': 2}
+            timeout: Total timeout per attempt in seconds
+            max_retries: Retries after the first attempt
+            backoff_base: First backoff delay in seconds, doubled per retry
+            backoff_max: Upper bound on a single backoff delay
+            keepalive_timeout: Seconds an idle pooled connection stays open
+            cache: Optional ResponseCache consulted before every request
+        """
+        if aiohttp is None:
+            raise ImportError("The async fetch layer requires aiohttp (pip install aiohttp)")
+
+        self.per_host_limit = per_host_limit
+        self.total_limit = total_limit
+        self.host_limits = dict(host_limits or {})
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.keepalive_timeout = keepalive_timeout
+        self.cache = cache
+
+        self._session = None
+        self._semaphores = {}
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0, 'bytes': 0}
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.total_limit,
+                                         keepalive_timeout=self.keepalive_timeout)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+        self._session = None
+
+    def _semaphore(self, url: str) -> asyncio.Semaphore:
+        """Concurrency limiter for the host serving url"""
+        host = urlsplit(url).netloc
+        if host not in self._semaphores:
+            limit = self.host_limits.get(host, self.per_host_limit)
+            self._semaphores[host] = asyncio.Semaphore(limit)
+        return self._semaphores[host]
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Delay before the given retry attempt (full jitter)"""
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        ceiling = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        return random.uniform(0, ceiling)
+
+    async def fetch_json(self, url: str, params: Optional[Dict] = None,
+                         source: Optional[str] = None) -> Any:
+        """
+        Fetch and decode a JSON document, retrying transient failures
+
+        Args:
+            url: Endpoint URL
+            params: Query string parameters
+            source: Data source name used for cache TTLs
+
+        Returns:
+            Decoded JSON payload
+
+        Raises:
+            FetchError: If the request fails after all retries
+        """
+        if self._session is None:
+            raise RuntimeError("AsyncFetcher must be used as an async context manager")
+
+        headers = {}
+        if self.cache is not None:
+            body = self.cache.fresh_body(source, url, params)
+            if body is not None:
+                return json.loads(body)
+            headers = self.cache.conditional_headers(url, params)
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            async with self._semaphore(url):
+                self.stats['requests'] += 1
+                try:
+                    async with self._session.get(url, params=params,
+                                                 headers=headers) as response:
+                        body = await response.read()
+                        self.stats['bytes'] += len(body)
+                        if response.status == 304 and self.cache is not None:
+                            cached = self.cache.not_modified(url, params)
+                            if cached is not None:
+                                return json.loads(cached)
+                            # Entry vanished; retry without validators
+                            headers = {}
+                            last_error = FetchError(url, "HTTP 304 without cached body", 304)
+                        elif response.status in self.RETRY_STATUSES:
+                            retry_after = response.headers.get('Retry-After')
+                            last_error = FetchError(url, f"HTTP {response.status}",
+                                                    response.status)
+                        elif response.status >= 400:
+                            self.stats['failures'] += 1
+                            raise FetchError(url, f"HTTP {response.status}", response.status)
+                        else:
+                            try:
+                                data = json.loads(body)
+                            except ValueError as e:
+                                self.stats['failures'] += 1
+                                raise FetchError(url, f"Invalid JSON: {e}", response.status)
+                            if self.cache is not None:
+                                self.cache.store(source, url, params, body,
+                                                 etag=response.headers.get('ETag'),
+                                                 last_modified=response.headers.get('Last-Modified'))
+                            return data
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    last_error = FetchError(url, str(e) or e.__class__.__name__)
+
+            if attempt < self.max_retries:
+                self.stats['retries'] += 1
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+
+        self.stats['failures'] += 1
+        raise last_error
+
+    async def fetch_many(self, requests: List[Tuple]) -> List[Any]:
+        """
+        Fetch many requests concurrently
+
+        Args:
+            requests: List of (url, params) or (url, params, source) tuples
+
+        Returns:
+            Results in request order; failed requests yield their FetchError
+        """
+        return await asyncio.gather(
+            *(self.fetch_json(*request) for request in requests),
+            return_exceptions=True
+        )
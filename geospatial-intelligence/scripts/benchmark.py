@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+Seeded statewide-scale synthetic layers and timings for the core operations
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from data_validation import DataValidator
+from environmental_data_processor import EnvironmentalDataProcessor
+from instrumentation import peak_rss_bytes
+from point_layer import PointLayer
+from spatial_analysis import SpatialAnalyzer
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# California bounding box (lat, lon)
+CALIFORNIA_BOUNDS = (32.53, 42.01, -124.41, -114.13)
+
+# Population centers features cluster around: (name, lat, lon, weight, spread in degrees)
+METRO_AREAS = (
+    ('Los Angeles', 34.05, -118.24, 0.34, 0.45),
+    ('San Francisco', 37.77, -122.42, 0.18, 0.35),
+    ('San Diego', 32.72, -117.16, 0.10, 0.25),
+    ('Sacramento', 38.58, -121.49, 0.08, 0.30),
+    ('Fresno', 36.74, -119.79, 0.07, 0.40),
+    ('Bakersfield', 35.37, -119.02, 0.05, 0.35),
+    ('Riverside', 33.95, -117.40, 0.08, 0.40),
+    ('Redding', 40.59, -122.39, 0.02, 0.50)
+)
+
+# Share of features scattered uniformly across the state
+RURAL_SHARE = 0.15
+
+AQI_CATEGORIES = ((50, 'Good'), (100, 'Moderate'), (150, 'Unhealthy for Sensitive Groups'),
+                  (200, 'Unhealthy'), (300, 'Very Unhealthy'))
+
+# Synthetic data is dated relative to this, so reports do not age
+SYNTHETIC_EPOCH = datetime(2025, 1, 1)
+
+
+def _synthetic_position(rng: random.Random) -> Tuple[str, float, float]:
+    """Metro-clustered position inside California; returns (area, lat, lon)"""
+    min_lat, max_lat, min_lon, max_lon = CALIFORNIA_BOUNDS
+    if rng.random() < RURAL_SHARE:
+        return 'Rural', rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon)
+    name, lat, lon, _, spread = rng.choices(METRO_AREAS, weights=[m[3] for m in METRO_AREAS])[0]
+    lat = min(max(rng.gauss(lat, spread), min_lat), max_lat)
+    lon = min(max(rng.gauss(lon, spread), min_lon), max_lon)
+    return name, lat, lon
+
+
+def synthetic_layer(kind: str, count: int, seed: int) -> List[Dict]:
+    """
+    Generate processor-style data points for one layer
+
+    Args:
+        kind: 'air_quality', 'water_quality' or 'superfund_sites'
+        count: Number of points
+        seed: Random seed; the same seed always yields the same layer
+
+    Returns:
+        List of data point dicts with latitude/longitude, as fetched
+    """
+    rng = random.Random(f"{kind}:{seed}")
+    points = []
+    for i in range(count):
+        area, lat, lon = _synthetic_position(rng)
+        timestamp = (SYNTHETIC_EPOCH + timedelta(minutes=rng.randrange(60 * 24 * 30))).isoformat()
+        if kind == 'air_quality':
+            aqi = int(rng.lognormvariate(4.0, 0.5))
+            points.append({
+                'location': f"{area} Station {i}",
+                'latitude': lat,
+                'longitude': lon,
+                'pm25': round(aqi * rng.uniform(0.3, 0.5), 1),
+                'pm10': round(aqi * rng.uniform(0.6, 0.9), 1),
+                'ozone': round(rng.uniform(0.02, 0.09), 3),
+                'aqi': aqi,
+                'category': next((label for limit, label in AQI_CATEGORIES if aqi <= limit),
+                                 'Hazardous'),
+                'timestamp': timestamp
+            })
+        elif kind == 'water_quality':
+            points.append({
+                'site_code': f"{11000000 + i:08d}",
+                'site_name': f"{area.upper()} CREEK SITE {i}",
+                'latitude': lat,
+                'longitude': lon,
+                'temperature': round(rng.uniform(8, 26), 1),
+                'conductivity': round(rng.uniform(100, 1500)),
+                'dissolved_oxygen': round(rng.uniform(3, 11), 2),
+                'timestamp': timestamp
+            })
+        elif kind == 'superfund_sites':
+            points.append({
+                'SITE_NAME': f"{area} Industrial Site {i}",
+                'EPA_ID': f"CAD{980000000 + i:09d}",
+                'NPL_STATUS': rng.choice(('Final', 'Proposed', 'Deleted')),
+                'SITE_STATUS': rng.choice(('Cleanup', 'Construction Complete', 'Investigation')),
+                'CITY': area,
+                'LATITUDE': lat,
+                'LONGITUDE': lon
+            })
+        else:
+            raise ValueError(f"Unknown layer kind: {kind}")
+    return points
+
+
+class BenchmarkSuite:
+    """Time the platform's core operations over synthetic layers of several sizes"""
+
+    def __init__(self, sizes=DEFAULT_SIZES, seed: int = 42, queries: int = 1000,
+                 repeat: int = 3, measure_memory: bool = True, engine: str = 'index'):
+        """
+        Args:
+            sizes: Layer sizes (points per layer) to benchmark
+            seed: Seed for every synthetic layer
+            queries: Query locations for per-location operations
+            repeat: Timed runs per case; the fastest is reported
+            measure_memory: Also run each case once under tracemalloc
+            engine: SpatialAnalyzer engine
+        """
+        self.sizes = list(sizes)
+        self.seed = seed
+        self.queries = queries
+        self.repeat = max(1, repeat)
+        self.measure_memory = measure_memory
+        self.engine = engine
+        self.results: List[Dict] = []
+
+    def run(self, cases: Optional[List[str]] = None) -> Dict:
+        """
+        Run every case (or the named ones) at every size
+
+        Returns:
+            Report dict with environment metadata and one result per case and size
+        """
+        started = time.perf_counter()
+        for size in self.sizes:
+            for name, operations, fn in self._cases(size):
+                if cases and name not in cases:
+                    continue
+                seconds, peak = self._measure(fn)
+                result = {
+                    'case': name,
+                    'size': size,
+                    'operations': operations,
+                    'seconds': round(seconds, 6),
+                    'throughput_per_s': round(operations / seconds, 2) if seconds > 0 else None,
+                    'peak_memory_bytes': peak
+                }
+                self.results.append(result)
+                print(f"  {name:<28} n={size:<7} {seconds:9.4f}s "
+                      f"{result['throughput_per_s'] or 0:14,.0f} ops/s"
+                      + (f" {peak / 1e6:9.1f} MB" if peak is not None else ""))
+
+        return {
+            'generated_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': self.seed,
+            'queries': self.queries,
+            'repeat': self.repeat,
+            'engine': self.engine,
+            'total_seconds': round(time.perf_counter() - started, 3),
+            'max_rss_bytes': peak_rss_bytes(),
+            'results': self.results
+        }
+
+    def _measure(self, fn: Callable) -> Tuple[float, Optional[int]]:
+        """Fastest of self.repeat runs, and the peak traced allocation of one more"""
+        best = float('inf')
+        for _ in range(self.repeat):
+            gc.collect()
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+
+        peak = None
+        if self.measure_memory:
+            gc.collect()
+            tracemalloc.start()
+            try:
+                fn()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        return best, peak
+
+    def _cases(self, size: int):
+        """Yield (case name, operations per run, callable) for one size"""
+        processor = EnvironmentalDataProcessor(output_dir=tempfile.gettempdir())
+        analyzer = SpatialAnalyzer(engine=self.engine)
+        validator = DataValidator()
+
+        # Layers are loaded the way spatial_analysis.py loads them
+        air_points = synthetic_layer('air_quality', size, self.seed)
+        air_geojson = processor.generate_geojson(air_points, 'air_quality')
+        superfund = PointLayer.from_features(processor.iter_geojson_features(
+            synthetic_layer('superfund_sites', size, self.seed)))
+        water = PointLayer.from_features(processor.iter_geojson_features(
+            synthetic_layer('water_quality', size, self.seed)))
+        air = PointLayer.from_features(air_geojson['features'])
+        locations = PointLayer.from_features(processor.iter_geojson_features(
+            synthetic_layer('air_quality', self.queries, self.seed + 1)))
+
+        coords = [(p['latitude'], p['longitude']) for p in air_points]
+        pairs = list(zip(coords, coords[1:] + coords[:1]))
+
+        def haversine():
+            for (lat1, lon1), (lat2, lon2) in pairs:
+                analyzer.haversine_distance(lat1, lon1, lat2, lon2)
+        yield 'haversine_distance', len(pairs), haversine
+
+        # Index construction is timed on its own; later cases reuse the cache
+        yield 'build_index', size, lambda: analyzer.build_index(superfund)
+        for layer in (superfund, air, water):
+            analyzer.nearest_neighbor(locations[0], layer)
+
+        def nearest():
+            for location in locations:
+                analyzer.nearest_neighbor(location, superfund)
+        yield 'nearest_neighbor', len(locations), nearest
+
+        def buffer():
+            for location in locations:
+                analyzer.buffer_analysis(location, 5.0, water)
+        yield 'buffer_analysis', len(locations), buffer
+
+        def score():
+            for location in locations:
+                analyzer.calculate_ej_risk_score(location, superfund, air, water)
+        yield 'calculate_ej_risk_score', len(locations), score
+
+        yield 'generate_geojson', size, lambda: processor.generate_geojson(air_points, 'air_quality')
+        yield ('generate_wordpress_import', size,
+               lambda: processor.generate_wordpress_import(air_geojson))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'air_quality.geojson')
+            with open(path, 'w') as f:
+                json.dump(air_geojson, f)
+
+            def quality_report():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    validator.generate_quality_report([path])
+            yield 'generate_quality_report', size, quality_report
+
+
+def compare_to_baseline(report: Dict, baseline: Dict, time_tolerance: float = 0.25,
+                        memory_tolerance: float = 0.25,
+                        min_seconds: float = 0.005) -> List[Dict]:
+    """
+    Find cases that got slower or hungrier than a stored baseline
+
+    Args:
+        report: Report from BenchmarkSuite.run
+        baseline: Earlier report to compare against
+        time_tolerance: Allowed fractional increase in seconds
+        memory_tolerance: Allowed fractional increase in peak memory
+        min_seconds: Slowdowns smaller than this are timer noise, not regressions
+
+    Returns:
+        List of regressions (case, size, metric, baseline, current, change)
+    """
+    previous = {(r['case'], r['size']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        old = previous.get((result['case'], result['size']))
+        if old is None:
+            continue
+        for metric, tolerance in (('seconds', time_tolerance),
+                                  ('peak_memory_bytes', memory_tolerance)):
+            before, after = old.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            if metric == 'seconds' and after - before < min_seconds:
+                continue
+            change = after / before - 1
+            if change > tolerance:
+                regressions.append({
+                    'case': result['case'],
+                    'size': result['size'],
+                    'metric': metric,
+                    'baseline': before,
+                    'current': after,
+                    'change': round(change, 3)
+                })
+    return regressions
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='ThrivingRoots Benchmark Suite')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='Points per synthetic layer')
+    parser.add_argument('--seed', type=int, default=42, help='Synthetic data seed')
+    parser.add_argument('--queries', type=int, default=1000,
+                        help='Query locations for nearest, buffer and scoring cases')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Timed runs per case (the fastest is reported)')
+    parser.add_argument('--engine', default='index', choices=SpatialAnalyzer.ENGINES,
+                        help='SpatialAnalyzer engine')
+    parser.add_argument('--cases', nargs='+', default=None, help='Only run these cases')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip the tracemalloc peak-memory run of each case')
+    parser.add_argument('--output', default='../outputs/benchmark_results.json',
+                        help='Where to write the results')
+    parser.add_argument('--baseline', default='../outputs/benchmark_baseline.json',
+                        help='Baseline results to compare against')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed fractional slowdown or memory growth before flagging')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ThrivingRoots Benchmark Suite")
+    print("=" * 60)
+    print(f"\nSizes: {args.sizes}, seed {args.seed}, {args.queries} queries, "
+          f"best of {args.repeat}\n")
+
+    suite = BenchmarkSuite(args.sizes, seed=args.seed, queries=args.queries,
+                           repeat=args.repeat, measure_memory=not args.no_memory,
+                           engine=args.engine)
+    report = suite.run(args.cases)
+
+    regressions = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance, args.tolerance)
+        report['baseline'] = {'path': args.baseline, 'generated_at': baseline.get('generated_at'),
+                              'tolerance': args.tolerance, 'regressions': regressions}
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline: {args.baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for r in regressions:
+            print(f"  {r['case']} n={r['size']} {r['metric']}: "
+                  f"{r['baseline']} -> {r['current']} (+{r['change']:.0%})")
+        sys.exit(1)
+    if 'baseline' in report:
+        print("\nNo regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,17 +4,34 @@ Data Validation and Quality Assurance
 Validates geospatial data integrity and generates quality reports
 """
 
+import argparse
 import json
-import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+from geojson_stream import GeoJSONStreamReader
+from instrumentation import Instrumentation, from_args, timed, write_reports
+from provenance import CollectionHasher, canonical_hash, file_hash
+
+try:
+    import layer_store
+except ImportError:  # NumPy is optional; only columnar layers need it
+    layer_store = None
 
 
 class DataValidator:
     """Validate and ensure quality of geospatial environmental data"""
     
-    def __init__(self):
+    def __init__(self, instrumentation: Instrumentation = None):
+        """
+        Args:
+            instrumentation: Collects stage timings and counters (disabled by default)
+        """
         self.validation_results = []
+        self.metrics = instrumentation or Instrumentation(enabled=False)
     
     def validate_geojson(self, geojson_data: Dict) -> Dict:
         """
@@ -236,9 +253,8 @@ class DataValidator:
             }
     
     def generate_data_hash(self, data: Any) -> str:
-        """Generate SHA-256 hash for data provenance"""
-        data_string = json.dumps(data, sort_keys=True)
-        return hashlib.sha256(data_string.encode()).hexdigest()
+        """Generate SHA-256 hash for data provenance (see provenance.py)"""
+        return canonical_hash(data)
     
     def validate_spatial_extent(self, geojson_data: Dict, 
                                expected_bounds: Dict = None) -> Dict:
@@ -303,58 +319,162 @@ class DataValidator:
         
         return result
     
-    def generate_quality_report(self, geojson_files: List[str]) -> Dict:
+    def load_layer(self, filepath: str) -> Dict:
+        """
+        Load a GeoJSON file or a columnar layer directory as a FeatureCollection
+        
+        Args:
+            filepath: GeoJSON file path or columnar layer directory
+        
+        Returns:
+            GeoJSON FeatureCollection
+        """
+        if layer_store is not None and layer_store.is_columnar_layer(filepath):
+            return layer_store.ColumnarLayer(filepath).to_geojson()
+        with open(filepath, 'r') as f:
+            return json.load(f)
+    
+    def layer_events(self, filepath: str) -> Iterator[Tuple[str, Any, Any]]:
+        """
+        Stream a GeoJSON file or columnar layer as parse events
+        
+        Yields the same events as GeoJSONStreamReader.events(); columnar
+        layers are presented as the FeatureCollection load_layer returns.
+        """
+        if layer_store is not None and layer_store.is_columnar_layer(filepath):
+            layer = layer_store.ColumnarLayer(filepath)
+            yield 'member', 'type', 'FeatureCollection'
+            yield 'member', 'metadata', dict(layer.metadata)
+            yield 'begin', 'features', None
+            for index, feature in enumerate(layer.iter_features()):
+                yield 'feature', index, feature
+            return
+        yield from GeoJSONStreamReader(filepath).events()
+    
+    @timed('validate.layer')
+    def validate_layer(self, filepath: str) -> Dict:
+        """
+        Validate, profile and hash a layer in a single streaming pass
+        
+        Structural errors, property completeness, spatial extent and the
+        provenance hash are accumulated feature by feature, so the file is
+        never loaded whole. The results equal validate_geojson,
+        check_data_consistency, check_data_freshness,
+        validate_spatial_extent and generate_data_hash on the loaded
+        document. Documents that are not streamable FeatureCollections
+        are loaded and checked with those methods instead.
+        
+        Args:
+            filepath: GeoJSON file path or columnar layer directory
+        
+        Returns:
+            Dict with validation, consistency, freshness, spatial_extent
+            and data_hash
+        
+        Raises:
+            The first exception the separate checks would raise, in the
+            same order, for malformed features
+        """
+        scan = _FeatureScan(self)
+        digest, members, late_keys = _hash_document(self.layer_events(filepath), scan)
+        
+        if members.get('type') != 'FeatureCollection' or not scan.has_features_array:
+            return self.validate_document(self.load_layer(filepath))
+        
+        if late_keys:
+            # Members sorting before "features" appeared after the features
+            # array; hash again now that their values are known
+            digest, _, _ = _hash_document(self.layer_events(filepath), None, members)
+        
+        return scan.results(members, digest)
+    
+    def validate_document(self, geojson_data: Dict) -> Dict:
+        """
+        Run every check on a GeoJSON document already in memory
+        
+        Args:
+            geojson_data: GeoJSON document
+        
+        Returns:
+            Dict with validation, consistency, freshness, spatial_extent
+            and data_hash, as validate_layer returns for a file
+        """
+        return {
+            'validation': self.validate_geojson(geojson_data),
+            'consistency': self.check_data_consistency(geojson_data),
+            'freshness': self.check_data_freshness(geojson_data),
+            'spatial_extent': self.validate_spatial_extent(geojson_data),
+            'data_hash': self.generate_data_hash(geojson_data)
+        }
+    
+    @timed('validate.report')
+    def generate_quality_report(self, geojson_files: List[str], workers: int = 1,
+                                cache: 'QualityReportCache' = None) -> Dict:
         """
         Generate comprehensive quality report for multiple files
         
         Args:
-            geojson_files: List of GeoJSON file paths
+            geojson_files: List of GeoJSON file paths or columnar layer directories
+            workers: Number of worker processes; files are validated
+                concurrently when greater than 1
+            cache: Reuse reports of unchanged files from this cache and
+                store new ones in it (the caller saves it)
         
         Returns:
             Comprehensive quality report
         """
+        # Unchanged files reuse their cached report; the rest are validated
+        file_reports = {}
+        pending = []
+        for filepath in geojson_files:
+            cached = cache.lookup(filepath) if cache is not None else None
+            if cached is not None:
+                file_reports[filepath] = self._refresh_cached_report(cached)
+            elif filepath not in pending:
+                pending.append(filepath)
+        
+        tasks = [(filepath, cache is not None) for filepath in pending]
+        if workers and workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_validate_file, tasks))
+        else:
+            results = [_validate_file(task) for task in tasks]
+        
+        self.metrics.count('report_cache_hits', len(file_reports))
+        for filepath, (file_report, timings, fingerprint) in zip(pending, results):
+            # Stages may have run in worker processes; record their timings here
+            for stage, seconds in timings.items():
+                self.metrics.record(f'validate.file.{stage}', seconds)
+            self.metrics.count('files_validated')
+            if 'error' not in file_report:
+                self.metrics.count('features_validated',
+                                   file_report['consistency'].get('total_features', 0))
+                file_report['quality_score'] = self._quality_score(file_report)
+                if fingerprint is not None:
+                    cache.store(filepath, file_report, timings, *fingerprint)
+            file_reports[filepath] = file_report
+        
+        report = self.summarize_reports([file_reports[filepath] for filepath in geojson_files])
+        if cache is not None:
+            report['cache'] = dict(cache.stats)
+        return report
+    
+    def summarize_reports(self, file_reports: List[Dict]) -> Dict:
+        """
+        Assemble per-file reports into a quality report
+        
+        Args:
+            file_reports: One report per file, with quality_score set
+        
+        Returns:
+            Quality report with file_reports and overall statistics
+        """
         report = {
             'generated_at': datetime.now().isoformat(),
-            'files_checked': len(geojson_files),
-            'file_reports': []
+            'files_checked': len(file_reports),
+            'file_reports': [dict(file_report) for file_report in file_reports]
         }
         
-        for filepath in geojson_files:
-            try:
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-                
-                file_report = {
-                    'file': filepath,
-                    'validation': self.validate_geojson(data),
-                    'consistency': self.check_data_consistency(data),
-                    'freshness': self.check_data_freshness(data),
-                    'spatial_extent': self.validate_spatial_extent(data),
-                    'data_hash': self.generate_data_hash(data)
-                }
-                
-                # Calculate overall quality score
-                quality_score = 0
-                if file_report['validation']['valid']:
-                    quality_score += 40
-                
-                completeness = file_report['consistency'].get('completeness_score', 0)
-                quality_score += (completeness / 100) * 30
-                
-                if file_report['freshness']['fresh']:
-                    quality_score += 30
-                
-                file_report['quality_score'] = round(quality_score, 2)
-                
-                report['file_reports'].append(file_report)
-                
-            except Exception as e:
-                report['file_reports'].append({
-                    'file': filepath,
-                    'error': str(e),
-                    'quality_score': 0
-                })
-        
         # Calculate overall statistics
         valid_reports = [r for r in report['file_reports'] if 'error' not in r]
         if valid_reports:
@@ -365,18 +485,326 @@ class DataValidator:
             }
         
         return report
+    
+    def _quality_score(self, file_report: Dict) -> float:
+        """Overall quality score of a file report"""
+        quality_score = 0
+        if file_report['validation']['valid']:
+            quality_score += 40
+        
+        completeness = file_report['consistency'].get('completeness_score', 0)
+        quality_score += (completeness / 100) * 30
+        
+        if file_report['freshness']['fresh']:
+            quality_score += 30
+        
+        return round(quality_score, 2)
+    
+    def _refresh_cached_report(self, file_report: Dict) -> Dict:
+        """Recompute the time-dependent parts of a cached file report"""
+        file_report = dict(file_report)
+        generated_at = file_report['freshness'].get('generated_at')
+        if generated_at is not None:
+            # Age is relative to now; everything else depends only on content
+            max_age_days = file_report['freshness'].get('max_age_days', 30)
+            file_report['freshness'] = self.check_data_freshness(
+                {'metadata': {'generated_at': generated_at}}, max_age_days)
+            file_report['quality_score'] = self._quality_score(file_report)
+        return file_report
+
+
+def _validate_file(task: Tuple[str, bool]) -> Tuple[Dict, Dict, Optional[Tuple]]:
+    """
+    Validate one file, possibly in a worker process
+    
+    Args:
+        task: (file path, whether to fingerprint the file for the cache)
+    
+    Returns:
+        Tuple of (file report, stage timings in seconds, and
+        (size, mtime, content hash) taken before validation or None)
+    """
+    filepath, fingerprint_file = task
+    timings = {}
+    fingerprint = None
+    try:
+        if fingerprint_file:
+            # Fingerprint first so a file changed mid-run is not cached as current
+            start = time.perf_counter()
+            size, mtime = _file_fingerprint(filepath)
+            content_hash = file_hash(filepath)
+            timings['content_hash'] = round(time.perf_counter() - start, 6)
+            fingerprint = (size, mtime, content_hash)
+        
+        start = time.perf_counter()
+        file_report = {'file': filepath}
+        file_report.update(DataValidator().validate_layer(filepath))
+        timings['validate'] = round(time.perf_counter() - start, 6)
+    except Exception as e:
+        file_report = {'file': filepath, 'error': str(e), 'quality_score': 0}
+    return file_report, timings, fingerprint
+
+
+def _file_fingerprint(filepath: str) -> Tuple[int, float]:
+    """(size, mtime) of a file, or totals/latest over a layer directory"""
+    if not os.path.isdir(filepath):
+        stat = os.stat(filepath)
+        return stat.st_size, stat.st_mtime
+    size, mtime = 0, os.stat(filepath).st_mtime
+    for name in sorted(os.listdir(filepath)):
+        stat = os.stat(os.path.join(filepath, name))
+        size += stat.st_size
+        mtime = max(mtime, stat.st_mtime)
+    return size, mtime
+
+
+class QualityReportCache:
+    """
+    Per-file quality reports keyed by size, mtime and content hash
+    
+    A file whose size and mtime match its entry reuses the cached report
+    without being read. If only the mtime changed, the raw bytes are
+    hashed and the report is reused when the content is identical. Each
+    entry also records how long its stages took.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: JSON file holding the cache
+        """
+        self.path = path
+        self.entries = {}
+        self.stats = {'hits': 0, 'rehashed_hits': 0, 'misses': 0}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.entries = json.load(f).get('entries', {})
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable quality report cache {path}: {e}")
+    
+    def lookup(self, filepath: str) -> Optional[Dict]:
+        """Cached file report if the file is unchanged, else None"""
+        entry = self.entries.get(filepath)
+        try:
+            size, mtime = _file_fingerprint(filepath)
+        except OSError:
+            self.stats['misses'] += 1
+            return None
+        
+        if entry is not None and entry['size'] == size:
+            if entry['mtime'] == mtime:
+                self.stats['hits'] += 1
+                return entry['file_report']
+            start = time.perf_counter()
+            content_hash = file_hash(filepath)
+            entry['timings']['content_hash'] = round(time.perf_counter() - start, 6)
+            if content_hash == entry['content_hash']:
+                entry['mtime'] = mtime
+                self.stats['rehashed_hits'] += 1
+                return entry['file_report']
+        
+        self.stats['misses'] += 1
+        return None
+    
+    def store(self, filepath: str, file_report: Dict, timings: Dict,
+              size: int, mtime: float, content_hash: str):
+        """Record a freshly computed file report and its fingerprint"""
+        self.entries[filepath] = {
+            'size': size,
+            'mtime': mtime,
+            'content_hash': content_hash,
+            'file_report': file_report,
+            'timings': timings,
+            'cached_at': datetime.now().isoformat()
+        }
+    
+    def save(self):
+        """Write the cache atomically"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'entries': self.entries}, f)
+        os.replace(tmp_path, self.path)
+
+
+class _FeatureScan:
+    """
+    Per-feature accumulators behind DataValidator.validate_layer
+    
+    Each check runs the same per-feature code as its DataValidator
+    counterpart. A check that raises stops accumulating and re-raises
+    from results(), in the order generate_quality_report runs the checks.
+    """
+    
+    def __init__(self, validator: DataValidator):
+        self.validator = validator
+        self.has_features_array = False
+        self.total_features = 0
+        self.feature_errors = []
+        self.property_counts = {}
+        self.lons = []
+        self.lats = []
+        self.failures = {}  # check name -> first exception
+    
+    def add(self, index: int, feature: Any):
+        """Accumulate one feature into every check"""
+        self.total_features += 1
+        
+        if 'validation' not in self.failures:
+            try:
+                errors = self.validator._validate_feature(feature)
+                if errors:
+                    self.feature_errors.append(f'Feature {index}: {", ".join(errors)}')
+            except Exception as e:
+                self.failures['validation'] = e
+        
+        if 'consistency' not in self.failures:
+            try:
+                props = feature.get('properties', {})
+                for key in props.keys():
+                    self.property_counts[key] = self.property_counts.get(key, 0) + 1
+            except Exception as e:
+                self.failures['consistency'] = e
+        
+        if 'spatial_extent' not in self.failures:
+            try:
+                geom = feature.get('geometry', {})
+                if geom.get('type') == 'Point':
+                    coords = geom.get('coordinates', [])
+                    if len(coords) >= 2:
+                        self.lons.append(coords[0])
+                        self.lats.append(coords[1])
+            except Exception as e:
+                self.failures['spatial_extent'] = e
+    
+    def results(self, members: Dict, data_hash: str) -> Dict:
+        """Assemble the report fields for a streamed FeatureCollection"""
+        for check in ('validation', 'consistency', 'spatial_extent'):
+            if check in self.failures:
+                raise self.failures[check]
+        
+        warnings = []
+        if 'crs' in members:
+            warnings.append('CRS field present (deprecated in GeoJSON spec)')
+        validation = {
+            'valid': len(self.feature_errors) == 0,
+            'errors': list(self.feature_errors),
+            'warnings': warnings,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        if not self.total_features:
+            consistency = {'error': 'No features found'}
+            spatial_extent = {'error': 'No features found'}
+        else:
+            property_completeness = {
+                key: (count / self.total_features) * 100
+                for key, count in self.property_counts.items()
+            }
+            consistency = {
+                'total_features': self.total_features,
+                'unique_properties': len(property_completeness),
+                'property_completeness': property_completeness,
+                'incomplete_properties': {
+                    key: pct for key, pct in property_completeness.items() if pct < 100
+                },
+                'completeness_score': sum(property_completeness.values()) / len(property_completeness) if property_completeness else 0
+            }
+            spatial_extent = self._extent()
+        
+        return {
+            'validation': validation,
+            'consistency': consistency,
+            'freshness': self.validator.check_data_freshness(members),
+            'spatial_extent': spatial_extent,
+            'data_hash': data_hash
+        }
+    
+    def _extent(self) -> Dict:
+        """Bounds and center of the Point features"""
+        if not self.lons:
+            return {'error': 'No valid coordinates found'}
+        actual_bounds = {
+            'min_lon': min(self.lons),
+            'max_lon': max(self.lons),
+            'min_lat': min(self.lats),
+            'max_lat': max(self.lats)
+        }
+        return {
+            'actual_bounds': actual_bounds,
+            'center': {
+                'lon': (actual_bounds['min_lon'] + actual_bounds['max_lon']) / 2,
+                'lat': (actual_bounds['min_lat'] + actual_bounds['max_lat']) / 2
+            }
+        }
+
+
+def _hash_document(events: Iterator[Tuple[str, Any, Any]], scan: _FeatureScan = None,
+                   leading: Dict = None) -> Tuple[Optional[str], Dict, bool]:
+    """
+    Hash a streamed document exactly as generate_data_hash would
+    
+    With sorted keys, members before "features" must be hashed before the
+    features themselves. Members seen before the array are used; a member
+    sorting before "features" that appears after the array sets late_keys,
+    and the caller hashes again passing all members as leading.
+    
+    Args:
+        events: Events from DataValidator.layer_events
+        scan: Feature accumulator fed during the pass (optional)
+        leading: Members known in advance from an earlier pass
+    
+    Returns:
+        Tuple of (hex digest or None without a features array, top-level
+        members, late_keys)
+    """
+    hasher = None
+    members = {}
+    late_keys = False
+    
+    for kind, key, value in events:
+        if kind == 'member':
+            members[key] = value
+            if hasher is not None and key < 'features' and leading is None:
+                late_keys = True
+        elif kind == 'begin':
+            hasher = CollectionHasher(leading if leading is not None else members)
+            if scan is not None:
+                scan.has_features_array = True
+        else:
+            hasher.add_feature(value)
+            if scan is not None:
+                scan.add(key, value)
+    
+    digest = hasher.finish(members) if hasher is not None else None
+    return digest, members, late_keys
 
 
 def main():
     """Main execution function"""
+    parser = argparse.ArgumentParser(description='ThrivingRoots Data Validation & Quality Assurance')
+    parser.add_argument('files', nargs='*',
+                        help='GeoJSON files or columnar layer directories (default: the California layers)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes validating files concurrently')
+    parser.add_argument('--cache-file', default=None,
+                        help='Reuse reports of unchanged files from this JSON cache')
+    parser.add_argument('--metrics', default=None,
+                        help='Write a JSON run report (stage timings, counters, peak RSS) here')
+    parser.add_argument('--prometheus', default=None,
+                        help='Write the run report in Prometheus text format here')
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("ThrivingRoots Data Validation & Quality Assurance")
     print("=" * 60)
     
-    validator = DataValidator()
+    metrics = from_args(args.metrics, args.prometheus)
+    validator = DataValidator(instrumentation=metrics)
+    cache = QualityReportCache(args.cache_file) if args.cache_file else None
     
     # List of files to validate
-    geojson_files = [
+    geojson_files = args.files or [
         '../outputs/california_air_quality.geojson',
         '../outputs/california_water_quality.geojson',
         '../outputs/california_superfund_sites.geojson'
@@ -385,7 +813,11 @@ def main():
     print("\nValidating GeoJSON files...")
     
     # Generate comprehensive report
-    quality_report = validator.generate_quality_report(geojson_files)
+    quality_report = validator.generate_quality_report(geojson_files, workers=args.workers,
+                                                       cache=cache)
+    if cache is not None:
+        cache.save()
+        print(f"Report cache: {cache.stats}")
     
     # Display results
     print(f"\n{'='*60}")
@@ -438,12 +870,14 @@ def main():
     
     # Save report
     report_path = '../outputs/quality_report.json'
-    with open(report_path, 'w') as f:
-        json.dump(quality_report, f, indent=2)
+    with metrics.timer('write.json'):
+        with open(report_path, 'w') as f:
+            json.dump(quality_report, f, indent=2)
     
     print(f"\n{'='*60}")
     print(f"Full report saved: {report_path}")
     print(f"{'='*60}\n")
+    write_reports(metrics, args.metrics, args.prometheus, 'data_validation')
 
 
 if __name__ == '__main__':
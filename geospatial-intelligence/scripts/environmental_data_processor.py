@@ -4,23 +4,101 @@ Environmental Data Processor
 Processes environmental data from EPA and USGS sources for ThrivingRoots platform
 """
 
+import argparse
+import asyncio
 import json
 import hashlib
+import os
 from datetime import datetime
 import requests
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterable, Iterator
+
+from async_fetcher import AsyncFetcher
+from geojson_stream import GeoJSONStreamWriter
+from http_cache import ResponseCache
+from instrumentation import Instrumentation, from_args, timed, write_reports
+from incremental import LayerDelta, LayerManifest, unique_feature_key
+from measurement_store import MeasurementStore
+from provenance import canonical_hash, hash_collection, merkle_root
+
+try:
+    import layer_store
+except ImportError:  # NumPy is optional; only columnar layer output needs it
+    layer_store = None
 
 class EnvironmentalDataProcessor:
     """Process and integrate environmental data from multiple sources"""
     
-    def __init__(self, output_dir='../outputs'):
+    def __init__(self, output_dir='../outputs', cache_dir=None, cache_ttls=None,
+                 cache_max_bytes=256 * 1024 * 1024, instrumentation: Instrumentation = None):
+        """
+        Args:
+            output_dir: Directory for generated files
+            cache_dir: Enables the on-disk response cache when set
+            cache_ttls: Per-source TTLs in seconds, keyed like data_sources
+            cache_max_bytes: Maximum compressed cache size before LRU eviction
+            instrumentation: Collects stage timings and counters (disabled by default)
+        """
         self.output_dir = output_dir
+        self.metrics = instrumentation or Instrumentation(enabled=False)
         self.data_sources = {
             'epa_air_quality': 'https://www.airnowapi.org/aq/observation/zipCode/current/',
             'usgs_water': 'https://waterservices.usgs.gov/nwis/iv/',
             'epa_superfund': 'https://enviro.epa.gov/enviro/efservice/'
         }
+        self.cache = None
+        if cache_dir:
+            self.cache = ResponseCache(cache_dir, source_ttls=cache_ttls,
+                                       max_bytes=cache_max_bytes)
+    
+    def _get_json(self, source: str, url: str, params: Dict = None, timeout: float = 30) -> Any:
+        """
+        GET a JSON document, going through the response cache when enabled
+        
+        Fresh cache entries are returned without a request; stale ones are
+        revalidated with a conditional GET.
+        """
+        if self.cache is None:
+            response = requests.get(url, params=params, timeout=timeout)
+            self._count_response(response)
+            response.raise_for_status()
+            return response.json()
         
+        body = self.cache.fresh_body(source, url, params)
+        if body is not None:
+            self.metrics.count('cache_hits')
+            return json.loads(body)
+        
+        headers = self.cache.conditional_headers(url, params)
+        response = requests.get(url, params=params, headers=headers, timeout=timeout)
+        self._count_response(response)
+        if response.status_code == 304:
+            body = self.cache.not_modified(url, params)
+            if body is not None:
+                self.metrics.count('cache_revalidated')
+                return json.loads(body)
+            # Entry vanished between lookup and response; fetch unconditionally
+            response = requests.get(url, params=params, timeout=timeout)
+            self._count_response(response)
+        
+        self.metrics.count('cache_misses')
+        response.raise_for_status()
+        self.cache.store(source, url, params, response.content,
+                         etag=response.headers.get('ETag'),
+                         last_modified=response.headers.get('Last-Modified'))
+        return response.json()
+    
+    def flush_cache(self):
+        """Persist the response cache index so fresh hits keep their LRU order"""
+        if self.cache is not None:
+            self.cache.flush()
+    
+    def _count_response(self, response):
+        """Count an upstream request and its body size"""
+        self.metrics.count('http_requests')
+        self.metrics.count('http_bytes', len(response.content))
+        
+    @timed('fetch.air_quality')
     def fetch_air_quality_data(self, zip_code='90001', api_key=None):
         """
         Fetch air quality data from EPA AirNow API
@@ -37,13 +115,13 @@ class EnvironmentalDataProcessor:
                 'distance': 25,
                 'API_KEY': api_key
             }
-            response = requests.get(self.data_sources['epa_air_quality'], params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
+            return self._get_json('epa_air_quality', self.data_sources['epa_air_quality'],
+                                  params, timeout=10)
         except Exception as e:
             print(f"Error fetching air quality data: {e}")
             return self._generate_sample_air_quality()
     
+    @timed('fetch.water_quality')
     def fetch_water_quality_data(self, state_code='ca'):
         """
         Fetch water quality data from USGS Water Services
@@ -55,49 +133,177 @@ class EnvironmentalDataProcessor:
                 'siteType': 'ST',  # Stream
                 'format': 'json'
             }
-            response = requests.get(self.data_sources['usgs_water'], params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_json('usgs_water', self.data_sources['usgs_water'], params)
             return self._process_usgs_data(data)
         except Exception as e:
             print(f"Error fetching water quality data: {e}")
             return self._generate_sample_water_quality()
     
+    @timed('fetch.water_measurements')
+    def fetch_water_measurements(self, state_code='ca') -> MeasurementStore:
+        """
+        Fetch USGS water quality time series as a typed per-site store
+        
+        Returns:
+            MeasurementStore with float arrays and parsed timestamps per
+            parameter code (empty if the request fails)
+        """
+        store = MeasurementStore()
+        try:
+            params = {
+                'stateCd': state_code,
+                'parameterCd': '00010,00095,00300',  # Temperature, Conductivity, Dissolved Oxygen
+                'siteType': 'ST',  # Stream
+                'format': 'json'
+            }
+            store.add_usgs_response(
+                self._get_json('usgs_water', self.data_sources['usgs_water'], params)
+            )
+        except Exception as e:
+            print(f"Error fetching water quality data: {e}")
+        return store
+    
+    @timed('fetch.superfund_sites')
     def fetch_superfund_sites(self, state='CA', limit=100):
         """
         Fetch Superfund site data from EPA Envirofacts API
         """
         try:
             url = f"{self.data_sources['epa_superfund']}SEMS_SITE_INFO/STATE_CODE/{state}/JSON"
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            return response.json()[:limit]
+            return self._get_json('epa_superfund', url)[:limit]
         except Exception as e:
             print(f"Error fetching Superfund data: {e}")
             return self._generate_sample_superfund()
     
+    @timed('fetch.concurrent')
+    def fetch_all_concurrently(self, zip_codes: Iterable[str] = ('90001',), api_key=None,
+                               state_codes: Iterable[str] = ('ca',),
+                               parameter_codes: Iterable[str] = ('00010', '00095', '00300'),
+                               superfund_states: Iterable[str] = ('CA',), limit=100,
+                               **fetcher_options) -> Dict[str, List[Dict]]:
+        """
+        Fetch air, water and Superfund data concurrently with asyncio
+        
+        Requests fan out across zip codes, states and parameter codes over
+        pooled keep-alive connections with per-host concurrency limits and
+        retry/backoff (see AsyncFetcher). Requires aiohttp.
+        
+        Args:
+            zip_codes: Zip codes to query AirNow for
+            api_key: AirNow API key (sample air data is used without one)
+            state_codes: USGS state codes
+            parameter_codes: USGS parameter codes, fetched as separate requests
+            superfund_states: Envirofacts state codes
+            limit: Maximum Superfund sites per state
+            **fetcher_options: Passed to AsyncFetcher (per_host_limit, max_retries, ...)
+        
+        Returns:
+            Dict with 'air_quality', 'water_quality' and 'superfund_sites' lists
+        """
+        return asyncio.run(self._fetch_all_async(
+            list(zip_codes), api_key, list(state_codes), list(parameter_codes),
+            list(superfund_states), limit, fetcher_options
+        ))
+    
+    async def _fetch_all_async(self, zip_codes: List[str], api_key,
+                               state_codes: List[str], parameter_codes: List[str],
+                               superfund_states: List[str], limit: int,
+                               fetcher_options: Dict) -> Dict[str, List[Dict]]:
+        """Issue every upstream request on one event loop and merge the results"""
+        air_requests = []
+        if api_key:
+            air_requests = [
+                (self.data_sources['epa_air_quality'], {
+                    'format': 'application/json',
+                    'zipCode': zip_code,
+                    'distance': 25,
+                    'API_KEY': api_key
+                }, 'epa_air_quality')
+                for zip_code in zip_codes
+            ]
+        else:
+            print("Warning: No API key provided for AirNow. Using sample data.")
+        
+        water_requests = [
+            (self.data_sources['usgs_water'], {
+                'stateCd': state_code,
+                'parameterCd': parameter_code,
+                'siteType': 'ST',
+                'format': 'json'
+            }, 'usgs_water')
+            for state_code in state_codes
+            for parameter_code in parameter_codes
+        ]
+        
+        superfund_requests = [
+            (f"{self.data_sources['epa_superfund']}SEMS_SITE_INFO/STATE_CODE/{state}/JSON",
+             None, 'epa_superfund')
+            for state in superfund_states
+        ]
+        
+        async with AsyncFetcher(cache=self.cache, **fetcher_options) as fetcher:
+            results = await fetcher.fetch_many(
+                air_requests + water_requests + superfund_requests
+            )
+        self.flush_cache()
+        self.metrics.count('http_requests', fetcher.stats['requests'])
+        self.metrics.count('http_bytes', fetcher.stats['bytes'])
+        
+        air_results = results[:len(air_requests)]
+        water_results = results[len(air_requests):len(air_requests) + len(water_requests)]
+        superfund_results = results[len(air_requests) + len(water_requests):]
+        
+        # AirNow reporting areas overlap between neighboring zip codes
+        air_quality = []
+        seen = set()
+        for result in self._successful(air_results, 'air quality'):
+            for observation in result:
+                key = json.dumps(observation, sort_keys=True)
+                if key not in seen:
+                    seen.add(key)
+                    air_quality.append(observation)
+        if not air_quality:
+            air_quality = self._generate_sample_air_quality()
+        
+        # Per-parameter responses are merged so each site yields one record
+        measurements = MeasurementStore()
+        for result in self._successful(water_results, 'water quality'):
+            measurements.add_usgs_response(result)
+        water_quality = measurements.records()
+        if not water_quality:
+            water_quality = self._generate_sample_water_quality()
+        
+        superfund_sites = []
+        for result in self._successful(superfund_results, 'Superfund'):
+            superfund_sites.extend(result[:limit])
+        if not superfund_sites:
+            superfund_sites = self._generate_sample_superfund()
+        
+        return {
+            'air_quality': air_quality,
+            'water_quality': water_quality,
+            'superfund_sites': superfund_sites
+        }
+    
+    def _successful(self, results: List[Any], label: str) -> List[Any]:
+        """Drop failed fetches from a fan-out, reporting each failure"""
+        successful = []
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Error fetching {label} data: {result}")
+            else:
+                successful.append(result)
+        return successful
+    
     def _process_usgs_data(self, raw_data: Dict) -> List[Dict]:
-        """Process USGS water quality data into simplified format"""
-        processed = []
-        
-        if 'value' not in raw_data or 'timeSeries' not in raw_data['value']:
-            return processed
-        
-        for site in raw_data['value']['timeSeries']:
-            try:
-                site_info = site['sourceInfo']
-                processed.append({
-                    'site_code': site_info['siteCode'][0]['value'],
-                    'site_name': site_info['siteName'],
-                    'latitude': float(site_info['geoLocation']['geogLocation']['latitude']),
-                    'longitude': float(site_info['geoLocation']['geogLocation']['longitude']),
-                    'parameter': site['variable']['variableName'],
-                    'values': site['values'][0]['value'] if site['values'] else []
-                })
-            except (KeyError, IndexError, ValueError) as e:
-                continue
+        """
+        Process USGS water quality data into one data point per site
         
-        return processed
+        Time series are pivoted by parameter code into a MeasurementStore;
+        each site carries the latest temperature, conductivity and
+        dissolved_oxygen as floats.
+        """
+        return MeasurementStore.from_usgs(raw_data).records()
     
     def _generate_sample_air_quality(self) -> List[Dict]:
         """Generate sample air quality data for demonstration"""
@@ -231,6 +437,7 @@ class EnvironmentalDataProcessor:
             'timestamp': datetime.now().isoformat()
         }
     
+    @timed('geojson.build')
     def generate_geojson(self, data_points: List[Dict], data_type: str) -> Dict:
         """
         Generate GeoJSON from data points
@@ -242,8 +449,30 @@ class EnvironmentalDataProcessor:
         Returns:
             GeoJSON FeatureCollection
         """
-        features = []
+        features = list(self.iter_geojson_features(data_points))
+        self.metrics.count('features_processed', len(features))
         
+        return {
+            'type': 'FeatureCollection',
+            'metadata': {
+                'data_type': data_type,
+                'feature_count': len(features),
+                'generated_at': datetime.now().isoformat(),
+                'crs': 'EPSG:4326'
+            },
+            'features': features
+        }
+    
+    def iter_geojson_features(self, data_points: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Yield GeoJSON features from data points one at a time
+        
+        Args:
+            data_points: Iterable of data dictionaries with lat/lon
+        
+        Yields:
+            GeoJSON Feature dicts; points without coordinates are skipped
+        """
         for point in data_points:
             # Extract coordinates
             if 'LATITUDE' in point and 'LONGITUDE' in point:
@@ -254,7 +483,7 @@ class EnvironmentalDataProcessor:
                 continue
             
             # Create feature
-            feature = {
+            yield {
                 'type': 'Feature',
                 'geometry': {
                     'type': 'Point',
@@ -263,32 +492,84 @@ class EnvironmentalDataProcessor:
                 'properties': {k: v for k, v in point.items() 
                              if k not in ['latitude', 'longitude', 'LATITUDE', 'LONGITUDE']}
             }
-            features.append(feature)
+    
+    @timed('geojson.stream')
+    def stream_geojson(self, data_points: Iterable[Dict], data_type: str,
+                       filename: str) -> Dict:
+        """
+        Stream data points straight to a GeoJSON file
         
-        return {
-            'type': 'FeatureCollection',
-            'metadata': {
-                'data_type': data_type,
-                'feature_count': len(features),
-                'generated_at': datetime.now().isoformat(),
-                'crs': 'EPSG:4326'
-            },
-            'features': features
+        Features are generated and written one at a time, so peak memory
+        does not grow with the layer size.
+        
+        Args:
+            data_points: Iterable of data dictionaries with lat/lon
+            data_type: Type of data (air_quality, water_quality, superfund)
+            filename: Output file name within output_dir
+        
+        Returns:
+            The collection metadata, including the final feature_count
+        """
+        filepath = f"{self.output_dir}/{filename}"
+        metadata = {
+            'data_type': data_type,
+            'generated_at': datetime.now().isoformat(),
+            'crs': 'EPSG:4326'
+        }
+        with GeoJSONStreamWriter(filepath, metadata) as writer:
+            writer.write_features(self.iter_geojson_features(data_points))
+        self.metrics.count('features_processed', writer.feature_count)
+        print(f"Saved: {filepath}")
+        return dict(metadata, feature_count=writer.feature_count)
+    
+    @timed('write.columnar')
+    def save_columnar(self, data_points: Iterable[Dict], data_type: str,
+                      layer_name: str) -> str:
+        """
+        Save data points as a columnar binary layer (requires NumPy)
+        
+        Coordinates are stored as float arrays and properties as typed
+        columns, so SpatialAnalyzer and DataValidator can memory-map the
+        layer instead of parsing JSON. GeoJSON remains the export format
+        for the web client.
+        
+        Args:
+            data_points: Iterable of data dictionaries with lat/lon
+            data_type: Type of data (air_quality, water_quality, superfund)
+            layer_name: Layer directory name within output_dir (without suffix)
+        
+        Returns:
+            Path of the layer directory
+        """
+        if layer_store is None:
+            raise ImportError("Columnar layers require NumPy (pip install numpy)")
+        
+        layerpath = f"{self.output_dir}/{layer_name}{layer_store.LAYER_SUFFIX}"
+        metadata = {
+            'data_type': data_type,
+            'generated_at': datetime.now().isoformat(),
+            'crs': 'EPSG:4326'
         }
+        layer_store.write_columnar_layer(layerpath, self.iter_geojson_features(data_points),
+                                         metadata)
+        print(f"Saved: {layerpath}")
+        return layerpath
     
     def generate_data_hash(self, data: Any) -> str:
-        """Generate SHA-256 hash for data provenance"""
-        data_string = json.dumps(data, sort_keys=True)
-        return hashlib.sha256(data_string.encode()).hexdigest()
+        """Generate SHA-256 hash for data provenance (see provenance.py)"""
+        return canonical_hash(data)
     
+    @timed('write.json')
     def save_to_file(self, data: Any, filename: str):
         """Save data to JSON file"""
         filepath = f"{self.output_dir}/{filename}"
         with open(filepath, 'w') as f:
             json.dump(data, f, indent=2)
+            self.metrics.count('bytes_written', f.tell())
         print(f"Saved: {filepath}")
         return filepath
     
+    @timed('wordpress.import')
     def generate_wordpress_import(self, environmental_data: Dict) -> Dict:
         """
         Generate WordPress-compatible import format
@@ -299,60 +580,299 @@ class EnvironmentalDataProcessor:
         Returns:
             WordPress CPT import format
         """
+        # One encoding pass yields the collection hash and every feature hash
+        data_hash, feature_hashes, root = hash_collection(environmental_data)
         wordpress_data = {
             'posts': [],
             'meta': {
                 'import_date': datetime.now().isoformat(),
-                'data_hash': self.generate_data_hash(environmental_data),
+                'data_hash': data_hash,
+                'merkle_root': root,
                 'source': 'geospatial_intelligence_processor'
             }
         }
         
         # Convert each data point to WordPress post format
-        for feature in environmental_data.get('features', []):
-            props = feature['properties']
-            coords = feature['geometry']['coordinates']
-            
-            post = {
-                'post_type': 'environmental_layer',
-                'post_title': props.get('location', props.get('site_name', 'Environmental Data Point')),
-                'post_status': 'publish',
-                'meta_input': {
-                    '_eic_latitude': coords[1],
-                    '_eic_longitude': coords[0],
-                    '_eic_data_type': environmental_data['metadata']['data_type'],
-                    '_eic_properties': json.dumps(props),
-                    '_eic_source_hash': self.generate_data_hash(feature)
-                }
-            }
+        keys = set()
+        for feature, feature_hash in zip(environmental_data.get('features', []), feature_hashes):
+            post = self._wordpress_post(feature, environmental_data['metadata']['data_type'],
+                                        feature_hash, keys)
             wordpress_data['posts'].append(post)
+        self.metrics.count('wordpress_posts', len(wordpress_data['posts']))
+        
+        return wordpress_data
+    
+    def _wordpress_post(self, feature: Dict, data_type: str, feature_hash: str,
+                        keys: set) -> Dict:
+        """Build the environmental_layer post for a feature and claim its key"""
+        props = feature['properties']
+        coords = feature['geometry']['coordinates']
+        key = unique_feature_key(props, coords[1], coords[0], keys)
+        keys.add(key)
+        
+        return {
+            'post_type': 'environmental_layer',
+            'post_title': props.get('location', props.get('site_name', 'Environmental Data Point')),
+            'post_status': 'publish',
+            'meta_input': {
+                '_eic_latitude': coords[1],
+                '_eic_longitude': coords[0],
+                '_eic_data_type': data_type,
+                '_eic_properties': json.dumps(props),
+                '_eic_source_hash': feature_hash,
+                '_eic_feature_key': key
+            }
+        }
+    
+    @timed('wordpress.batches')
+    def export_wordpress_batches(self, features: Iterable[Dict], data_type: str,
+                                 export_name: str = 'wordpress_import',
+                                 max_batch_bytes: int = 4 * 1024 * 1024,
+                                 max_batch_posts: int = 1000) -> Dict:
+        """
+        Stream WordPress posts into size-bounded NDJSON batch files
+        
+        Posts are written one per line to <output_dir>/<export_name>/
+        batch_NNNNN.ndjson, starting a new batch whenever the next post
+        would exceed max_batch_bytes or max_batch_posts. manifest.json
+        lists every batch with its post count, byte size, SHA-256 of the
+        file and first/last feature keys, so importers can ingest batches
+        in parallel, verify them, and skip batches whose hash they have
+        already imported. Unchanged content yields identical batch hashes
+        across runs; stale batch files from a larger earlier export are
+        removed.
+        
+        Args:
+            features: GeoJSON features (e.g. iter_features over a layer file)
+            data_type: Type of data (air_quality, water_quality, superfund)
+            export_name: Export directory name within output_dir
+            max_batch_bytes: Maximum size of a batch file
+            max_batch_posts: Maximum number of posts per batch
+        
+        Returns:
+            The export manifest
+        """
+        export_dir = f"{self.output_dir}/{export_name}"
+        os.makedirs(export_dir, exist_ok=True)
+        
+        batches = []
+        feature_hashes = []
+        keys = set()
+        lines = []
+        batch_bytes = 0
+        
+        def flush():
+            index = len(batches)
+            filename = f"batch_{index:05d}.ndjson"
+            content = ''.join(line for line, _ in lines).encode()
+            tmp_path = f"{export_dir}/{filename}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, f"{export_dir}/{filename}")
+            self.metrics.count('bytes_written', len(content))
+            batches.append({
+                'index': index,
+                'file': filename,
+                'posts': len(lines),
+                'bytes': len(content),
+                'sha256': hashlib.sha256(content).hexdigest(),
+                'first_key': lines[0][1],
+                'last_key': lines[-1][1]
+            })
+        
+        for feature in features:
+            feature_hash = self.generate_data_hash(feature)
+            feature_hashes.append(feature_hash)
+            post = self._wordpress_post(feature, data_type, feature_hash, keys)
+            line = json.dumps(post) + '\n'
+            size = len(line.encode())
+            if lines and (batch_bytes + size > max_batch_bytes or len(lines) >= max_batch_posts):
+                flush()
+                lines, batch_bytes = [], 0
+            lines.append((line, post['meta_input']['_eic_feature_key']))
+            batch_bytes += size
+        if lines:
+            flush()
+        self.metrics.count('wordpress_posts', len(feature_hashes))
+        
+        # Drop batch files left over from a previous, larger export
+        current = {batch['file'] for batch in batches}
+        for filename in os.listdir(export_dir):
+            if filename.startswith('batch_') and filename.endswith('.ndjson') and filename not in current:
+                os.remove(f"{export_dir}/{filename}")
+        
+        manifest = {
+            'format': 'ndjson',
+            'data_type': data_type,
+            'source': 'geospatial_intelligence_processor',
+            'generated_at': datetime.now().isoformat(),
+            'post_count': len(feature_hashes),
+            'batch_count': len(batches),
+            'merkle_root': merkle_root(feature_hashes),
+            'batches': batches
+        }
+        tmp_path = f"{export_dir}/manifest.json.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, f"{export_dir}/manifest.json")
+        print(f"Saved: {export_dir}/manifest.json ({len(batches)} batches)")
+        return manifest
+    
+    @timed('incremental.refresh')
+    def refresh_layer(self, manifest: LayerManifest, layer_name: str,
+                      data_points: Iterable[Dict], data_type: str) -> LayerDelta:
+        """
+        Diff a layer's features against the previous run's manifest
+        
+        Features are keyed by their ID property (or position) and compared
+        by generate_data_hash. The added and changed features are written
+        to <layer_name>_delta.geojson together with the keys of removed
+        features; an unchanged layer gets an empty delta.
+        
+        Args:
+            manifest: Manifest from the previous run; updated in place
+            layer_name: Layer name, also the output file stem
+            data_points: Iterable of data dictionaries with lat/lon
+            data_type: Type of data (air_quality, water_quality, superfund)
+        
+        Returns:
+            LayerDelta since the previous run
+        """
+        delta = manifest.refresh(
+            layer_name, self.iter_geojson_features(data_points),
+            lambda f: (f['geometry']['coordinates'][1], f['geometry']['coordinates'][0]),
+            lambda f: f['properties'],
+            self.generate_data_hash
+        )
+        self.save_to_file(self.generate_geojson_delta(delta, data_type),
+                          f'{layer_name}_delta.geojson')
+        return delta
+    
+    def generate_geojson_delta(self, delta: LayerDelta, data_type: str) -> Dict:
+        """
+        Generate a GeoJSON FeatureCollection holding only a layer's changes
+        
+        Args:
+            delta: LayerDelta from refresh_layer
+            data_type: Type of data (air_quality, water_quality, superfund)
         
+        Returns:
+            FeatureCollection of added and changed features; the metadata
+            lists the added, changed and removed feature keys
+        """
+        return {
+            'type': 'FeatureCollection',
+            'metadata': {
+                'data_type': data_type,
+                'delta': True,
+                'feature_count': len(delta.added) + len(delta.changed),
+                'added': [key for key, _ in delta.added],
+                'changed': [key for key, _ in delta.changed],
+                'removed': list(delta.removed),
+                'generated_at': datetime.now().isoformat(),
+                'crs': 'EPSG:4326'
+            },
+            'features': [feature for _, feature in delta.added + delta.changed]
+        }
+    
+    def generate_wordpress_delta(self, delta: LayerDelta, data_type: str) -> Dict:
+        """
+        Generate WordPress import data for a layer's changes only
+        
+        Posts are matched to earlier imports by _eic_feature_key: added and
+        changed features become posts to create or update, and removed
+        feature keys are listed under 'deleted'.
+        
+        Args:
+            delta: LayerDelta from refresh_layer
+            data_type: Type of data (air_quality, water_quality, superfund)
+        
+        Returns:
+            WordPress CPT import format with a 'deleted' key list
+        """
+        wordpress_data = self.generate_wordpress_import(
+            self.generate_geojson_delta(delta, data_type))
+        # Use the manifest keys, which are unique across the whole layer
+        for post, (key, _) in zip(wordpress_data['posts'], delta.added + delta.changed):
+            post['meta_input']['_eic_feature_key'] = key
+        wordpress_data['deleted'] = list(delta.removed)
         return wordpress_data
 
 
 def main():
     """Main execution function"""
+    parser = argparse.ArgumentParser(description='ThrivingRoots Environmental Data Processor')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Cache upstream API responses in this directory')
+    parser.add_argument('--columnar', action='store_true',
+                        help='Also write each layer as a columnar binary layer')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only rewrite changed layers and emit feature and post deltas')
+    parser.add_argument('--wp-batches', action='store_true',
+                        help='Export WordPress posts as NDJSON batches with a manifest')
+    parser.add_argument('--metrics', default=None,
+                        help='Write a JSON run report (stage timings, counters, peak RSS) here')
+    parser.add_argument('--prometheus', default=None,
+                        help='Write the run report in Prometheus text format here')
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("ThrivingRoots Environmental Data Processor")
     print("=" * 60)
     
-    processor = EnvironmentalDataProcessor(output_dir='../outputs')
+    metrics = from_args(args.metrics, args.prometheus)
+    processor = EnvironmentalDataProcessor(output_dir='../outputs', cache_dir=args.cache_dir,
+                                           instrumentation=metrics)
+    
+    # Incremental runs diff every layer against the previous run's manifest
+    # and only rewrite layers that changed
+    manifest = None
+    deltas = {}
+    if args.incremental:
+        manifest = LayerManifest(f"{processor.output_dir}/layer_manifest.json")
     
     # Fetch and process data
     print("\n1. Fetching Air Quality Data...")
     air_quality = processor.fetch_air_quality_data()
     air_geojson = processor.generate_geojson(air_quality, 'air_quality')
-    processor.save_to_file(air_geojson, 'california_air_quality.geojson')
+    if manifest is not None:
+        deltas['air'] = processor.refresh_layer(manifest, 'california_air_quality',
+                                                air_quality, 'air_quality')
+        print(f"Delta: {deltas['air'].summary()}")
+    if manifest is None or deltas['air']:
+        processor.save_to_file(air_geojson, 'california_air_quality.geojson')
+        if args.columnar:
+            processor.save_columnar(air_quality, 'air_quality', 'california_air_quality')
     
     print("\n2. Fetching Water Quality Data...")
     water_quality = processor.fetch_water_quality_data()
-    water_geojson = processor.generate_geojson(water_quality, 'water_quality')
-    processor.save_to_file(water_geojson, 'california_water_quality.geojson')
+    water_count = None
+    if manifest is not None:
+        deltas['water'] = processor.refresh_layer(manifest, 'california_water_quality',
+                                                  water_quality, 'water_quality')
+        print(f"Delta: {deltas['water'].summary()}")
+        water_count = deltas['water'].unchanged
+    if manifest is None or deltas['water']:
+        water_meta = processor.stream_geojson(water_quality, 'water_quality',
+                                              'california_water_quality.geojson')
+        water_count = water_meta['feature_count']
+        if args.columnar:
+            processor.save_columnar(water_quality, 'water_quality', 'california_water_quality')
     
     print("\n3. Fetching Superfund Sites...")
     superfund_sites = processor.fetch_superfund_sites()
-    superfund_geojson = processor.generate_geojson(superfund_sites, 'superfund_sites')
-    processor.save_to_file(superfund_geojson, 'california_superfund_sites.geojson')
+    superfund_count = None
+    if manifest is not None:
+        deltas['superfund'] = processor.refresh_layer(manifest, 'california_superfund_sites',
+                                                      superfund_sites, 'superfund_sites')
+        print(f"Delta: {deltas['superfund'].summary()}")
+        superfund_count = deltas['superfund'].unchanged
+    if manifest is None or deltas['superfund']:
+        superfund_meta = processor.stream_geojson(superfund_sites, 'superfund_sites',
+                                                  'california_superfund_sites.geojson')
+        superfund_count = superfund_meta['feature_count']
+        if args.columnar:
+            processor.save_columnar(superfund_sites, 'superfund_sites', 'california_superfund_sites')
     
     print("\n4. Calculating Risk Scores...")
     # Calculate sample risk score
@@ -365,16 +885,34 @@ def main():
     processor.save_to_file(sample_risk, 'sample_risk_analysis.json')
     
     print("\n5. Generating WordPress Import Data...")
-    wp_import = processor.generate_wordpress_import(air_geojson)
-    processor.save_to_file(wp_import, 'wordpress_import_data.json')
+    if manifest is not None:
+        # Only added, changed and removed posts; the full import is not rewritten
+        wp_import = processor.generate_wordpress_delta(deltas['air'], 'air_quality')
+        processor.save_to_file(wp_import, 'wordpress_import_delta.json')
+        manifest.save()
+        wp_summary = (f"WordPress delta ready with {len(wp_import['posts'])} posts "
+                      f"and {len(wp_import['deleted'])} deletions")
+    elif args.wp_batches:
+        # Size-bounded NDJSON batches the importer can load in parallel and resume
+        wp_manifest = processor.export_wordpress_batches(air_geojson['features'], 'air_quality')
+        wp_summary = (f"WordPress import ready with {wp_manifest['post_count']} posts "
+                      f"in {wp_manifest['batch_count']} batches")
+    else:
+        wp_import = processor.generate_wordpress_import(air_geojson)
+        processor.save_to_file(wp_import, 'wordpress_import_data.json')
+        wp_summary = f"WordPress import ready with {len(wp_import['posts'])} posts"
     
     print("\n" + "=" * 60)
     print("Processing Complete!")
     print("=" * 60)
     print(f"\nGenerated {len(air_geojson['features'])} air quality features")
-    print(f"Generated {len(water_geojson['features'])} water quality features")
-    print(f"Generated {len(superfund_geojson['features'])} superfund site features")
-    print(f"WordPress import ready with {len(wp_import['posts'])} posts")
+    print(f"Generated {water_count} water quality features")
+    print(f"Generated {superfund_count} superfund site features")
+    print(wp_summary)
+    if processor.cache is not None:
+        processor.flush_cache()
+        print(f"Response cache: {processor.cache.stats} (hit rate {processor.cache.hit_rate():.0%})")
+    write_reports(metrics, args.metrics, args.prometheus, 'environmental_data_processor')
 
 
 if __name__ == '__main__':
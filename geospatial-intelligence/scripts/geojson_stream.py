@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Streaming GeoJSON
+Incremental writer and reader for large FeatureCollections
+"""
+
+import json
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+_WHITESPACE = ' \t\n\r'
+
+
+class GeoJSONStreamWriter:
+    """
+    Write a FeatureCollection one feature at a time
+
+    The collection header is written on open, each feature as a compact
+    line, and the footer (with metadata and the final feature_count) on
+    close, so memory use does not depend on the number of features.
+    """
+
+    def __init__(self, path: str, metadata: Optional[Dict] = None):
+        """
+        Args:
+            path: Output file path
+            metadata: Collection metadata; feature_count is filled in on close
+        """
+        self.path = path
+        self.metadata = dict(metadata or {})
+        self.feature_count = 0
+        self._file = open(path, 'w')
+        self._file.write('{"type": "FeatureCollection", "features": [')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write_feature(self, feature: Dict):
+        """Append one feature to the collection"""
+        separator = ',\n' if self.feature_count else '\n'
+        self._file.write(separator + json.dumps(feature))
+        self.feature_count += 1
+
+    def write_features(self, features: Iterable[Dict]) -> int:
+        """Append every feature from an iterable; returns the running count"""
+        for feature in features:
+            self.write_feature(feature)
+        return self.feature_count
+
+    def close(self):
+        """Write the footer and close the file"""
+        if self._file.closed:
+            return
+        metadata = dict(self.metadata)
+        metadata['feature_count'] = self.feature_count
+        self._file.write(f'\n], "metadata": {json.dumps(metadata)}}}\n')
+        self._file.close()
+
+
+class GeoJSONStreamReader:
+    """
+    Read a FeatureCollection incrementally
+
+    Iterating yields features one by one without building the document.
+    Top-level members other than "features" (type, metadata, ...) are
+    collected into .members as they are encountered, so members written
+    after the features array are available once iteration finishes.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 1 << 16):
+        """
+        Args:
+            path: GeoJSON file path
+            chunk_size: Characters read from disk at a time
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.members = {}
+        self._decoder = json.JSONDecoder()
+
+    def __iter__(self) -> Iterator[Dict]:
+        for kind, _, value in self.events():
+            if kind == 'feature':
+                yield value
+
+    def events(self) -> Iterator[Tuple[str, Any, Any]]:
+        """
+        Yield top-level parse events in document order
+
+        Yields:
+            ('member', key, value) for each top-level member except
+            "features", ('begin', 'features', None) when the features
+            array opens, and ('feature', index, feature) for each feature
+        """
+        self.members = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self._file = f
+            self._buf = ''
+            self._pos = 0
+            self._eof = False
+
+            self._expect('{')
+            if self._peek() == '}':
+                return
+
+            while True:
+                key = self._value()
+                self._expect(':')
+                if key == 'features' and self._peek() == '[':
+                    self._expect('[')
+                    yield 'begin', key, None
+                    index = 0
+                    if self._peek() != ']':
+                        while True:
+                            yield 'feature', index, self._value()
+                            index += 1
+                            if self._expect(',', ']') == ']':
+                                break
+                    else:
+                        self._expect(']')
+                else:
+                    value = self._value()
+                    self.members[key] = value
+                    yield 'member', key, value
+
+                if self._expect(',', '}') == '}':
+                    break
+
+    def _fill(self) -> bool:
+        """Read another chunk into the buffer; False at end of file"""
+        if self._eof:
+            return False
+        chunk = self._file.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        # Drop consumed text so the buffer stays around one chunk
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Next non-whitespace character without consuming it"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError(f"Unexpected end of GeoJSON in {self.path}")
+
+    def _expect(self, *chars: str) -> str:
+        """Consume one of the given structural characters"""
+        char = self._peek()
+        if char not in chars:
+            raise ValueError(f"Expected {' or '.join(chars)} but found {char!r} in {self.path}")
+        self._pos += 1
+        return char
+
+    def _value(self) -> Any:
+        """Decode the next complete JSON value"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A value touching the buffer end may be truncated (e.g. a number)
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+
+def iter_features(path: str, chunk_size: int = 1 << 16) -> Iterator[Dict]:
+    """
+    Yield the features of a GeoJSON FeatureCollection file one at a time
+
+    Args:
+        path: GeoJSON file path
+        chunk_size: Characters read from disk at a time
+
+    Yields:
+        Feature dicts in file order
+    """
+    return iter(GeoJSONStreamReader(path, chunk_size))
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Heatmap Grid Engine
+Dense lat/lon rasters of interpolated risk, built with the vectorized kernel
+"""
+
+import base64
+import math
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from haversine_kernel import (DEFAULT_CHUNK_ELEMENTS, EARTH_RADIUS_KM,
+                              iter_distance_chunks, to_coord_array)
+
+METHODS = ('idw', 'kde')
+
+# Grid rows whose candidate points are selected together
+BAND_ROWS = 16
+
+# Distances below this are treated as exact hits by IDW
+MIN_DISTANCE_KM = 1e-6
+
+UINT8_NODATA = 255
+
+
+def grid_spec(min_lat: float, max_lat: float, min_lon: float, max_lon: float,
+              resolution: float) -> Dict:
+    """
+    Describe a north-up raster covering a bounding box
+
+    The grid starts at the south-west corner and is extended to a whole
+    number of cells, so it always covers the bounding box.
+
+    Args:
+        min_lat, max_lat, min_lon, max_lon: Bounding box in degrees
+        resolution: Cell size in degrees
+
+    Returns:
+        Dict with rows, cols, resolution and the grid's bounds
+    """
+    if resolution <= 0:
+        raise ValueError("grid_resolution must be positive")
+    rows = max(1, math.ceil(round((max_lat - min_lat) / resolution, 9)))
+    cols = max(1, math.ceil(round((max_lon - min_lon) / resolution, 9)))
+    return {
+        'rows': rows,
+        'cols': cols,
+        'resolution': resolution,
+        'min_lat': min_lat,
+        'max_lat': min_lat + rows * resolution,
+        'min_lon': min_lon,
+        'max_lon': min_lon + cols * resolution
+    }
+
+
+def cell_centers(spec: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    """Cell-center latitudes (north to south) and longitudes (west to east)"""
+    resolution = spec['resolution']
+    lats = spec['max_lat'] - (np.arange(spec['rows']) + 0.5) * resolution
+    lons = spec['min_lon'] + (np.arange(spec['cols']) + 0.5) * resolution
+    return lats, lons
+
+
+def _accumulate(spec: Dict, points: np.ndarray, values: np.ndarray,
+                kernel: Callable[[np.ndarray], np.ndarray], cutoff_km: float,
+                earth_radius_km: float, dtype,
+                chunk_elements: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sum kernel weights and weighted values over every grid cell
+
+    Rows are processed in bands. Only points whose latitude lies within
+    the cutoff of a band are measured against it, and weights beyond
+    cutoff_km are zeroed.
+
+    Returns:
+        Tuple of (sum of weight * value, sum of weight), each (rows, cols)
+    """
+    rows, cols = spec['rows'], spec['cols']
+    numerator = np.zeros(rows * cols, dtype=np.float64)
+    denominator = np.zeros(rows * cols, dtype=np.float64)
+    if len(points) == 0:
+        return numerator.reshape(rows, cols), denominator.reshape(rows, cols)
+
+    order = np.argsort(points[:, 0], kind='stable')
+    points, values = points[order], values[order]
+    # Great-circle distance is at least the latitude difference
+    margin = math.degrees(cutoff_km / earth_radius_km)
+    lats, lons = cell_centers(spec)
+
+    for r0 in range(0, rows, BAND_ROWS):
+        r1 = min(r0 + BAND_ROWS, rows)
+        band_lats = lats[r0:r1]
+        lo = np.searchsorted(points[:, 0], band_lats.min() - margin, side='left')
+        hi = np.searchsorted(points[:, 0], band_lats.max() + margin, side='right')
+        if lo == hi:
+            continue
+
+        candidates, candidate_values = points[lo:hi], values[lo:hi]
+        cells = np.column_stack((np.repeat(band_lats, cols), np.tile(lons, r1 - r0)))
+        offset = r0 * cols
+        for start, stop, block in iter_distance_chunks(cells, candidates, earth_radius_km,
+                                                       dtype, chunk_elements):
+            weights = kernel(block)
+            weights[block > cutoff_km] = 0
+            numerator[offset + start:offset + stop] = weights @ candidate_values
+            denominator[offset + start:offset + stop] = weights.sum(axis=1)
+
+    return numerator.reshape(rows, cols), denominator.reshape(rows, cols)
+
+
+def idw_grid(spec: Dict, points, values: Sequence[float], cutoff_km: float,
+             power: float = 2.0, earth_radius_km: float = EARTH_RADIUS_KM,
+             dtype=np.float64,
+             chunk_elements: int = DEFAULT_CHUNK_ELEMENTS) -> np.ndarray:
+    """
+    Inverse-distance-weighted interpolation onto a grid
+
+    Args:
+        spec: Grid from grid_spec
+        points: (n, 2) lat/lon array or sequence of pairs
+        values: Value at each point
+        cutoff_km: Points farther than this from a cell are ignored
+        power: Distance exponent
+        earth_radius_km: Sphere radius
+        dtype: Floating point type for distance computation
+        chunk_elements: Maximum distance cells computed per block
+
+    Returns:
+        float32 array (rows, cols), NaN where no point is within cutoff_km
+    """
+    def kernel(distance):
+        return 1.0 / np.maximum(distance, MIN_DISTANCE_KM) ** power
+
+    numerator, denominator = _accumulate(
+        spec, to_coord_array(points, dtype), np.asarray(values, dtype=np.float64),
+        kernel, cutoff_km, earth_radius_km, dtype, chunk_elements)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        grid = numerator / denominator
+    grid[denominator == 0] = np.nan
+    return grid.astype(np.float32)
+
+
+def kde_grid(spec: Dict, points, weights: Sequence[float], bandwidth_km: float,
+             cutoff_km: Optional[float] = None,
+             earth_radius_km: float = EARTH_RADIUS_KM, dtype=np.float64,
+             chunk_elements: int = DEFAULT_CHUNK_ELEMENTS) -> np.ndarray:
+    """
+    Weighted Gaussian kernel density onto a grid
+
+    Args:
+        spec: Grid from grid_spec
+        points: (n, 2) lat/lon array or sequence of pairs
+        weights: Weight of each point (e.g. composite risk)
+        bandwidth_km: Gaussian kernel standard deviation
+        cutoff_km: Kernel support; defaults to three bandwidths
+        earth_radius_km: Sphere radius
+        dtype: Floating point type for distance computation
+        chunk_elements: Maximum distance cells computed per block
+
+    Returns:
+        float32 array (rows, cols) of weighted density per km^2
+    """
+    if bandwidth_km <= 0:
+        raise ValueError("bandwidth_km must be positive")
+    if cutoff_km is None:
+        cutoff_km = 3.0 * bandwidth_km
+
+    def kernel(distance):
+        return np.exp(-0.5 * (distance / bandwidth_km) ** 2)
+
+    numerator, _ = _accumulate(
+        spec, to_coord_array(points, dtype), np.asarray(weights, dtype=np.float64),
+        kernel, cutoff_km, earth_radius_km, dtype, chunk_elements)
+    return (numerator / (2.0 * math.pi * bandwidth_km ** 2)).astype(np.float32)
+
+
+def encode_grid(grid: np.ndarray, encoding: str = 'uint8',
+                value_range: Optional[Tuple[float, float]] = None) -> Dict:
+    """
+    Pack a grid as a base64 typed array
+
+    'float32' stores little-endian floats with NaN as no-data. 'uint8'
+    quantizes values to 0-254 over value_range (default: the grid's own
+    range) and stores no-data as 255; decode with value = offset + byte * scale.
+
+    Args:
+        grid: 2D array, row 0 northernmost
+        encoding: 'float32' or 'uint8'
+        value_range: (low, high) mapped to bytes 0 and 254
+
+    Returns:
+        Dict with encoding, shape, scale, offset, nodata and base64 data
+    """
+    grid = np.asarray(grid, dtype=np.float32)
+    if encoding == 'float32':
+        return {
+            'encoding': 'float32',
+            'shape': list(grid.shape),
+            'scale': 1.0,
+            'offset': 0.0,
+            'nodata': None,
+            'data': base64.b64encode(grid.astype('<f4').tobytes()).decode('ascii')
+        }
+    if encoding != 'uint8':
+        raise ValueError(f"Unknown grid encoding: {encoding}")
+
+    valid = ~np.isnan(grid)
+    if value_range is None:
+        value_range = ((float(grid[valid].min()), float(grid[valid].max()))
+                       if valid.any() else (0.0, 1.0))
+    low, high = value_range
+    scale = (high - low) / 254.0 if high > low else 1.0
+
+    quantized = np.full(grid.shape, UINT8_NODATA, dtype=np.uint8)
+    quantized[valid] = np.clip(np.rint((grid[valid] - low) / scale), 0, 254)
+    return {
+        'encoding': 'uint8',
+        'shape': list(grid.shape),
+        'scale': scale,
+        'offset': low,
+        'nodata': UINT8_NODATA,
+        'data': base64.b64encode(quantized.tobytes()).decode('ascii')
+    }
+
+
+def decode_grid(encoded: Dict) -> np.ndarray:
+    """Unpack an encode_grid dict to a float32 array with NaN for no-data"""
+    raw = base64.b64decode(encoded['data'])
+    shape = tuple(encoded['shape'])
+    if encoded['encoding'] == 'float32':
+        return np.frombuffer(raw, dtype='<f4').reshape(shape).astype(np.float32)
+    quantized = np.frombuffer(raw, dtype=np.uint8).reshape(shape)
+    grid = (encoded['offset'] + quantized * encoded['scale']).astype(np.float32)
+    grid[quantized == encoded['nodata']] = np.nan
+    return grid
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+HTTP Response Cache
+On-disk, gzip-compressed cache for upstream API responses with conditional GETs
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class ResponseCache:
+    """
+    Cache upstream response bodies keyed by URL and query parameters
+
+    Bodies are stored gzip-compressed under cache_dir. Entries younger than
+    their source's TTL are served without a request; older entries are
+    revalidated with If-None-Match / If-Modified-Since. The cache is bounded
+    by compressed size and evicts least recently used entries first.
+    URLs and parameters (which may contain API keys) are never written to
+    disk; entries are addressed by a SHA-256 of the request. A cache can be
+    shared by threads fetching concurrently.
+    """
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, cache_dir: str, default_ttl: float = 3600,
+                 source_ttls: Optional[Dict[str, float]] = None,
+                 max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: Directory holding compressed bodies and the index
+            default_ttl: Seconds a response is served without revalidation
+            source_ttls: Per-source TTL overrides, e.g. {'usgs_water': 900}
+            max_bytes: Maximum total compressed size before LRU eviction
+        """
+        self.cache_dir = cache_dir
+        self.default_ttl = default_ttl
+        self.source_ttls = dict(source_ttls or {})
+        self.max_bytes = max_bytes
+        self.stats = {
+            'hits': 0,
+            'revalidated': 0,
+            'misses': 0,
+            'evictions': 0,
+            'bytes_downloaded': 0,
+            'bytes_saved': 0
+        }
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._index = self._load_index()
+
+    def _load_index(self) -> 'OrderedDict[str, Dict]':
+        """Load the LRU-ordered entry index (oldest first)"""
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        try:
+            with open(path, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return OrderedDict()
+
+        index = OrderedDict()
+        for key, entry in entries:
+            if os.path.exists(self._body_path(key)):
+                index[key] = entry
+        return index
+
+    def flush(self):
+        """
+        Persist the index, including the current LRU order
+
+        Stores and revalidations persist immediately; fresh hits only
+        reorder the in-memory index, so call this once at the end of a run.
+        """
+        with self._lock:
+            path = os.path.join(self.cache_dir, self.INDEX_FILE)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(list(self._index.items()), f)
+            os.replace(tmp_path, path)
+
+    def key(self, url: str, params: Optional[Dict] = None) -> str:
+        """Stable cache key for a request"""
+        request = json.dumps([url, sorted((params or {}).items())], default=str)
+        return hashlib.sha256(request.encode()).hexdigest()
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json.gz")
+
+    def ttl(self, source: Optional[str]) -> float:
+        """TTL in seconds for a data source"""
+        return self.source_ttls.get(source, self.default_ttl)
+
+    def _read_body(self, key: str) -> Optional[bytes]:
+        """Read and decompress a cached body, marking it recently used"""
+        try:
+            with gzip.open(self._body_path(key), 'rb') as f:
+                body = f.read()
+        except OSError:
+            # Body removed behind our back; drop the entry for later runs too
+            self._index.pop(key, None)
+            self.flush()
+            return None
+        self._index.move_to_end(key)
+        return body
+
+    def fresh_body(self, source: Optional[str], url: str,
+                   params: Optional[Dict] = None) -> Optional[bytes]:
+        """
+        Return the cached body if it is within its TTL
+
+        Args:
+            source: Data source name used to pick the TTL
+            url: Request URL
+            params: Query string parameters
+
+        Returns:
+            Response body, or None if the entry is missing or stale
+        """
+        with self._lock:
+            key = self.key(url, params)
+            entry = self._index.get(key)
+            if entry is None or time.time() - entry['fetched_at'] > self.ttl(source):
+                return None
+
+            body = self._read_body(key)
+            if body is not None:
+                self.stats['hits'] += 1
+                self.stats['bytes_saved'] += len(body)
+            return body
+
+    def conditional_headers(self, url: str, params: Optional[Dict] = None) -> Dict[str, str]:
+        """Validators for a conditional GET of a cached (stale) entry"""
+        with self._lock:
+            entry = self._index.get(self.key(url, params))
+            headers = {}
+            if entry:
+                if entry.get('etag'):
+                    headers['If-None-Match'] = entry['etag']
+                if entry.get('last_modified'):
+                    headers['If-Modified-Since'] = entry['last_modified']
+            return headers
+
+    def not_modified(self, url: str, params: Optional[Dict] = None) -> Optional[bytes]:
+        """
+        Handle a 304 response: renew the entry and return its cached body
+
+        Returns:
+            Cached body, or None if the entry disappeared
+        """
+        with self._lock:
+            key = self.key(url, params)
+            entry = self._index.get(key)
+            body = self._read_body(key) if entry else None
+            if body is None:
+                return None
+
+            entry['fetched_at'] = time.time()
+            self.stats['revalidated'] += 1
+            self.stats['bytes_saved'] += len(body)
+            self.flush()
+            return body
+
+    def store(self, source: Optional[str], url: str, params: Optional[Dict],
+              body: bytes, etag: Optional[str] = None,
+              last_modified: Optional[str] = None):
+        """
+        Store a freshly downloaded body
+
+        Args:
+            source: Data source name
+            url: Request URL
+            params: Query string parameters
+            body: Raw response body
+            etag: ETag response header
+            last_modified: Last-Modified response header
+        """
+        with self._lock:
+            key = self.key(url, params)
+            path = self._body_path(key)
+            tmp_path = f"{path}.tmp"
+            with gzip.open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+
+            self._index.pop(key, None)
+            self._index[key] = {
+                'source': source,
+                'etag': etag,
+                'last_modified': last_modified,
+                'fetched_at': time.time(),
+                'size': os.path.getsize(path)
+            }
+            self.stats['misses'] += 1
+            self.stats['bytes_downloaded'] += len(body)
+
+            self._evict()
+            self.flush()
+
+    def _evict(self):
+        """Drop least recently used entries until under max_bytes"""
+        total = sum(entry['size'] for entry in self._index.values())
+        while total > self.max_bytes and len(self._index) > 1:
+            key, entry = self._index.popitem(last=False)
+            total -= entry['size']
+            try:
+                os.remove(self._body_path(key))
+            except OSError:
+                pass
+            self.stats['evictions'] += 1
+
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from cache (fresh or revalidated)"""
+        served = self.stats['hits'] + self.stats['revalidated']
+        total = served + self.stats['misses']
+        return served / total if total else 0.0
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Incremental Refresh
+Per-feature content-hash manifests and layer deltas between pipeline runs
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from provenance import canonical_hash
+
+# Properties that identify a feature across runs, in order of preference
+KEY_PROPERTIES = ('site_code', 'EPA_ID', 'location', 'site_name', 'SITE_NAME')
+
+
+def content_hash(data) -> str:
+    """Canonical hash of data; values JSON cannot encode are hashed as str()"""
+    return canonical_hash(data, default=str)
+
+
+def feature_key(properties: Dict, lat: float, lon: float) -> str:
+    """Stable identity for a feature: an ID property, else its position"""
+    for name in KEY_PROPERTIES:
+        value = properties.get(name)
+        if value not in (None, ''):
+            return f"{name}:{value}"
+    return f"point:{lon:.6f},{lat:.6f}"
+
+
+def unique_feature_key(properties: Dict, lat: float, lon: float, taken) -> str:
+    """feature_key, suffixed with #2, #3, ... if already in taken"""
+    key = base = feature_key(properties, lat, lon)
+    duplicate = 1
+    while key in taken:
+        duplicate += 1
+        key = f"{base}#{duplicate}"
+    return key
+
+
+class LayerDelta:
+    """Features added, changed and removed in a layer since the last run"""
+
+    def __init__(self):
+        self.added: List[Tuple[str, object]] = []      # (key, item)
+        self.changed: List[Tuple[str, object]] = []    # (key, item)
+        self.removed: List[str] = []                   # keys
+        self.unchanged = 0
+        # Positions touched by the delta: new positions of added/changed
+        # items and old positions of changed/removed ones
+        self.positions: List[Tuple[float, float]] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def summary(self) -> Dict:
+        return {
+            'added': len(self.added),
+            'changed': len(self.changed),
+            'removed': len(self.removed),
+            'unchanged': self.unchanged
+        }
+
+
+class LayerManifest:
+    """
+    Per-feature hashes and positions recorded by the previous run
+
+    The manifest is a JSON file of {layer: {feature key: [hash, lat, lon]}}.
+    Each pipeline stage keeps its own manifest so it can tell which of its
+    inputs changed since it last ran.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.layers: Dict[str, Dict[str, List]] = {}
+        self.generated_at = None
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            self.layers = data.get('layers', {})
+            self.generated_at = data.get('generated_at')
+
+    def entries(self, items: Iterable, coords_fn: Callable, properties_fn: Callable,
+                hash_fn: Callable = content_hash) -> Tuple[Dict[str, List], Dict[str, object]]:
+        """
+        Compute manifest entries for a layer
+
+        Args:
+            items: Features or point records
+            coords_fn: item -> (lat, lon)
+            properties_fn: item -> properties used for the feature key
+            hash_fn: item -> content hash
+
+        Returns:
+            Tuple of ({key: [hash, lat, lon]}, {key: item})
+        """
+        entries, by_key = {}, {}
+        for item in items:
+            lat, lon = coords_fn(item)
+            key = unique_feature_key(properties_fn(item), lat, lon, entries)
+            entries[key] = [hash_fn(item), lat, lon]
+            by_key[key] = item
+        return entries, by_key
+
+    def diff(self, layer: str, entries: Dict[str, List],
+             by_key: Dict[str, object]) -> LayerDelta:
+        """
+        Compare a layer's current entries against the manifest
+
+        Args:
+            layer: Layer name
+            entries: Current {key: [hash, lat, lon]}
+            by_key: Current {key: item}
+
+        Returns:
+            LayerDelta (everything is 'added' for a layer not in the manifest)
+        """
+        previous = self.layers.get(layer, {})
+        delta = LayerDelta()
+
+        for key, (digest, lat, lon) in entries.items():
+            old = previous.get(key)
+            if old is None:
+                delta.added.append((key, by_key[key]))
+                delta.positions.append((lat, lon))
+            elif old[0] != digest:
+                delta.changed.append((key, by_key[key]))
+                delta.positions.append((lat, lon))
+                delta.positions.append((old[1], old[2]))
+            else:
+                delta.unchanged += 1
+
+        for key, (_, lat, lon) in previous.items():
+            if key not in entries:
+                delta.removed.append(key)
+                delta.positions.append((lat, lon))
+
+        return delta
+
+    def update(self, layer: str, entries: Dict[str, List]):
+        """Record a layer's current entries"""
+        self.layers[layer] = entries
+
+    def refresh(self, layer: str, items: Iterable, coords_fn: Callable,
+                properties_fn: Callable, hash_fn: Callable = content_hash) -> LayerDelta:
+        """
+        Diff a layer against the manifest and record its current state
+
+        Args:
+            layer: Layer name
+            items: Features or point records
+            coords_fn: item -> (lat, lon)
+            properties_fn: item -> properties used for the feature key
+            hash_fn: item -> content hash
+
+        Returns:
+            LayerDelta since the previous run
+        """
+        entries, by_key = self.entries(items, coords_fn, properties_fn, hash_fn)
+        delta = self.diff(layer, entries, by_key)
+        self.update(layer, entries)
+        return delta
+
+    def save(self):
+        """Write the manifest atomically"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'generated_at': datetime.now().isoformat(), 'layers': self.layers}, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Run Instrumentation
+Per-stage timers, counters and peak-RSS sampling with JSON and Prometheus output
+"""
+
+import functools
+import json
+import re
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, Optional
+
+# Shared no-op context manager returned by disabled timers
+_NULL_TIMER = nullcontext()
+
+_METRIC_NAME = re.compile(r'[^a-zA-Z0-9_]')
+
+
+def peak_rss_bytes(who: int = resource.RUSAGE_SELF) -> int:
+    """High-water resident set size of this process (or its reaped children)"""
+    rss = resource.getrusage(who).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024  # Linux reports KiB
+
+
+class Instrumentation:
+    """
+    Collect stage timings and counters for one run
+
+    Stages are timed with ``with metrics.timer('fetch.air_quality'):``;
+    each stage records its calls, total and longest duration, and the peak
+    RSS of the process when it last finished along with how much it raised
+    that high-water mark. Counters accumulate integers such as features
+    processed, HTTP bytes and cache hits.
+
+    A disabled instance returns a shared no-op context manager from
+    timer() and returns immediately from count(), so instrumented code
+    pays one method call per stage. Timings from worker processes are not
+    collected; the stage wrapping the pool is.
+    """
+
+    def __init__(self, enabled: bool = True, namespace: str = 'eic'):
+        """
+        Args:
+            enabled: Record timings and counters; when False every call is a no-op
+            namespace: Prefix of the Prometheus metric names
+        """
+        self.enabled = enabled
+        self.namespace = namespace
+        self.started_at = datetime.now().isoformat()
+        self.stages: Dict[str, Dict] = {}
+        self.counters: Dict[str, int] = {}
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def timer(self, stage: str):
+        """
+        Context manager timing one run of a stage
+
+        Args:
+            stage: Dotted stage name, e.g. 'geojson.build'
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timed(stage)
+
+    @contextmanager
+    def _timed(self, stage: str):
+        rss_before = peak_rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, rss_before)
+
+    def record(self, stage: str, seconds: float, rss_before: Optional[int] = None):
+        """
+        Add an externally measured stage duration
+
+        Args:
+            stage: Dotted stage name
+            seconds: Duration of the run
+            rss_before: Peak RSS when the run started, if known
+        """
+        if not self.enabled:
+            return
+        rss = peak_rss_bytes()
+        with self._lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                                              'peak_rss_bytes': 0, 'rss_growth_bytes': 0}
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+            entry['peak_rss_bytes'] = rss
+            if rss_before is not None:
+                entry['rss_growth_bytes'] += rss - rss_before
+
+    def count(self, name: str, value: int = 1):
+        """
+        Increment a counter
+
+        Args:
+            name: Counter name, e.g. 'http_bytes'
+            value: Amount to add
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self) -> Dict:
+        """
+        Machine-readable run report
+
+        Returns:
+            Dict with run timing, per-stage timings, counters and peak RSS
+        """
+        with self._lock:
+            stages = {
+                name: dict(entry, seconds=round(entry['seconds'], 6),
+                           max_seconds=round(entry['max_seconds'], 6))
+                for name, entry in self.stages.items()
+            }
+            counters = dict(self.counters)
+        return {
+            'started_at': self.started_at,
+            'finished_at': datetime.now().isoformat(),
+            'duration_seconds': round(time.perf_counter() - self._start, 6),
+            'peak_rss_bytes': peak_rss_bytes(),
+            'children_peak_rss_bytes': peak_rss_bytes(resource.RUSAGE_CHILDREN),
+            'stages': stages,
+            'counters': counters
+        }
+
+    def prometheus_text(self, job: Optional[str] = None) -> str:
+        """
+        The run report in Prometheus text exposition format
+
+        Stage metrics are labelled by stage, counters become
+        <namespace>_<name>_total. Suitable for the node_exporter textfile
+        collector or a Pushgateway.
+
+        Args:
+            job: Optional job label added to every sample
+        """
+        report = self.report()
+        ns = self.namespace
+        base = f'job="{_escape(job)}"' if job else ''
+
+        def labels(**extra) -> str:
+            parts = [base] if base else []
+            parts += [f'{key}="{_escape(value)}"' for key, value in extra.items()]
+            return '{' + ','.join(parts) + '}' if parts else ''
+
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for label_text, value in samples:
+                lines.append(f"{name}{label_text} {value}")
+
+        stages = sorted(report['stages'].items())
+        metric(f"{ns}_stage_seconds_total", 'counter', 'Total time spent in each stage.',
+               [(labels(stage=name), entry['seconds']) for name, entry in stages])
+        metric(f"{ns}_stage_calls_total", 'counter', 'Runs of each stage.',
+               [(labels(stage=name), entry['calls']) for name, entry in stages])
+        metric(f"{ns}_stage_max_seconds", 'gauge', 'Longest single run of each stage.',
+               [(labels(stage=name), entry['max_seconds']) for name, entry in stages])
+        metric(f"{ns}_stage_rss_growth_bytes", 'gauge',
+               'Increase in peak resident memory during each stage.',
+               [(labels(stage=name), entry['rss_growth_bytes']) for name, entry in stages])
+        for name, value in sorted(report['counters'].items()):
+            metric(f"{ns}_{_METRIC_NAME.sub('_', name)}_total", 'counter',
+                   f"Counter {name}.", [(labels(), value)])
+        metric(f"{ns}_peak_rss_bytes", 'gauge', 'Peak resident memory of the run.',
+               [(labels(), report['peak_rss_bytes'])])
+        metric(f"{ns}_run_duration_seconds", 'gauge', 'Wall time of the run.',
+               [(labels(), report['duration_seconds'])])
+        return '\n'.join(lines) + '\n'
+
+    def save(self, path: str):
+        """Write the run report as JSON"""
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        print(f"Saved: {path}")
+
+    def save_prometheus(self, path: str, job: Optional[str] = None):
+        """Write the run report in Prometheus text format"""
+        with open(path, 'w') as f:
+            f.write(self.prometheus_text(job))
+        print(f"Saved: {path}")
+
+
+def timed(stage: str):
+    """Method decorator timing every call as stage on the instance's metrics"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.timer(stage):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _escape(value) -> str:
+    """Escape a Prometheus label value"""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def from_args(metrics_path: Optional[str], prometheus_path: Optional[str]) -> Instrumentation:
+    """Instrumentation enabled only when a main() was asked for a report"""
+    return Instrumentation(enabled=bool(metrics_path or prometheus_path))
+
+
+def write_reports(metrics: Instrumentation, metrics_path: Optional[str],
+                  prometheus_path: Optional[str], job: str):
+    """Write whichever reports a main() was asked for"""
+    if metrics_path:
+        metrics.save(metrics_path)
+    if prometheus_path:
+        metrics.save_prometheus(prometheus_path, job)
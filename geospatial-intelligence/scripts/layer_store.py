@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Columnar Layer Store
+Binary, memory-mappable point layers stored as a directory of NumPy arrays
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+LAYER_SUFFIX = '.layer'
+SCHEMA_FILE = 'schema.json'
+FORMAT_VERSION = 1
+
+
+def _column_type(values: List[Any]) -> str:
+    """Pick the narrowest storage type for a property column"""
+    present = [v for v in values if v is not None]
+    if not present:
+        return 'json'
+    if all(isinstance(v, bool) for v in present):
+        return 'bool'
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return 'int'
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return 'float'
+    if all(isinstance(v, str) for v in present):
+        return 'str'
+    return 'json'
+
+
+def _encode_column(values: List[Any], column_type: str) -> np.ndarray:
+    """Encode a property column as a fixed-width NumPy array"""
+    if column_type == 'bool':
+        return np.array([bool(v) for v in values], dtype=np.bool_)
+    if column_type == 'int':
+        return np.array([0 if v is None else v for v in values], dtype=np.int64)
+    if column_type == 'float':
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    if column_type == 'str':
+        return np.array(['' if v is None else v for v in values], dtype=np.str_)
+    return np.array(['' if v is None else json.dumps(v) for v in values], dtype=np.str_)
+
+
+def write_columnar_layer(path: str, features: Iterable[Dict],
+                         metadata: Optional[Dict] = None) -> Dict:
+    """
+    Write Point features as a columnar layer directory
+
+    Coordinates become float64 lat/lon arrays. Each property becomes a
+    typed column: bool, int64, float64 (mixed int/float), fixed-width
+    unicode strings, or JSON-encoded strings for nested values. Columns
+    with missing values get a boolean presence mask.
+
+    Args:
+        path: Layer directory (conventionally ending in .layer)
+        features: GeoJSON Point features
+        metadata: Collection metadata stored alongside the schema
+
+    Returns:
+        The layer schema
+    """
+    lats, lons = [], []
+    columns = {}  # name -> list of values, None where missing
+
+    for row, feature in enumerate(features):
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') != 'Point':
+            raise ValueError(f"Feature {row}: columnar layers only store Point geometries")
+        lon, lat = geometry['coordinates'][:2]
+        lons.append(float(lon))
+        lats.append(float(lat))
+
+        properties = feature.get('properties') or {}
+        for name, value in properties.items():
+            if name not in columns:
+                columns[name] = [None] * row
+            columns[name].append(value)
+        for name, values in columns.items():
+            if len(values) == row:
+                values.append(None)
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, 'latitude.npy'), np.array(lats, dtype=np.float64))
+    np.save(os.path.join(path, 'longitude.npy'), np.array(lons, dtype=np.float64))
+
+    schema_columns = []
+    for position, (name, values) in enumerate(columns.items()):
+        column_type = _column_type(values)
+        try:
+            encoded = _encode_column(values, column_type)
+        except OverflowError:  # Integers beyond int64
+            column_type = 'json'
+            encoded = _encode_column(values, column_type)
+        filename = f"col_{position:04d}.npy"
+        np.save(os.path.join(path, filename), encoded)
+
+        column = {'name': name, 'type': column_type, 'file': filename}
+        if any(v is None for v in values):
+            column['mask'] = f"col_{position:04d}.mask.npy"
+            np.save(os.path.join(path, column['mask']),
+                    np.array([v is not None for v in values], dtype=np.bool_))
+        schema_columns.append(column)
+
+    schema = {
+        'format_version': FORMAT_VERSION,
+        'feature_count': len(lats),
+        'metadata': dict(metadata or {}, feature_count=len(lats)),
+        'columns': schema_columns
+    }
+    with open(os.path.join(path, SCHEMA_FILE), 'w') as f:
+        json.dump(schema, f, indent=2)
+
+    return schema
+
+
+class ColumnarLayer:
+    """
+    Read-only view of a columnar layer
+
+    Arrays are memory-mapped by default, so opening a layer is cheap and
+    only touched pages are read. The layer behaves as a sequence of point
+    records (property dicts plus latitude/longitude), so it can be passed
+    anywhere SpatialAnalyzer accepts a list of points.
+    """
+
+    def __init__(self, path: str, mmap: bool = True):
+        """
+        Args:
+            path: Layer directory
+            mmap: Memory-map the arrays instead of reading them into memory
+        """
+        self.path = path
+        with open(os.path.join(path, SCHEMA_FILE), 'r') as f:
+            self.schema = json.load(f)
+        if self.schema.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar layer version in {path}")
+
+        mmap_mode = 'r' if mmap else None
+        self.metadata = self.schema.get('metadata', {})
+        self.latitude = np.load(os.path.join(path, 'latitude.npy'), mmap_mode=mmap_mode)
+        self.longitude = np.load(os.path.join(path, 'longitude.npy'), mmap_mode=mmap_mode)
+        self.columns = {}
+        self._masks = {}
+        self._types = {}
+        for column in self.schema['columns']:
+            name = column['name']
+            self.columns[name] = np.load(os.path.join(path, column['file']), mmap_mode=mmap_mode)
+            self._types[name] = column['type']
+            if 'mask' in column:
+                self._masks[name] = np.load(os.path.join(path, column['mask']),
+                                            mmap_mode=mmap_mode)
+
+    def __len__(self) -> int:
+        return len(self.latitude)
+
+    def __getitem__(self, i: int) -> Dict:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        record = self.properties(i)
+        record['latitude'] = float(self.latitude[i])
+        record['longitude'] = float(self.longitude[i])
+        return record
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def coords(self) -> np.ndarray:
+        """(n, 2) array of lat/lon"""
+        return np.column_stack((self.latitude, self.longitude))
+
+    def properties(self, i: int) -> Dict:
+        """Decode the properties of row i back into Python values"""
+        properties = {}
+        for name, column in self.columns.items():
+            mask = self._masks.get(name)
+            if mask is not None and not mask[i]:
+                continue
+            value = column[i]
+            column_type = self._types[name]
+            if column_type == 'json':
+                properties[name] = json.loads(str(value))
+            elif column_type == 'str':
+                properties[name] = str(value)
+            else:
+                properties[name] = value.item()
+        return properties
+
+    def iter_features(self) -> Iterator[Dict]:
+        """Yield the layer as GeoJSON Point features"""
+        for i in range(len(self)):
+            yield {
+                'type': 'Feature',
+                'geometry': {
+                    'type': 'Point',
+                    'coordinates': [float(self.longitude[i]), float(self.latitude[i])]
+                },
+                'properties': self.properties(i)
+            }
+
+    def to_geojson(self) -> Dict:
+        """Materialize the layer as a GeoJSON FeatureCollection"""
+        return {
+            'type': 'FeatureCollection',
+            'metadata': dict(self.metadata),
+            'features': list(self.iter_features())
+        }
+
+
+def is_columnar_layer(path: str) -> bool:
+    """True if path is a columnar layer directory"""
+    return os.path.isfile(os.path.join(path, SCHEMA_FILE))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Measurement Store
+Per-site, typed storage for USGS instantaneous-value time series
+"""
+
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# USGS parameter codes requested by EnvironmentalDataProcessor
+PARAMETER_NAMES = {
+    '00010': 'temperature',       # Temperature, water, deg C
+    '00095': 'conductivity',      # Specific conductance, uS/cm at 25 deg C
+    '00300': 'dissolved_oxygen'   # Dissolved oxygen, mg/L
+}
+
+
+class SiteSeries:
+    """All measurements for one monitoring site, pivoted by parameter code"""
+
+    __slots__ = ('site_code', 'site_name', 'latitude', 'longitude', 'series')
+
+    def __init__(self, site_code: str, site_name: str, latitude: float, longitude: float):
+        self.site_code = site_code
+        self.site_name = site_name
+        self.latitude = latitude
+        self.longitude = longitude
+        # parameter code -> (timestamps, float values)
+        self.series: Dict[str, Tuple[List[datetime], array]] = {}
+
+    def add(self, parameter_code: str, timestamp: datetime, value: float):
+        """Append one observation"""
+        if parameter_code not in self.series:
+            self.series[parameter_code] = ([], array('d'))
+        timestamps, values = self.series[parameter_code]
+        timestamps.append(timestamp)
+        values.append(value)
+
+    def latest(self, parameter_code: str) -> Optional[Tuple[datetime, float]]:
+        """Most recent (timestamp, value) for a parameter, or None"""
+        if parameter_code not in self.series:
+            return None
+        timestamps, values = self.series[parameter_code]
+        if not values:
+            return None
+        i = max(range(len(timestamps)), key=timestamps.__getitem__)
+        return timestamps[i], values[i]
+
+    def to_record(self) -> Dict:
+        """
+        Flatten to a data point with the latest value of each parameter
+
+        Parameters are keyed by name (temperature, conductivity,
+        dissolved_oxygen) like the sample water data, so the record feeds
+        generate_geojson and calculate_ej_risk_score directly.
+        """
+        record = {
+            'site_code': self.site_code,
+            'site_name': self.site_name,
+            'latitude': self.latitude,
+            'longitude': self.longitude
+        }
+        observed = []
+        for code in sorted(self.series):
+            latest = self.latest(code)
+            if latest is None:
+                continue
+            timestamp, value = latest
+            record[PARAMETER_NAMES.get(code, code)] = value
+            observed.append(timestamp)
+        if observed:
+            record['timestamp'] = max(observed).isoformat()
+        return record
+
+
+class MeasurementStore:
+    """Site-keyed store of typed USGS measurements"""
+
+    def __init__(self):
+        self.sites: Dict[str, SiteSeries] = {}
+
+    def __len__(self) -> int:
+        return len(self.sites)
+
+    @classmethod
+    def from_usgs(cls, raw_data: Dict) -> 'MeasurementStore':
+        """Build a store from a USGS NWIS instantaneous-values JSON response"""
+        store = cls()
+        store.add_usgs_response(raw_data)
+        return store
+
+    def add_usgs_response(self, raw_data: Dict):
+        """
+        Merge a USGS NWIS JSON response into the store
+
+        Each time series contributes its parsed float values and timestamps
+        to its site. Series without a site code or coordinates are skipped,
+        as are no-data sentinels and unparsable values.
+        """
+        if 'value' not in raw_data or 'timeSeries' not in raw_data['value']:
+            return
+
+        for ts in raw_data['value']['timeSeries']:
+            try:
+                site_info = ts['sourceInfo']
+                site_code = site_info['siteCode'][0]['value']
+                location = site_info['geoLocation']['geogLocation']
+                latitude = float(location['latitude'])
+                longitude = float(location['longitude'])
+                variable = ts['variable']
+                parameter_code = variable['variableCode'][0]['value']
+            except (KeyError, IndexError, TypeError, ValueError):
+                continue
+
+            site = self.sites.get(site_code)
+            if site is None:
+                site = SiteSeries(site_code, site_info.get('siteName', ''), latitude, longitude)
+                self.sites[site_code] = site
+
+            no_data = variable.get('noDataValue')
+            for block in ts.get('values', []):
+                for observation in block.get('value', []):
+                    try:
+                        value = float(observation['value'])
+                        timestamp = datetime.fromisoformat(observation['dateTime'])
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    if no_data is not None and value == no_data:
+                        continue
+                    site.add(parameter_code, timestamp, value)
+
+    def records(self) -> List[Dict]:
+        """One flattened data point per site, in first-seen order"""
+        return [site.to_record() for site in self.sites.values()]
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Pipeline Runner
+Runs fetch -> normalize -> score -> validate -> export as one dependency graph
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from data_validation import DataValidator
+from environmental_data_processor import EnvironmentalDataProcessor
+from instrumentation import Instrumentation, from_args, write_reports
+from point_layer import PointLayer
+from provenance import canonical_hash
+from spatial_analysis import SpatialAnalyzer, demographic_vulnerability
+
+# outputs/ next to scripts/, wherever the pipeline is started from
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  'outputs')
+
+# (data type, output file stem) of every layer
+LAYERS = (
+    ('air_quality', 'california_air_quality'),
+    ('water_quality', 'california_water_quality'),
+    ('superfund_sites', 'california_superfund_sites')
+)
+
+# Per-record fields stamped with the time a record was fetched; they change
+# on every run, so fetch and normalize fingerprints leave them out
+VOLATILE_FIELDS = ('timestamp',)
+
+
+class Stage:
+    """One node of a Pipeline"""
+
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Any],
+                 inputs: Iterable[str] = (), always_run: bool = False,
+                 fingerprint: Callable[[Any], str] = canonical_hash,
+                 outputs: Iterable[str] = (), params: Optional[Dict] = None):
+        """
+        Args:
+            name: Unique stage name, e.g. 'normalize.air_quality'
+            func: Called with {input stage name: artifact}; returns this
+                stage's artifact (JSON-serializable)
+            inputs: Names of the stages whose artifacts func needs
+            always_run: Never skip the stage (sources such as upstream fetches)
+            fingerprint: Hash of the artifact that dependents are keyed on;
+                leave volatile fields such as generation times out of it
+            outputs: Files the stage writes; it reruns if any is missing
+            params: Settings that change the stage's result, part of its key
+        """
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.always_run = always_run
+        self.fingerprint = fingerprint
+        self.outputs = list(outputs)
+        self.params = dict(params or {})
+
+
+class Pipeline:
+    """
+    Run stages as a dependency graph
+
+    A stage starts as soon as every stage it depends on has finished, so
+    independent stages run concurrently on a thread pool. Artifacts are
+    passed between stages in memory.
+
+    A stage is skipped when its key - the fingerprints of its inputs plus
+    its params and outputs - matches the key it last ran with and its
+    output files still exist. Its artifact is then loaded from the work
+    directory only if a dependent that does run needs it.
+    """
+
+    STATE_FILE = 'pipeline_state.json'
+
+    def __init__(self, work_dir: str, workers: int = 4, force: bool = False,
+                 instrumentation: Instrumentation = None):
+        """
+        Args:
+            work_dir: Directory for the run state and stored artifacts
+            workers: Maximum number of stages running at once
+            force: Run every stage even if its inputs are unchanged
+            instrumentation: Collects stage timings and counters (disabled by default)
+        """
+        self.work_dir = work_dir
+        self.workers = max(1, workers)
+        self.force = force
+        self.metrics = instrumentation or Instrumentation(enabled=False)
+        self.stages: Dict[str, Stage] = {}
+        self._artifacts: Dict[str, Any] = {}
+        self._artifact_lock = threading.Lock()
+
+        os.makedirs(os.path.join(work_dir, 'artifacts'), exist_ok=True)
+        self.state = self._load_state()
+
+    def add(self, name: str, func: Callable[[Dict[str, Any]], Any],
+            inputs: Iterable[str] = (), **options) -> Stage:
+        """Add a stage; options are passed to Stage"""
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        stage = Stage(name, func, inputs, **options)
+        self.stages[name] = stage
+        return stage
+
+    def order(self, targets: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Stages needed for targets, each after the stages it depends on
+
+        Args:
+            targets: Stage names to produce (default: every stage)
+
+        Returns:
+            Stage names in a valid execution order
+
+        Raises:
+            ValueError: For unknown stages or a dependency cycle
+        """
+        ordered = []
+        visiting = set()
+
+        def visit(name: str):
+            if name in ordered:
+                return
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage: {name}")
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through stage: {name}")
+            visiting.add(name)
+            for dependency in self.stages[name].inputs:
+                visit(dependency)
+            visiting.discard(name)
+            ordered.append(name)
+
+        for name in (targets if targets is not None else self.stages):
+            visit(name)
+        return ordered
+
+    def run(self, targets: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """
+        Run the stages needed for targets
+
+        Args:
+            targets: Stage names to produce (default: every stage)
+
+        Returns:
+            Per stage: status ('ran' or 'skipped') and seconds when it ran
+
+        Raises:
+            RuntimeError: When a stage fails; stages that completed keep
+                their state, so the next run resumes after them
+        """
+        pending = self.order(targets)
+        hashes = {}
+        results = {}
+        running = {}
+        failure = None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while pending or running:
+                # Skipping a stage can make its dependents ready, so keep
+                # scheduling until nothing more is ready
+                scheduled = failure is None
+                while scheduled:
+                    scheduled = False
+                    for name in [n for n in pending
+                                 if all(d in hashes for d in self.stages[n].inputs)]:
+                        pending.remove(name)
+                        stage = self.stages[name]
+                        key = self._stage_key(stage, hashes)
+                        if self._can_skip(stage, key):
+                            hashes[name] = self.state[name]['output_hash']
+                            results[name] = {'status': 'skipped'}
+                            self.metrics.count('stages_skipped')
+                            scheduled = True
+                        else:
+                            running[executor.submit(self._execute, stage)] = (name, key)
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, key = running.pop(future)
+                    try:
+                        output_hash, seconds = future.result()
+                    except Exception as e:
+                        print(f"Stage {name} failed: {e}")
+                        failure = failure or (name, e)
+                        continue
+                    hashes[name] = output_hash
+                    self.state[name] = {
+                        'key': key,
+                        'output_hash': output_hash,
+                        'completed_at': datetime.now().isoformat()
+                    }
+                    results[name] = {'status': 'ran', 'seconds': round(seconds, 3)}
+                    self.metrics.count('stages_run')
+
+        self._save_state()
+        if failure is not None:
+            name, error = failure
+            raise RuntimeError(f"Pipeline stage {name} failed: {error}") from error
+        return results
+
+    def artifact(self, name: str) -> Any:
+        """Artifact of a stage from this run, or stored by its last run"""
+        with self._artifact_lock:
+            if name not in self._artifacts:
+                with open(self._artifact_path(name), 'r') as f:
+                    self._artifacts[name] = json.load(f)
+            return self._artifacts[name]
+
+    def _stage_key(self, stage: Stage, hashes: Dict[str, str]) -> str:
+        """Hash of everything that determines a stage's result"""
+        return canonical_hash({
+            'inputs': {name: hashes[name] for name in stage.inputs},
+            'params': stage.params,
+            'outputs': stage.outputs
+        })
+
+    def _can_skip(self, stage: Stage, key: str) -> bool:
+        """Whether a stage's last result is still current"""
+        previous = self.state.get(stage.name)
+        return (not self.force and not stage.always_run
+                and previous is not None and previous['key'] == key
+                and os.path.exists(self._artifact_path(stage.name))
+                and all(os.path.exists(path) for path in stage.outputs))
+
+    def _execute(self, stage: Stage):
+        """Run one stage; returns (artifact fingerprint, seconds)"""
+        inputs = {name: self.artifact(name) for name in stage.inputs}
+        start = time.perf_counter()
+        with self.metrics.timer(f'pipeline.{stage.name}'):
+            artifact = stage.func(inputs)
+        seconds = time.perf_counter() - start
+
+        with self._artifact_lock:
+            self._artifacts[stage.name] = artifact
+        if not stage.always_run:
+            # Stored so a later run can skip this stage but still feed a
+            # dependent that has to run
+            path = self._artifact_path(stage.name)
+            with open(f"{path}.tmp", 'w') as f:
+                json.dump(artifact, f)
+            os.replace(f"{path}.tmp", path)
+        return stage.fingerprint(artifact), seconds
+
+    def _artifact_path(self, name: str) -> str:
+        return os.path.join(self.work_dir, 'artifacts', f"{name}.json")
+
+    def _load_state(self) -> Dict[str, Dict]:
+        """Keys and output fingerprints of the last run of every stage"""
+        try:
+            with open(os.path.join(self.work_dir, self.STATE_FILE), 'r') as f:
+                return json.load(f).get('stages', {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        path = os.path.join(self.work_dir, self.STATE_FILE)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump({'updated_at': datetime.now().isoformat(), 'stages': self.state}, f,
+                      indent=2)
+        os.replace(f"{path}.tmp", path)
+
+
+def build_pipeline(output_dir: str = DEFAULT_OUTPUT_DIR, work_dir: Optional[str] = None,
+                   workers: int = 4, force: bool = False, api_key: Optional[str] = None,
+                   cache_dir: Optional[str] = None, analysis_workers: int = 1,
+                   instrumentation: Instrumentation = None) -> Pipeline:
+    """
+    The ThrivingRoots pipeline
+
+    Stages:
+        fetch.<layer>      Upstream data points (always run)
+        normalize.<layer>  GeoJSON FeatureCollection
+        validate.<layer>   Quality checks on the in-memory collection
+        score              Risk assessments, priority areas and heatmap
+        export.<layer>     <output_dir>/california_<layer>.geojson
+        export.wordpress   wordpress_import_data.json
+        export.analysis    risk_assessments.json, priority_areas.json, heatmap_data.json
+        export.quality     quality_report.json
+
+    Args:
+        output_dir: Directory the exports are written to
+        work_dir: Run state directory (default: <output_dir>/.pipeline)
+        workers: Maximum number of stages running at once
+        force: Rerun every stage
+        api_key: AirNow API key (sample air data is used without one)
+        cache_dir: Enables the on-disk response cache for fetches
+        analysis_workers: Worker processes for risk scoring
+        instrumentation: Shared by the pipeline, processor, analyzer and validator
+
+    Returns:
+        Pipeline ready to run
+    """
+    metrics = instrumentation or Instrumentation(enabled=False)
+    os.makedirs(output_dir, exist_ok=True)
+    processor = EnvironmentalDataProcessor(output_dir=output_dir, cache_dir=cache_dir,
+                                           instrumentation=metrics)
+    analyzer = SpatialAnalyzer(instrumentation=metrics)
+    validator = DataValidator(instrumentation=metrics)
+    pipeline = Pipeline(work_dir or os.path.join(output_dir, '.pipeline'), workers=workers,
+                        force=force, instrumentation=metrics)
+
+    fetchers = {
+        'air_quality': lambda: processor.fetch_air_quality_data(api_key=api_key),
+        'water_quality': processor.fetch_water_quality_data,
+        'superfund_sites': processor.fetch_superfund_sites
+    }
+    for data_type, layer_name in LAYERS:
+        _add_layer_stages(pipeline, processor, validator, data_type, layer_name,
+                          fetchers[data_type])
+
+    def score(inputs):
+        air, water, superfund = (PointLayer.from_features(inputs[f'normalize.{data_type}']['features'])
+                                 for data_type, _ in LAYERS)
+        risk_assessments = analyzer.calculate_ej_risk_scores(
+            air, superfund, air, water,
+            demographic_vulnerability=demographic_vulnerability(air),
+            workers=analysis_workers
+        )
+        return {
+            'risk_assessments': risk_assessments,
+            'priority_areas': analyzer.prioritize_remediation_areas(risk_assessments),
+            'heatmap': analyzer.generate_heatmap_data(risk_assessments)
+        }
+
+    pipeline.add('score', score, [f'normalize.{data_type}' for data_type, _ in LAYERS],
+                 params={'engine': analyzer.engine})
+
+    pipeline.add('export.wordpress',
+                 lambda inputs: processor.save_to_file(
+                     processor.generate_wordpress_import(inputs['normalize.air_quality']),
+                     'wordpress_import_data.json'),
+                 ['normalize.air_quality'],
+                 outputs=[os.path.join(output_dir, 'wordpress_import_data.json')])
+
+    analysis_files = {
+        'risk_assessments': 'risk_assessments.json',
+        'priority_areas': 'priority_areas.json',
+        'heatmap': 'heatmap_data.json'
+    }
+    pipeline.add('export.analysis',
+                 lambda inputs: [processor.save_to_file(inputs['score'][key], filename)
+                                 for key, filename in analysis_files.items()],
+                 ['score'],
+                 outputs=[os.path.join(output_dir, filename)
+                          for filename in analysis_files.values()])
+
+    def export_quality(inputs):
+        report = validator.summarize_reports(
+            [inputs[f'validate.{data_type}'] for data_type, _ in LAYERS])
+        return processor.save_to_file(report, 'quality_report.json')
+
+    pipeline.add('export.quality', export_quality,
+                 [f'validate.{data_type}' for data_type, _ in LAYERS],
+                 outputs=[os.path.join(output_dir, 'quality_report.json')])
+    return pipeline
+
+
+def _add_layer_stages(pipeline: Pipeline, processor: EnvironmentalDataProcessor,
+                      validator: DataValidator, data_type: str, layer_name: str,
+                      fetch: Callable[[], List[Dict]]):
+    """Fetch, normalize, validate and export stages of one layer"""
+    filename = f'{layer_name}.geojson'
+    path = os.path.join(processor.output_dir, filename)
+
+    def validate(inputs):
+        file_report = {'file': path}
+        file_report.update(validator.validate_document(inputs[f'normalize.{data_type}']))
+        file_report['quality_score'] = validator._quality_score(file_report)
+        return file_report
+
+    def fetch_layer(inputs):
+        try:
+            return fetch()
+        finally:
+            processor.flush_cache()
+
+    # Dependents are keyed on the data only, not on fetch or generation times
+    pipeline.add(f'fetch.{data_type}', fetch_layer, always_run=True,
+                 fingerprint=lambda records: canonical_hash(_without_volatile(records)))
+    pipeline.add(f'normalize.{data_type}',
+                 lambda inputs: processor.generate_geojson(inputs[f'fetch.{data_type}'], data_type),
+                 [f'fetch.{data_type}'],
+                 fingerprint=lambda geojson: canonical_hash(
+                     _without_volatile(geojson['features'])))
+    pipeline.add(f'validate.{data_type}', validate, [f'normalize.{data_type}'],
+                 params={'file': path})
+    pipeline.add(f'export.{data_type}',
+                 lambda inputs: processor.save_to_file(inputs[f'normalize.{data_type}'], filename),
+                 [f'normalize.{data_type}'], outputs=[path])
+
+
+def _without_volatile(records: List[Dict]) -> List[Dict]:
+    """Data points, or GeoJSON features' properties, minus VOLATILE_FIELDS"""
+    stable = []
+    for record in records:
+        properties = record.get('properties')
+        if isinstance(properties, dict):
+            record = dict(record, properties={key: value for key, value in properties.items()
+                                              if key not in VOLATILE_FIELDS})
+        else:
+            record = {key: value for key, value in record.items()
+                      if key not in VOLATILE_FIELDS}
+        stable.append(record)
+    return stable
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='ThrivingRoots Pipeline')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR,
+                        help='Directory for every exported file')
+    parser.add_argument('--work-dir', default=None,
+                        help='Run state directory (default: <output-dir>/.pipeline)')
+    parser.add_argument('--stages', nargs='+', default=None,
+                        help='Only produce these stages (and what they depend on)')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Maximum number of stages running at once')
+    parser.add_argument('--analysis-workers', type=int, default=1,
+                        help='Number of worker processes for risk scoring')
+    parser.add_argument('--force', action='store_true',
+                        help='Rerun every stage even if its inputs are unchanged')
+    parser.add_argument('--airnow-key', default=None, help='AirNow API key')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Cache upstream API responses in this directory')
+    parser.add_argument('--metrics', default=None,
+                        help='Write a JSON run report (stage timings, counters, peak RSS) here')
+    parser.add_argument('--prometheus', default=None,
+                        help='Write the run report in Prometheus text format here')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ThrivingRoots Pipeline")
+    print("=" * 60)
+
+    metrics = from_args(args.metrics, args.prometheus)
+    pipeline = build_pipeline(args.output_dir, args.work_dir, workers=args.workers,
+                              force=args.force, api_key=args.airnow_key,
+                              cache_dir=args.cache_dir,
+                              analysis_workers=args.analysis_workers,
+                              instrumentation=metrics)
+    results = pipeline.run(args.stages)
+
+    print("\n" + "=" * 60)
+    print("Pipeline Complete!")
+    print("=" * 60)
+    for name in pipeline.order(args.stages):
+        result = results[name]
+        if result['status'] == 'ran':
+            print(f"  {name:<26} ran in {result['seconds']:.3f}s")
+        else:
+            print(f"  {name:<26} skipped (unchanged)")
+    ran = sum(1 for result in results.values() if result['status'] == 'ran')
+    print(f"\nRan {ran} of {len(results)} stages; outputs in {args.output_dir}")
+    write_reports(metrics, args.metrics, args.prometheus, 'pipeline')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Point Layer
+Compact in-memory point layers: float coordinate arrays and property columns
+"""
+
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterable, Iterator, Tuple
+
+
+class _Missing:
+    """Marks a property a feature does not have (survives pickling)"""
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        return '_MISSING'
+
+
+_MISSING = _Missing()
+
+# Typed array storage for columns whose values all have one of these types
+_ARRAY_TYPECODES = {float: 'd', int: 'q'}
+_TYPECODE_TYPES = {'d': float, 'q': int}
+
+
+class PointRecord(Mapping):
+    """
+    Read-only view of one point in a PointLayer
+
+    Behaves like the dict SpatialAnalyzer used to build per point
+    (properties plus a Point 'geometry'), but holds only the layer and a
+    row number, so records are created on demand and cost a few dozen
+    bytes. SpatialAnalyzer's public queries return them as plain dicts
+    (see copy()), which can be modified and serialized.
+    """
+
+    __slots__ = ('layer', 'index')
+
+    def __init__(self, layer: 'PointLayer', index: int):
+        self.layer = layer
+        self.index = index
+
+    @property
+    def latitude(self) -> float:
+        return self.layer.latitudes[self.index]
+
+    @property
+    def longitude(self) -> float:
+        return self.layer.longitudes[self.index]
+
+    def __getitem__(self, key):
+        if key == 'geometry':
+            return {'type': 'Point', 'coordinates': [self.longitude, self.latitude]}
+        column = self.layer.columns.get(key)
+        if column is not None:
+            value = column[self.index]
+            if value is not _MISSING:
+                return value
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for name, column in self.layer.columns.items():
+            if column[self.index] is not _MISSING:
+                yield name
+        yield 'geometry'
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def copy(self) -> Dict:
+        """Materialize the record as a plain dict"""
+        return dict(self)
+
+    def __repr__(self) -> str:
+        return f"PointRecord({self.copy()!r})"
+
+
+class PointLayer(Sequence):
+    """
+    Point layer stored column-wise
+
+    Latitudes and longitudes live in two contiguous float arrays, resolved
+    once when the layer is built, and each property is a list aligned with
+    them. Repeated string values are stored once, and compact() moves
+    all-float or all-int columns into typed arrays. Indexing yields
+    PointRecord views, so the layer can be passed anywhere SpatialAnalyzer
+    accepts a list of points.
+    """
+
+    def __init__(self):
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+        self.columns: Dict[str, list] = {}
+        self._strings: Dict[str, str] = {}
+
+    @classmethod
+    def from_features(cls, features: Iterable[Dict]) -> 'PointLayer':
+        """
+        Build a layer from GeoJSON Point features
+
+        Args:
+            features: Iterable of features (e.g. geojson_stream.iter_features)
+
+        Returns:
+            PointLayer in feature order
+        """
+        layer = cls()
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') != 'Point':
+                raise ValueError(f"Point layers need Point geometries, got {geometry.get('type')}")
+            coordinates = geometry['coordinates']
+            layer.append(coordinates[1], coordinates[0], feature.get('properties') or {})
+        layer.compact()
+        return layer
+
+    def append(self, lat: float, lon: float, properties: Dict):
+        """Add one point"""
+        row = len(self.latitudes)
+        for name in properties:
+            if name not in self.columns:
+                self.columns[name] = [_MISSING] * row
+        for name, column in self.columns.items():
+            value = properties.get(name, _MISSING)
+            if type(value) is str:
+                value = self._strings.setdefault(value, value)
+            if type(column) is array and type(value) is not _TYPECODE_TYPES[column.typecode]:
+                column = self.columns[name] = list(column)
+            column.append(value)
+        self.latitudes.append(float(lat))
+        self.longitudes.append(float(lon))
+
+    def compact(self):
+        """
+        Store homogeneous numeric columns as typed arrays
+
+        A column becomes an array('d') or array('q') when every row has a
+        value of exactly that type (bools stay as objects), so its values
+        cost 8 bytes each instead of a pointer plus a boxed number. Also
+        releases the string table used to share repeated strings.
+        """
+        for name, column in self.columns.items():
+            if type(column) is array or not column:
+                continue
+            value_type = type(column[0])
+            typecode = _ARRAY_TYPECODES.get(value_type)
+            if typecode is None or any(type(value) is not value_type for value in column):
+                continue
+            try:
+                self.columns[name] = array(typecode, column)
+            except OverflowError:  # ints beyond 64 bits stay as objects
+                pass
+        self._strings = {}
+
+    def __len__(self) -> int:
+        return len(self.latitudes)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [PointRecord(self, j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return PointRecord(self, i)
+
+    def __iter__(self) -> Iterator[PointRecord]:
+        for i in range(len(self)):
+            yield PointRecord(self, i)
+
+    def coord_pairs(self) -> Iterator[Tuple[float, float]]:
+        """(lat, lon) of every point, in order"""
+        return zip(self.latitudes, self.longitudes)
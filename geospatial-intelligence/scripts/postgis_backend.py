@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+PostGIS Backend
+Push nearest-neighbor and buffer queries for SpatialAnalyzer down to PostGIS
+
+A PostGISLayer stands in for a point layer wherever SpatialAnalyzer
+accepts one. Queries for a batch of locations run as one set-based
+statement per layer: KNN ordering (<->) for nearest features and
+ST_DWithin for buffers, both served by a GIST index on the geography of
+environmental_layers.spatial_data. Distances are recomputed in SQL with
+the analyzer's haversine formula, so records match the Python engines.
+Layer order is (created_at, layer_id), the order iteration yields; it
+breaks distance ties and orders buffer hits, as list order does for
+in-memory layers.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from incremental import KEY_PROPERTIES
+
+try:
+    import psycopg
+    from psycopg_pool import ConnectionPool
+except ImportError:  # psycopg is optional; only the PostGIS backend needs it
+    psycopg = None
+    ConnectionPool = None
+
+# KNN and ST_DWithin on geography need an index on the geography expression
+GEOGRAPHY_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_env_layers_geog "
+    "ON environmental_layers USING GIST((spatial_data::geography))"
+)
+
+# Radius of the sphere ST_DWithin uses when use_spheroid is false
+POSTGIS_SPHERE_RADIUS_KM = 6371.0088
+
+# Locations sent per statement; chunks run concurrently on pooled connections
+DEFAULT_CHUNK_LOCATIONS = 5000
+
+_LOCATIONS_SQL = """
+    unnest(%(lats)s::float8[], %(lons)s::float8[]) WITH ORDINALITY AS loc(lat, lon, i)
+"""
+
+_LOCATION_GEOGRAPHY_SQL = "ST_SetSRID(ST_MakePoint(loc.lon, loc.lat), 4326)::geography"
+
+# SpatialAnalyzer.haversine_distance from loc to the layer point el
+_HAVERSINE_SQL = """
+    2 * %(earth_radius_km)s * atan2(sqrt(h.a), sqrt(1 - h.a))
+    FROM (SELECT
+        sin(radians(ST_Y(el.spatial_data) - loc.lat) / 2) ^ 2 +
+        cos(radians(loc.lat)) * cos(radians(ST_Y(el.spatial_data))) *
+        sin(radians(ST_X(el.spatial_data) - loc.lon) / 2) ^ 2 AS a) h
+"""
+
+# 15 decimals round-trip the stored coordinates (the default is 9)
+_RECORD_SQL = "el.attributes, ST_AsGeoJSON(el.spatial_data, 15)::jsonb AS geometry"
+
+_LAYER_ORDER_SQL = "el.created_at, el.layer_id"
+
+# KNN finds the nearest distance; every feature within it (plus float
+# slack) is re-ranked by haversine distance, then layer order
+_NEAREST_SQL = f"""
+    SELECT loc.i, n.attributes, n.geometry, n.distance_km
+    FROM {_LOCATIONS_SQL}
+    LEFT JOIN LATERAL (
+        SELECT el.spatial_data::geography <-> {_LOCATION_GEOGRAPHY_SQL} AS knn_m
+        FROM environmental_layers el
+        WHERE el.layer_type = %(layer_type)s AND el.is_active
+        ORDER BY el.spatial_data::geography <-> {_LOCATION_GEOGRAPHY_SQL}
+        LIMIT 1
+    ) k ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT {_RECORD_SQL}, (SELECT {_HAVERSINE_SQL}) AS distance_km
+        FROM environmental_layers el
+        WHERE el.layer_type = %(layer_type)s AND el.is_active
+          AND ST_DWithin(el.spatial_data::geography, {_LOCATION_GEOGRAPHY_SQL},
+                         k.knn_m * (1 + 1e-9) + 1e-3, false)
+        ORDER BY distance_km, {_LAYER_ORDER_SQL}
+        LIMIT 1
+    ) n ON TRUE
+    ORDER BY loc.i
+"""
+
+_WITHIN_SQL = f"""
+    SELECT loc.i, w.attributes, w.geometry, w.distance_km
+    FROM {_LOCATIONS_SQL}
+    JOIN LATERAL (
+        SELECT {_RECORD_SQL}, (SELECT {_HAVERSINE_SQL}) AS distance_km,
+               el.created_at, el.layer_id
+        FROM environmental_layers el
+        WHERE el.layer_type = %(layer_type)s AND el.is_active
+          AND ST_DWithin(el.spatial_data::geography, {_LOCATION_GEOGRAPHY_SQL},
+                         %(search_m)s, false)
+    ) w ON w.distance_km <= %(radius_km)s
+    ORDER BY loc.i, w.created_at, w.layer_id
+"""
+
+
+class PostGISBackend:
+    """Pooled connection to the environmental_layers table"""
+
+    def __init__(self, conninfo: str = '', min_connections: int = 1,
+                 max_connections: int = 4,
+                 chunk_locations: int = DEFAULT_CHUNK_LOCATIONS):
+        """
+        Args:
+            conninfo: libpq connection string or URL; empty uses the PG*
+                environment variables
+            min_connections: Connections kept open by the pool
+            max_connections: Upper bound on pooled connections, and on
+                location chunks queried concurrently
+            chunk_locations: Locations sent per statement
+        """
+        if psycopg is None or ConnectionPool is None:
+            raise ImportError("The PostGIS backend requires psycopg "
+                              "(pip install 'psycopg[binary,pool]')")
+
+        self.max_connections = max_connections
+        self.chunk_locations = chunk_locations
+        self.pool = ConnectionPool(conninfo, min_size=min_connections,
+                                   max_size=max_connections, open=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Close every pooled connection"""
+        self.pool.close()
+
+    def ensure_indexes(self):
+        """Create the geography index the KNN and ST_DWithin queries use"""
+        with self.pool.connection() as conn:
+            conn.execute(GEOGRAPHY_INDEX_SQL)
+
+    def layer(self, layer_type: str) -> 'PostGISLayer':
+        """Handle for the active features of one layer_type"""
+        return PostGISLayer(self, layer_type)
+
+    def nearest(self, layer_type: str, coords: Sequence[Tuple[float, float]],
+                earth_radius_km: float) -> List[Tuple[Optional[Dict], float]]:
+        """
+        Nearest feature to every coordinate
+
+        Args:
+            layer_type: environmental_layers.layer_type
+            coords: (lat, lon) pairs
+            earth_radius_km: Sphere radius of the reported distances
+
+        Returns:
+            (record, distance in km) per coordinate; (None, inf) if the
+            layer is empty. Distance ties go to the first in layer order
+        """
+        results = [(None, float('inf'))] * len(coords)
+        for i, attributes, geometry, distance in self._query_chunks(
+                _NEAREST_SQL, coords, {'layer_type': layer_type,
+                                       'earth_radius_km': earth_radius_km}):
+            if geometry is not None:
+                results[i] = (self._record(attributes, geometry), distance)
+        return results
+
+    def within(self, layer_type: str, coords: Sequence[Tuple[float, float]],
+               radius_km: float, earth_radius_km: float) -> List[List[Tuple[Dict, float]]]:
+        """
+        Features within radius_km of every coordinate
+
+        Args:
+            layer_type: environmental_layers.layer_type
+            coords: (lat, lon) pairs
+            radius_km: Buffer radius in kilometers
+            earth_radius_km: Sphere radius of the distances
+
+        Returns:
+            [(record, distance in km), ...] per coordinate, in layer order
+        """
+        # ST_DWithin measures on a slightly different sphere; widen its
+        # search by the radius ratio and filter on the haversine distance
+        search_m = radius_km * 1000 * POSTGIS_SPHERE_RADIUS_KM / earth_radius_km * (1 + 1e-9) + 1e-3
+        results = [[] for _ in coords]
+        for i, attributes, geometry, distance in self._query_chunks(
+                _WITHIN_SQL, coords, {'layer_type': layer_type, 'radius_km': radius_km,
+                                      'search_m': search_m,
+                                      'earth_radius_km': earth_radius_km}):
+            results[i].append((self._record(attributes, geometry), distance))
+        return results
+
+    def count(self, layer_type: str) -> int:
+        """Number of active features in a layer"""
+        with self.pool.connection() as conn:
+            return conn.execute(
+                "SELECT count(*) FROM environmental_layers WHERE layer_type = %s AND is_active",
+                (layer_type,)).fetchone()[0]
+
+    def iter_records(self, layer_type: str) -> Iterator[Dict]:
+        """Stream a layer's active features as point records"""
+        with self.pool.connection() as conn:
+            with conn.cursor(name='eic_layer_records') as cur:
+                cur.execute(f"SELECT {_RECORD_SQL} FROM environmental_layers el "
+                            "WHERE el.layer_type = %s AND el.is_active "
+                            f"ORDER BY {_LAYER_ORDER_SQL}", (layer_type,))
+                for attributes, geometry in cur:
+                    yield self._record(attributes, geometry)
+
+    def iter_hashes(self, layer_type: str) -> Iterator[Tuple[Dict, float, float, str]]:
+        """
+        Stream a layer's active features as manifest rows
+
+        Only the identifying properties, the position and the stored
+        data_hash are read, so a LayerManifest can be refreshed without
+        fetching and re-hashing every record.
+
+        Returns:
+            Iterator of (key properties, lat, lon, data_hash) in layer order
+        """
+        with self.pool.connection() as conn:
+            with conn.cursor(name='eic_layer_hashes') as cur:
+                cur.execute("SELECT (SELECT jsonb_object_agg(a.key, a.value) "
+                            "FROM jsonb_each(el.attributes) a WHERE a.key = ANY(%s)), "
+                            "ST_Y(el.spatial_data), ST_X(el.spatial_data), el.data_hash "
+                            "FROM environmental_layers el "
+                            "WHERE el.layer_type = %s AND el.is_active "
+                            f"ORDER BY {_LAYER_ORDER_SQL}",
+                            (list(KEY_PROPERTIES), layer_type))
+                for properties, lat, lon, data_hash in cur:
+                    yield properties or {}, lat, lon, data_hash
+
+    def _query_chunks(self, sql: str, coords: Sequence[Tuple[float, float]],
+                      params: Dict) -> Iterator[Tuple]:
+        """Run sql per chunk of locations; yields rows with 0-based location indexes"""
+        chunks = [(start, coords[start:start + self.chunk_locations])
+                  for start in range(0, len(coords), self.chunk_locations)]
+
+        def run(chunk):
+            start, chunk_coords = chunk
+            chunk_params = dict(params,
+                                lats=[float(lat) for lat, _ in chunk_coords],
+                                lons=[float(lon) for _, lon in chunk_coords])
+            with self.pool.connection() as conn:
+                rows = conn.execute(sql, chunk_params).fetchall()
+            return [(start + ordinal - 1,) + tuple(row) for ordinal, *row in rows]
+
+        if len(chunks) <= 1:
+            results = map(run, chunks)
+        else:
+            executor = ThreadPoolExecutor(max_workers=self.max_connections)
+            with executor:
+                results = list(executor.map(run, chunks))
+        for rows in results:
+            yield from rows
+
+    def _record(self, attributes: Dict, geometry: Dict) -> Dict:
+        """Point record in the shape SpatialAnalyzer.load_layer produces"""
+        return dict(attributes or {}, geometry=geometry)
+
+
+class PostGISLayer:
+    """
+    A layer_type of environmental_layers, usable as a SpatialAnalyzer layer
+
+    Nearest-neighbor and buffer lookups against it run in the database.
+    Iterating streams its records, e.g. for LayerManifest.refresh.
+    """
+
+    def __init__(self, backend: PostGISBackend, layer_type: str):
+        self.backend = backend
+        self.layer_type = layer_type
+
+    def __len__(self) -> int:
+        return self.backend.count(self.layer_type)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self.backend.iter_records(self.layer_type)
+
+    def nearest(self, coords: Sequence[Tuple[float, float]],
+                earth_radius_km: float) -> List[Tuple[Optional[Dict], float]]:
+        """Nearest (record, distance in km) for every (lat, lon)"""
+        return self.backend.nearest(self.layer_type, coords, earth_radius_km)
+
+    def within(self, coords: Sequence[Tuple[float, float]], radius_km: float,
+               earth_radius_km: float) -> List[List[Tuple[Dict, float]]]:
+        """(record, distance in km) within radius_km of every (lat, lon)"""
+        return self.backend.within(self.layer_type, coords, radius_km, earth_radius_km)
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+PostGIS Loader
+Bulk-load processor layers and risk assessments into the PostGIS schema
+
+Rows are streamed into a temporary staging table with binary COPY and
+merged into sql/postgis_schema.sql's tables in one statement, upserting
+on data_hash. For environmental_layers the data_hash is the feature's
+canonical hash (the _eic_source_hash of its WordPress post), so a reload
+of unchanged data writes nothing.
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from geojson_stream import GeoJSONStreamReader
+from provenance import canonical_hash
+
+try:
+    import psycopg
+    from psycopg_pool import ConnectionPool
+except ImportError:  # psycopg is optional; only the PostGIS loader needs it
+    psycopg = None
+    ConnectionPool = None
+
+# Statements the upserts rely on; safe to run against an existing database
+UPSERT_KEYS_SQL = (
+    "ALTER TABLE analysis_results ADD COLUMN IF NOT EXISTS data_hash VARCHAR(64)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_env_layers_hash ON environmental_layers(data_hash)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_analysis_hash ON analysis_results(data_hash)"
+)
+
+# Staging columns and their COPY types, in COPY order
+LAYER_STAGE_COLUMNS = (
+    ('layer_name', 'text'),
+    ('layer_type', 'text'),
+    ('data_source', 'text'),
+    ('source_url', 'text'),
+    ('geometry', 'jsonb'),
+    ('attributes', 'jsonb'),
+    ('data_hash', 'text'),
+    ('fetch_timestamp', 'timestamp'),
+    ('data_quality_score', 'float8')
+)
+
+ASSESSMENT_STAGE_COLUMNS = (
+    ('analysis_name', 'text'),
+    ('longitude', 'float8'),
+    ('latitude', 'float8'),
+    ('risk_scores', 'jsonb'),
+    ('metrics', 'jsonb'),
+    ('parameters', 'jsonb'),
+    ('generated_at', 'timestamp'),
+    ('generated_by', 'text'),
+    ('data_hash', 'text')
+)
+
+# Properties used as a feature's layer_name, in order of preference
+NAME_PROPERTIES = ('location', 'site_name', 'SITE_NAME', 'station_name')
+
+# Processor outputs loaded by main(): (file, layer_type, data_source)
+DEFAULT_LAYERS = (
+    ('california_air_quality.geojson', 'air_quality', 'EPA AirNow'),
+    ('california_water_quality.geojson', 'water_quality', 'USGS Water Services'),
+    ('california_superfund_sites.geojson', 'superfund_sites', 'EPA Superfund')
+)
+
+# Layer types risk assessments are scored against (their input_layers)
+INPUT_LAYER_TYPES = tuple(layer_type for _, layer_type, _ in DEFAULT_LAYERS)
+
+
+class PostGISLoader:
+    """Load layers and assessments into PostGIS over a connection pool"""
+
+    def __init__(self, conninfo: str = '', min_connections: int = 1,
+                 max_connections: int = 4):
+        """
+        Args:
+            conninfo: libpq connection string or URL; empty uses the PG*
+                environment variables
+            min_connections: Connections kept open by the pool
+            max_connections: Upper bound on pooled connections, and on
+                layers loaded concurrently by load_layers
+        """
+        if psycopg is None or ConnectionPool is None:
+            raise ImportError("The PostGIS loader requires psycopg "
+                              "(pip install 'psycopg[binary,pool]')")
+
+        self.max_connections = max_connections
+        self.pool = ConnectionPool(conninfo, min_size=min_connections,
+                                   max_size=max_connections, open=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Close every pooled connection"""
+        self.pool.close()
+
+    def ensure_upsert_keys(self):
+        """Create the data_hash column and unique indexes the upserts need"""
+        with self.pool.connection() as conn:
+            for statement in UPSERT_KEYS_SQL:
+                conn.execute(statement)
+
+    def load_layer(self, features: Iterable[Dict], layer_type: str, data_source: str,
+                   source_url: Optional[str] = None,
+                   fetch_timestamp: Optional[datetime] = None,
+                   data_quality_score: Optional[float] = None,
+                   deactivate_missing: bool = True) -> Dict:
+        """
+        Upsert a layer's features into environmental_layers
+
+        Args:
+            features: GeoJSON features (streamed; never held in memory)
+            layer_type: e.g. air_quality, water_quality, superfund_sites
+            data_source: Data provider name
+            source_url: Optional provider URL
+            fetch_timestamp: When the data was fetched (default: now)
+            data_quality_score: Optional 0-1 score from the quality report
+            deactivate_missing: Treat the features as the complete layer and
+                mark active rows of this layer_type not among them inactive
+
+        Returns:
+            Dict with staged, inserted, reactivated, unchanged and
+            deactivated row counts
+        """
+        fetch_timestamp = fetch_timestamp or datetime.now()
+
+        with self.pool.connection() as conn, conn.transaction():
+            self._create_stage(conn, 'eic_stage_layers', LAYER_STAGE_COLUMNS)
+            staged = self._copy_rows(
+                conn, 'eic_stage_layers', LAYER_STAGE_COLUMNS,
+                self._layer_rows(features, layer_type, data_source, source_url,
+                                 fetch_timestamp, data_quality_score))
+
+            # Identical content is already stored: only revive inactive rows
+            inserted, reactivated = conn.execute("""
+                WITH upserted AS (
+                    INSERT INTO environmental_layers (
+                        layer_name, layer_type, data_source, source_url, spatial_data,
+                        attributes, data_hash, fetch_timestamp, data_quality_score
+                    )
+                    SELECT DISTINCT ON (data_hash)
+                        layer_name, layer_type, data_source, source_url,
+                        ST_SetSRID(ST_GeomFromGeoJSON(geometry::text), 4326),
+                        attributes, data_hash, fetch_timestamp, data_quality_score
+                    FROM eic_stage_layers
+                    ON CONFLICT (data_hash) DO UPDATE SET
+                        is_active = TRUE,
+                        fetch_timestamp = EXCLUDED.fetch_timestamp
+                    WHERE NOT environmental_layers.is_active
+                    RETURNING xmax = 0 AS inserted
+                )
+                SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted)
+                FROM upserted
+            """).fetchone()
+
+            deactivated = 0
+            if deactivate_missing:
+                deactivated = conn.execute("""
+                    UPDATE environmental_layers el SET is_active = FALSE
+                    WHERE el.layer_type = %s AND el.is_active
+                      AND NOT EXISTS (
+                          SELECT 1 FROM eic_stage_layers s WHERE s.data_hash = el.data_hash
+                      )
+                """, (layer_type,)).rowcount
+
+        return {
+            'layer_type': layer_type,
+            'staged': staged,
+            'inserted': inserted,
+            'reactivated': reactivated,
+            'unchanged': staged - inserted - reactivated,
+            'deactivated': deactivated
+        }
+
+    def load_geojson(self, path: str, layer_type: Optional[str] = None,
+                     data_source: str = 'geospatial_intelligence_processor', **options) -> Dict:
+        """
+        Stream a processor GeoJSON file into environmental_layers
+
+        Args:
+            path: GeoJSON FeatureCollection path
+            layer_type: Defaults to the file's metadata.data_type
+            data_source: Data provider name
+            **options: Passed to load_layer
+
+        Returns:
+            Row counts from load_layer
+        """
+        reader = GeoJSONStreamReader(path)
+        events = reader.events()
+        # Members written before the features array (the processor's
+        # metadata) are known once it opens, without buffering the layer
+        for kind, _, _ in events:
+            if kind == 'begin':
+                break
+        metadata = reader.members.get('metadata') or {}
+        features = (value for kind, _, value in events if kind == 'feature')
+
+        layer_type = layer_type or metadata.get('data_type')
+        if layer_type is None:
+            raise ValueError(f"{path} has no metadata.data_type; pass layer_type")
+        if 'fetch_timestamp' not in options and metadata.get('generated_at'):
+            options['fetch_timestamp'] = datetime.fromisoformat(metadata['generated_at'])
+
+        return self.load_layer(features, layer_type, data_source, **options)
+
+    def load_layers(self, layers: List[Dict]) -> List[Dict]:
+        """
+        Load several GeoJSON layers concurrently, one pooled connection each
+
+        Args:
+            layers: load_geojson keyword arguments per layer (path, layer_type, ...)
+
+        Returns:
+            Row counts per layer, in input order
+        """
+        with ThreadPoolExecutor(max_workers=self.max_connections) as executor:
+            futures = [executor.submit(self.load_geojson, **layer) for layer in layers]
+            return [future.result() for future in futures]
+
+    def load_assessments(self, risk_assessments: Iterable[Dict],
+                         generated_by: str = 'spatial_analysis',
+                         parameters: Optional[Dict] = None,
+                         input_layer_types: Iterable[str] = INPUT_LAYER_TYPES) -> Dict:
+        """
+        Upsert risk assessments into analysis_results
+
+        Each assessment becomes a 'risk_assessment' row with a point
+        result_data. Its data_hash covers everything but the timestamp, so
+        rescoring a location to the same result does not add a row.
+
+        input_layers records the layer_ids of the environmental_layers rows
+        of input_layer_types that are active at load time, so load the
+        assessments after the layers they were scored against. Rows that
+        already exist keep their original lineage.
+
+        Args:
+            risk_assessments: Records from SpatialAnalyzer.calculate_ej_risk_scores
+            generated_by: Recorded in generated_by
+            parameters: Analysis parameters recorded with every row
+            input_layer_types: Layer types the assessments were scored against
+
+        Returns:
+            Dict with staged, inserted and unchanged row counts
+        """
+        rows = (self._assessment_row(assessment, generated_by, parameters or {})
+                for assessment in risk_assessments)
+
+        with self.pool.connection() as conn, conn.transaction():
+            self._create_stage(conn, 'eic_stage_assessments', ASSESSMENT_STAGE_COLUMNS)
+            staged = self._copy_rows(conn, 'eic_stage_assessments',
+                                     ASSESSMENT_STAGE_COLUMNS, rows)
+            inserted = conn.execute("""
+                INSERT INTO analysis_results (
+                    analysis_type, analysis_name, input_layers, result_data,
+                    risk_scores, metrics, parameters, generated_at, generated_by, data_hash
+                )
+                SELECT DISTINCT ON (s.data_hash)
+                    'risk_assessment', s.analysis_name, inputs.layer_ids,
+                    ST_SetSRID(ST_MakePoint(s.longitude, s.latitude), 4326),
+                    s.risk_scores, s.metrics, s.parameters, s.generated_at,
+                    s.generated_by, s.data_hash
+                FROM eic_stage_assessments s
+                CROSS JOIN (
+                    SELECT ARRAY(
+                        SELECT layer_id FROM environmental_layers
+                        WHERE is_active AND layer_type = ANY(%s)
+                        ORDER BY layer_id
+                    ) AS layer_ids
+                ) inputs
+                ON CONFLICT (data_hash) DO NOTHING
+            """, (list(input_layer_types),)).rowcount
+
+        return {'staged': staged, 'inserted': inserted, 'unchanged': staged - inserted}
+
+    def _create_stage(self, conn, table: str, columns: tuple):
+        """Create a temporary staging table dropped at commit"""
+        definition = ', '.join(f"{name} {column_type}" for name, column_type in columns)
+        conn.execute(f"CREATE TEMP TABLE {table} ({definition}) ON COMMIT DROP")
+
+    def _copy_rows(self, conn, table: str, columns: tuple, rows: Iterable[tuple]) -> int:
+        """Stream rows into a staging table with binary COPY; returns the row count"""
+        count = 0
+        names = ', '.join(name for name, _ in columns)
+        with conn.cursor() as cur:
+            with cur.copy(f"COPY {table} ({names}) FROM STDIN (FORMAT BINARY)") as copy:
+                copy.set_types([column_type for _, column_type in columns])
+                for row in rows:
+                    copy.write_row(row)
+                    count += 1
+        return count
+
+    def _layer_rows(self, features: Iterable[Dict], layer_type: str, data_source: str,
+                    source_url: Optional[str], fetch_timestamp: datetime,
+                    data_quality_score: Optional[float]) -> Iterable[tuple]:
+        """Staging rows for environmental_layers; features without geometry are skipped"""
+        for feature in features:
+            geometry = feature.get('geometry')
+            if not geometry:
+                continue
+            properties = feature.get('properties') or {}
+            name = next((str(properties[p]) for p in NAME_PROPERTIES if properties.get(p)),
+                        'Environmental Data Point')
+            yield (
+                name[:255],
+                layer_type,
+                data_source,
+                source_url,
+                geometry,
+                properties,
+                canonical_hash(feature),
+                fetch_timestamp,
+                data_quality_score
+            )
+
+    def _assessment_row(self, assessment: Dict, generated_by: str,
+                        parameters: Dict) -> tuple:
+        """Staging row for analysis_results"""
+        risk_scores = dict(assessment['risk_factors'],
+                           composite_risk=assessment['composite_risk'],
+                           category=assessment['category'],
+                           priority=assessment['priority'])
+        metrics = {
+            'nearest_superfund': assessment.get('nearest_superfund'),
+            'air_quality': assessment.get('air_quality'),
+            'water_sources_within_5km': assessment.get('water_sources_within_5km')
+        }
+        timestamp = assessment.get('timestamp')
+        return (
+            str(assessment.get('location', 'Unknown'))[:255],
+            float(assessment['longitude']),
+            float(assessment['latitude']),
+            risk_scores,
+            metrics,
+            parameters,
+            datetime.fromisoformat(timestamp) if timestamp else datetime.now(),
+            generated_by,
+            canonical_hash({k: v for k, v in assessment.items() if k != 'timestamp'})
+        )
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='ThrivingRoots PostGIS Loader')
+    parser.add_argument('--dsn', default=os.environ.get('EIC_POSTGIS_DSN', ''),
+                        help='PostgreSQL connection string (default: $EIC_POSTGIS_DSN, then PG* variables)')
+    parser.add_argument('--output-dir', default='../outputs',
+                        help='Directory holding the processor and analysis outputs')
+    parser.add_argument('--connections', type=int, default=4,
+                        help='Maximum pooled connections (layers load concurrently)')
+    parser.add_argument('--skip-assessments', action='store_true',
+                        help='Only load environmental layers')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ThrivingRoots PostGIS Loader")
+    print("=" * 60)
+
+    layers = [
+        {'path': os.path.join(args.output_dir, filename), 'layer_type': layer_type,
+         'data_source': data_source}
+        for filename, layer_type, data_source in DEFAULT_LAYERS
+        if os.path.exists(os.path.join(args.output_dir, filename))
+    ]
+
+    with PostGISLoader(args.dsn, max_connections=args.connections) as loader:
+        loader.ensure_upsert_keys()
+
+        print("\nLoading environmental layers...")
+        for result in loader.load_layers(layers):
+            print(f"  {result['layer_type']}: {result}")
+
+        assessments_path = os.path.join(args.output_dir, 'risk_assessments.json')
+        if not args.skip_assessments and os.path.exists(assessments_path):
+            print("\nLoading risk assessments...")
+            with open(assessments_path, 'r') as f:
+                result = loader.load_assessments(json.load(f))
+            print(f"  risk_assessment: {result}")
+
+    print("\n" + "=" * 60)
+    print("Load Complete!")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Provenance Hashing
+Streaming canonical-JSON SHA-256 digests for layers and their features
+
+Digest definitions (stable across releases):
+
+- Canonical hash: SHA-256 of the UTF-8 bytes of
+  json.dumps(data, sort_keys=True), i.e. sorted keys, ASCII escapes and
+  ', ' / ': ' separators. This is the data_hash used throughout the
+  platform and the per-feature _eic_source_hash of WordPress posts.
+- Merkle root: leaves are the raw 32-byte canonical hashes of the
+  features in collection order. Each level pairs neighbours as
+  SHA-256(0x01 || left || right); an unpaired last node moves up
+  unchanged. A single feature's root is its own hash; an empty
+  collection's root is SHA-256 of no bytes.
+- File hash: SHA-256 of a file's raw bytes. For a columnar layer
+  directory, each file in name order contributes its name, a NUL byte
+  and its bytes.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Text accumulated before each hashlib update
+BUFFER_CHARS = 1 << 16
+
+_ENCODER = json.JSONEncoder(sort_keys=True)
+
+
+def canonical_json(data: Any) -> str:
+    """Canonical JSON text of data (json.dumps with sort_keys=True)"""
+    return _ENCODER.encode(data)
+
+
+class CanonicalHasher:
+    """
+    SHA-256 fed with canonical JSON piece by piece
+
+    Each update encodes one object with the C encoder; text is buffered in
+    small batches, so a collection fed feature by feature never
+    materializes its full document string.
+    """
+
+    def __init__(self, default: Optional[Callable[[Any], Any]] = None):
+        """
+        Args:
+            default: Fallback for objects JSON cannot encode (as json.dumps)
+        """
+        self._digest = hashlib.sha256()
+        self._buffer = []
+        self._buffered = 0
+        self._encoder = (json.JSONEncoder(sort_keys=True, default=default)
+                         if default is not None else _ENCODER)
+
+    def update(self, data: Any):
+        """Append the canonical encoding of data"""
+        self.update_text(self._encoder.encode(data))
+
+    def update_text(self, text: str):
+        """Append raw text (e.g. structural characters)"""
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= BUFFER_CHARS:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._digest.update(''.join(self._buffer).encode())
+            self._buffer = []
+            self._buffered = 0
+
+    def hexdigest(self) -> str:
+        self._flush()
+        return self._digest.hexdigest()
+
+
+def canonical_hash(data: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """
+    Canonical hash of one object
+
+    The object is encoded in a single pass by the C encoder, which is
+    several times faster than streaming its pieces; use CollectionHasher
+    to hash large collections feature by feature.
+
+    Args:
+        data: JSON-serializable object
+        default: Fallback for objects JSON cannot encode (as json.dumps)
+
+    Returns:
+        Hex SHA-256 equal to sha256(json.dumps(data, sort_keys=True))
+    """
+    encoder = (json.JSONEncoder(sort_keys=True, default=default)
+               if default is not None else _ENCODER)
+    return hashlib.sha256(encoder.encode(data).encode()).hexdigest()
+
+
+def file_hash(filepath: str, chunk_size: int = 1 << 20) -> str:
+    """
+    File hash of a file or layer directory (see module docstring)
+
+    Args:
+        filepath: File, or directory whose files are hashed together
+        chunk_size: Bytes read at a time
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    paths = ([os.path.join(filepath, name) for name in sorted(os.listdir(filepath))]
+             if os.path.isdir(filepath) else [filepath])
+    for path in paths:
+        if os.path.isdir(filepath):
+            digest.update(os.path.basename(path).encode() + b'\0')
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def merkle_root(leaf_hashes: Iterable[str]) -> str:
+    """
+    Merkle root over hex leaf digests (see module docstring)
+
+    Args:
+        leaf_hashes: Hex SHA-256 digests in order
+
+    Returns:
+        Hex SHA-256 root
+    """
+    level = [bytes.fromhex(h) for h in leaf_hashes]
+    if not level:
+        return hashlib.sha256(b'').hexdigest()
+    while len(level) > 1:
+        paired = [hashlib.sha256(b'\x01' + level[i] + level[i + 1]).digest()
+                  for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0].hex()
+
+
+class CollectionHasher:
+    """
+    Hash a FeatureCollection incrementally, one feature at a time
+
+    Each feature is encoded once; its bytes feed both its own digest and
+    the collection's canonical hash, so per-feature hashes come for free.
+    With sorted keys, members that sort before "features" must be given
+    up front and the rest when finishing.
+    """
+
+    def __init__(self, leading_members: Dict = None):
+        """
+        Args:
+            leading_members: Top-level members other than "features"; only
+                those sorting before "features" are hashed here
+        """
+        self.feature_hashes: List[str] = []
+        self._document = CanonicalHasher()
+        self._document.update_text('{')
+        leading_members = leading_members or {}
+        for name in sorted(k for k in leading_members if k < 'features'):
+            self._document.update_text(f'{canonical_json(name)}: ')
+            self._document.update(leading_members[name])
+            self._document.update_text(', ')
+        self._document.update_text('"features": [')
+
+    def add_feature(self, feature: Any) -> str:
+        """Hash one feature into the collection; returns its canonical hash"""
+        text = canonical_json(feature)
+        if self.feature_hashes:
+            self._document.update_text(', ')
+        self._document.update_text(text)
+        feature_hash = hashlib.sha256(text.encode()).hexdigest()
+        self.feature_hashes.append(feature_hash)
+        return feature_hash
+
+    def finish(self, trailing_members: Dict = None) -> str:
+        """
+        Close the collection
+
+        Args:
+            trailing_members: Top-level members other than "features"; only
+                those sorting after "features" are hashed here
+
+        Returns:
+            Canonical hash of the whole collection
+        """
+        self._document.update_text(']')
+        trailing_members = trailing_members or {}
+        for name in sorted(k for k in trailing_members if k > 'features'):
+            self._document.update_text(f', {canonical_json(name)}: ')
+            self._document.update(trailing_members[name])
+        self._document.update_text('}')
+        return self._document.hexdigest()
+
+    def merkle_root(self) -> str:
+        """Merkle root of the features hashed so far"""
+        return merkle_root(self.feature_hashes)
+
+
+def hash_collection(collection: Dict) -> Tuple[str, List[str], str]:
+    """
+    Canonical hash, per-feature hashes and Merkle root of a collection
+
+    Args:
+        collection: Dict with a "features" list (other members allowed)
+
+    Returns:
+        Tuple of (collection hash, feature hashes, Merkle root); the
+        collection hash equals canonical_hash(collection)
+    """
+    features = collection.get('features')
+    if not isinstance(features, list):
+        return canonical_hash(collection), [], merkle_root([])
+
+    members = {k: v for k, v in collection.items() if k != 'features'}
+    hasher = CollectionHasher(members)
+    for feature in features:
+        hasher.add_feature(feature)
+    return hasher.finish(members), hasher.feature_hashes, hasher.merkle_root()
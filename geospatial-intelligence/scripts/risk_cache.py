@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Risk Score Cache
+LRU memoization of risk assessments keyed by geohash cell and layer versions
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash_cell(lat: float, lon: float, precision: int = 7) -> Tuple[str, float, float]:
+    """
+    Geohash of a position and the center of its cell
+
+    Args:
+        lat: Latitude in degrees
+        lon: Longitude in degrees
+        precision: Geohash length (7 is about 150 m x 150 m, 6 about 1.2 km x 0.6 km)
+
+    Returns:
+        (geohash, cell center latitude, cell center longitude)
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # Bits alternate longitude, latitude, starting with longitude
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return (''.join(chars), (lat_range[0] + lat_range[1]) / 2,
+            (lon_range[0] + lon_range[1]) / 2)
+
+
+class RiskScoreCache:
+    """
+    Bounded LRU cache of risk assessments
+
+    Locations are quantized to geohash cells and scored at the cell
+    center, so every location in a cell gets the same assessment whether
+    or not it was cached (only its location, latitude and longitude are
+    its own). Entries are keyed by cell and demographic factor; the cache
+    belongs to one version of the input layers, given as their content
+    hashes, and is emptied whenever set_layer_hashes declares a new one.
+    Requests scored against any other version bypass the cache.
+    """
+
+    def __init__(self, max_entries: int = 100000, precision: int = 7):
+        """
+        Args:
+            max_entries: Entries kept before least recently used ones are evicted
+            precision: Geohash length of the cells locations are quantized to
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.precision = precision
+        self.layer_hashes: Optional[Dict[str, str]] = None
+        self.stats = {'hits': 0, 'misses': 0, 'bypassed': 0, 'evictions': 0,
+                      'invalidations': 0}
+        self._entries: 'OrderedDict[Tuple, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def set_layer_hashes(self, layer_hashes: Dict[str, str]) -> bool:
+        """
+        Declare the content hashes of the layers assessments are scored against
+
+        Args:
+            layer_hashes: Content hash per layer name
+
+        Returns:
+            True if the hashes changed and cached assessments were dropped
+        """
+        with self._lock:
+            if layer_hashes == self.layer_hashes:
+                return False
+            if self.layer_hashes is not None:
+                self.stats['invalidations'] += 1
+            self.layer_hashes = dict(layer_hashes)
+            self._entries.clear()
+            return True
+
+    def score(self, locations: Sequence[Dict], vulnerabilities: Sequence[float],
+              layer_hashes: Dict[str, str],
+              compute: Callable[[List[Dict], List[float]], List[Dict]]) -> List[Dict]:
+        """
+        Risk assessments of many locations, computing only uncached cells
+
+        Entries are only read and stored when layer_hashes are the ones
+        last passed to set_layer_hashes; a request still holding an older
+        (or newer) snapshot is computed in full and leaves the cache alone.
+
+        Args:
+            locations: Dicts with latitude/longitude and optionally location
+            vulnerabilities: Demographic risk factor per location
+            layer_hashes: Content hashes of the layers compute scores against
+            compute: Scores (cell centers, factors) in one pass, e.g. a
+                wrapper of SpatialAnalyzer.calculate_ej_risk_scores
+
+        Returns:
+            Assessments in input order; each is a copy the caller may modify
+        """
+        keys = []
+        centers = {}
+        for location, vulnerability in zip(locations, vulnerabilities):
+            cell, lat, lon = geohash_cell(location['latitude'], location['longitude'],
+                                          self.precision)
+            key = (cell, vulnerability)
+            keys.append(key)
+            centers.setdefault(key, {'latitude': lat, 'longitude': lon})
+
+        found = {}
+        with self._lock:
+            current = layer_hashes == self.layer_hashes
+            if current:
+                for key in keys:
+                    entry = self._entries.get(key)
+                    if entry is not None:
+                        self._entries.move_to_end(key)
+                        found[key] = entry
+                        self.stats['hits'] += 1
+                    else:
+                        self.stats['misses'] += 1
+            else:
+                self.stats['bypassed'] += len(keys)
+
+        missing = [key for key in centers if key not in found]
+        if missing:
+            computed = compute([centers[key] for key in missing], [key[1] for key in missing])
+            found.update(zip(missing, computed))
+            with self._lock:
+                # Results scored against layers replaced meanwhile are not kept
+                if current and self.layer_hashes == layer_hashes:
+                    for key in missing:
+                        self._entries[key] = found[key]
+                        self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self.stats['evictions'] += 1
+
+        results = []
+        for location, key in zip(locations, keys):
+            # Assessments nest one level of dicts; copy both levels
+            assessment = {name: dict(value) if isinstance(value, dict) else value
+                          for name, value in found[key].items()}
+            assessment['location'] = location.get('location', 'Unknown')
+            assessment['latitude'] = location['latitude']
+            assessment['longitude'] = location['longitude']
+            results.append(assessment)
+        return results
+
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from cache"""
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+    def summary(self) -> Dict:
+        """Stats, hit rate and size"""
+        with self._lock:
+            return dict(self.stats, hit_rate=round(self.hit_rate(), 4),
+                        entries=len(self._entries), max_entries=self.max_entries,
+                        precision=self.precision)
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Scoring Service
+Resident HTTP service answering risk queries against warm, indexed layers
+"""
+
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from instrumentation import Instrumentation
+from provenance import file_hash
+from risk_cache import RiskScoreCache
+from spatial_analysis import SpatialAnalyzer, demographic_vulnerability
+
+try:
+    import layer_store
+except ImportError:  # NumPy is optional; only columnar layers need it
+    layer_store = None
+
+# Layer role -> output file stem, as spatial_analysis.py reads them
+LAYER_FILES = {
+    'air': 'california_air_quality',
+    'water': 'california_water_quality',
+    'superfund': 'california_superfund_sites'
+}
+
+# Loads attempted per reload while layer files keep changing underneath it
+RELOAD_ATTEMPTS = 3
+
+
+class ServiceUnavailable(Exception):
+    """Raised while no layers are loaded"""
+
+
+class BadRequest(ValueError):
+    """Raised for malformed query parameters or request bodies"""
+
+
+class LayerSnapshot:
+    """One loaded generation of the layers and the analyzer indexing them"""
+
+    def __init__(self, analyzer: SpatialAnalyzer, layers: Dict, paths: Dict[str, str],
+                 mtimes: Dict[str, float], hashes: Dict[str, str], version: int):
+        self.analyzer = analyzer
+        self.layers = layers
+        self.paths = paths
+        self.mtimes = mtimes
+        self.hashes = hashes
+        self.version = version
+        self.loaded_at = datetime.now().isoformat()
+
+
+class ScoringService:
+    """
+    Keep the layers loaded and indexed, and score locations against them
+
+    Layers are read from output_dir like spatial_analysis.py does
+    (columnar layers when present, GeoJSON otherwise) and every index is
+    built before the snapshot is published, so queries never pay for
+    loading. A background thread polls the layer files' mtimes and loads a
+    new snapshot when any changed; queries keep using the previous one
+    until the swap. Files are hashed before they are loaded and re-stat'ed
+    afterwards, and a load that saw a file change is retried, so a
+    snapshot's hashes always describe the data it holds. A failed reload
+    (e.g. a file caught mid-write) keeps the previous snapshot in service
+    and is retried once the files change again.
+
+    With a cache_size, assessments are memoized per geohash cell in a
+    RiskScoreCache keyed to the layers' content hashes (see risk_cache.py).
+    """
+
+    def __init__(self, output_dir: str = '../outputs', engine: str = 'index',
+                 reload_interval: float = 5.0, cache_size: int = 0,
+                 cache_precision: int = 7, instrumentation: Instrumentation = None):
+        """
+        Args:
+            output_dir: Directory holding the layer files
+            engine: SpatialAnalyzer engine
+            reload_interval: Seconds between mtime checks; 0 disables hot reload
+            cache_size: Assessments kept in the LRU cache; 0 disables caching
+            cache_precision: Geohash length of the cached cells
+            instrumentation: Collects query timings and counters (disabled by default)
+        """
+        self.output_dir = output_dir
+        self.engine = engine
+        self.reload_interval = reload_interval
+        self.metrics = instrumentation or Instrumentation(enabled=False)
+        self.cache = RiskScoreCache(cache_size, cache_precision) if cache_size > 0 else None
+        self.snapshot: Optional[LayerSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self._failed_state = None
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def start(self):
+        """Load the layers and start watching them"""
+        self.reload(force=True)
+        if self.reload_interval > 0:
+            self._watcher = threading.Thread(target=self._watch, name='layer-watcher',
+                                             daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        """Stop the watcher thread"""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Error reloading layers: {e}")
+
+    def layer_paths(self) -> Dict[str, str]:
+        """Path of every layer, preferring columnar layer directories"""
+        paths = {}
+        for role, stem in LAYER_FILES.items():
+            path = os.path.join(self.output_dir, f'{stem}.geojson')
+            if layer_store is not None:
+                columnar = os.path.join(self.output_dir, f'{stem}{layer_store.LAYER_SUFFIX}')
+                if layer_store.is_columnar_layer(columnar):
+                    path = columnar
+            paths[role] = path
+        return paths
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Load a new snapshot if any layer file changed
+
+        Args:
+            force: Reload even if nothing changed
+
+        Returns:
+            True if a new snapshot was published
+        """
+        with self._reload_lock:
+            paths = self.layer_paths()
+            mtimes = {role: _layer_mtime(path) for role, path in paths.items()}
+            current = self.snapshot
+            if not force and ((current is not None and current.paths == paths
+                               and current.mtimes == mtimes)
+                              or (paths, mtimes) == self._failed_state):
+                return False
+
+            try:
+                with self.metrics.timer('service.reload'):
+                    for attempt in range(RELOAD_ATTEMPTS):
+                        # Hash before loading: a file replaced during the load
+                        # then moves its mtime, and the load is retried
+                        hashes = {role: file_hash(path) for role, path in paths.items()}
+                        # A fresh analyzer per snapshot, so the old layers and
+                        # their cached indexes are freed once in-flight queries finish
+                        analyzer = SpatialAnalyzer(engine=self.engine,
+                                                   instrumentation=self.metrics)
+                        layers = {role: analyzer.load_layer(path) for role, path in paths.items()}
+                        self._warm(analyzer, layers)
+                        loaded_mtimes = {role: _layer_mtime(path)
+                                         for role, path in paths.items()}
+                        if loaded_mtimes == mtimes:
+                            break
+                        mtimes = loaded_mtimes
+                    else:
+                        raise RuntimeError(f"Layer files kept changing during "
+                                           f"{RELOAD_ATTEMPTS} load attempts")
+            except Exception:
+                self._failed_state = (paths, mtimes)
+                raise
+
+            version = current.version + 1 if current is not None else 1
+            # Only reloads advance the cache; requests still holding the old
+            # snapshot bypass it from here on
+            if self.cache is not None:
+                self.cache.set_layer_hashes(hashes)
+            self.snapshot = LayerSnapshot(analyzer, layers, paths, mtimes, hashes, version)
+            self.metrics.count('service_reloads')
+            print(f"Loaded layers (version {version}): "
+                  + ", ".join(f"{role} {len(layer)}" for role, layer in layers.items()))
+            return True
+
+    def _warm(self, analyzer: SpatialAnalyzer, layers: Dict):
+        """Build every per-layer index a query uses before publishing"""
+        probe = {'latitude': 36.7783, 'longitude': -119.4179}  # center of California
+        analyzer.nearest_neighbor(probe, layers['superfund'])
+        analyzer.nearest_neighbor(probe, layers['air'])
+        analyzer.buffer_analysis(probe, 5.0, layers['water'])
+
+    def score(self, location: Dict, vulnerability: Optional[float] = None) -> Dict:
+        """
+        Risk assessment of one location
+
+        Args:
+            location: Dict with latitude/longitude and optionally location (a name)
+            vulnerability: Demographic risk factor (0-1); defaults to the
+                placeholder used by spatial_analysis.py
+
+        Returns:
+            Risk assessment, as SpatialAnalyzer.calculate_ej_risk_score returns
+        """
+        snapshot = self._current()
+        if vulnerability is None:
+            vulnerability = demographic_vulnerability([location])[0]
+        with self.metrics.timer('service.score'):
+            if self.cache is not None:
+                assessment = self.cache.score([location], [vulnerability], snapshot.hashes,
+                                              self._scorer(snapshot))[0]
+            else:
+                assessment = snapshot.analyzer.calculate_ej_risk_score(
+                    location, snapshot.layers['superfund'], snapshot.layers['air'],
+                    snapshot.layers['water'], vulnerability
+                )
+        self.metrics.count('locations_scored')
+        return assessment
+
+    def score_batch(self, locations: List[Dict],
+                    vulnerability: Optional[object] = None) -> List[Dict]:
+        """
+        Risk assessments of many locations in one pass
+
+        Args:
+            locations: Dicts with latitude/longitude and optionally location
+            vulnerability: One factor for all locations, one per location,
+                or None for the placeholder
+
+        Returns:
+            Risk assessments in request order
+        """
+        snapshot = self._current()
+        if vulnerability is None:
+            vulnerability = demographic_vulnerability(locations)
+        with self.metrics.timer('service.score_batch'):
+            if self.cache is not None:
+                if not isinstance(vulnerability, list):
+                    vulnerability = [vulnerability] * len(locations)
+                return self.cache.score(locations, vulnerability, snapshot.hashes,
+                                        self._scorer(snapshot))
+            return self._scorer(snapshot)(locations, vulnerability)
+
+    def _scorer(self, snapshot: LayerSnapshot):
+        """Batch scoring function against one snapshot's layers"""
+        def score(locations, vulnerability):
+            return snapshot.analyzer.calculate_ej_risk_scores(
+                locations, snapshot.layers['superfund'], snapshot.layers['air'],
+                snapshot.layers['water'], demographic_vulnerability=vulnerability
+            )
+        return score
+
+    def health(self) -> Dict:
+        """Loaded layer sizes, snapshot version, load time and cache stats"""
+        snapshot = self._current()
+        health = {
+            'status': 'ok',
+            'version': snapshot.version,
+            'loaded_at': snapshot.loaded_at,
+            'engine': self.engine,
+            'layers': {role: {'path': snapshot.paths[role], 'features': len(layer),
+                              'content_hash': snapshot.hashes[role]}
+                       for role, layer in snapshot.layers.items()}
+        }
+        if self.cache is not None:
+            health['cache'] = self.cache.summary()
+        return health
+
+    def _current(self) -> LayerSnapshot:
+        snapshot = self.snapshot
+        if snapshot is None:
+            raise ServiceUnavailable("Layers are not loaded")
+        return snapshot
+
+
+def _layer_mtime(path: str) -> Optional[float]:
+    """Latest mtime of a layer file or of any file in a layer directory"""
+    try:
+        if not os.path.isdir(path):
+            return os.stat(path).st_mtime
+        return max([os.stat(path).st_mtime] +
+                   [os.stat(os.path.join(path, name)).st_mtime for name in os.listdir(path)])
+    except OSError:
+        return None
+
+
+def _parse_location(values: Dict) -> Tuple[Dict, Optional[float]]:
+    """(location dict, demographic factor or None) from a query or JSON object"""
+    lat = values.get('latitude', values.get('lat'))
+    lon = values.get('longitude', values.get('lon'))
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        raise BadRequest("latitude and longitude are required numbers")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or math.isnan(lat) or math.isnan(lon):
+        raise BadRequest("latitude or longitude out of range")
+
+    location = {'latitude': lat, 'longitude': lon}
+    if values.get('location') is not None:
+        location['location'] = str(values['location'])
+    vulnerability = values.get('demographic_vulnerability')
+    if vulnerability is not None:
+        vulnerability = _parse_vulnerability(vulnerability)
+    return location, vulnerability
+
+
+def _parse_vulnerability(value) -> float:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise BadRequest("demographic_vulnerability must be a number")
+    if not 0 <= value <= 1:
+        raise BadRequest("demographic_vulnerability must be between 0 and 1")
+    return value
+
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP API of a ScoringService
+
+    GET  /health                                   Layer sizes, snapshot version, cache stats
+    GET  /risk?lat=..&lon=..[&location=..][&demographic_vulnerability=..]
+    POST /risk/batch  {"locations": [{"latitude": .., "longitude": ..}, ...],
+                       "demographic_vulnerability": 0.5 | [..]}
+    POST /reload                                   Reload layers if they changed
+    GET  /metrics                                  Prometheus text (with --metrics)
+    """
+
+    service: ScoringService = None
+    max_batch = 10000
+    server_version = 'ThrivingRootsScoring/1.0'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/health':
+            self._handle(lambda: self.service.health())
+        elif url.path == '/risk':
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            self._handle(lambda: self.service.score(*_parse_location(query)))
+        elif url.path == '/metrics' and self.service.metrics.enabled:
+            self._send(200, self.service.metrics.prometheus_text('scoring_service').encode(),
+                       'text/plain; version=0.0.4')
+        else:
+            self._send_json(404, {'error': f"Unknown path: {url.path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path == '/risk/batch':
+            self._handle(self._batch)
+        elif url.path == '/reload':
+            self._handle(lambda: {'reloaded': self.service.reload(),
+                                  'version': self.service.snapshot.version})
+        else:
+            self._send_json(404, {'error': f"Unknown path: {url.path}"})
+
+    def _batch(self) -> Dict:
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            raise BadRequest("Request body must be JSON")
+        if not isinstance(body, dict) or not isinstance(body.get('locations'), list):
+            raise BadRequest("Expected an object with a locations array")
+        if len(body['locations']) > self.max_batch:
+            raise BadRequest(f"At most {self.max_batch} locations per request")
+
+        locations = []
+        factors = []
+        for item in body['locations']:
+            if not isinstance(item, dict):
+                raise BadRequest("Every location must be an object")
+            location, vulnerability = _parse_location(item)
+            locations.append(location)
+            factors.append(vulnerability)
+
+        vulnerability = body.get('demographic_vulnerability')
+        if isinstance(vulnerability, list):
+            if len(vulnerability) != len(locations):
+                raise BadRequest("demographic_vulnerability needs one value per location")
+            vulnerability = [_parse_vulnerability(value) for value in vulnerability]
+        elif vulnerability is not None:
+            vulnerability = _parse_vulnerability(vulnerability)
+        elif any(factor is not None for factor in factors):
+            defaults = demographic_vulnerability(locations)
+            vulnerability = [factor if factor is not None else default
+                             for factor, default in zip(factors, defaults)]
+
+        if not locations:
+            return {'assessments': []}
+        return {'assessments': self.service.score_batch(locations, vulnerability)}
+
+    def _handle(self, produce):
+        start = time.perf_counter()
+        try:
+            result = produce()
+        except BadRequest as e:
+            self._send_json(400, {'error': str(e)})
+        except ServiceUnavailable as e:
+            self._send_json(503, {'error': str(e)})
+        except Exception as e:
+            print(f"Error handling {self.command} {self.path}: {e}")
+            self._send_json(500, {'error': 'Internal error'})
+        else:
+            result = dict(result, elapsed_ms=round((time.perf_counter() - start) * 1000, 3))
+            self._send_json(200, result)
+
+    def _send_json(self, status: int, payload: Dict):
+        self._send(status, json.dumps(payload).encode(), 'application/json')
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # One line per query would dominate the output
+
+
+def make_server(service: ScoringService, host: str = '127.0.0.1', port: int = 8765,
+                max_batch: int = 10000) -> ThreadingHTTPServer:
+    """
+    HTTP server bound to a started ScoringService
+
+    Args:
+        service: Service answering the queries
+        host: Interface to bind
+        port: TCP port (0 picks a free one)
+        max_batch: Maximum locations per batch request
+
+    Returns:
+        ThreadingHTTPServer; call serve_forever() to run it
+    """
+    handler = type('BoundScoringRequestHandler', (ScoringRequestHandler,),
+                   {'service': service, 'max_batch': max_batch})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='ThrivingRoots Scoring Service')
+    parser.add_argument('--output-dir', default='../outputs',
+                        help='Directory holding the layer files')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port')
+    parser.add_argument('--engine', default='index', choices=SpatialAnalyzer.ENGINES,
+                        help='SpatialAnalyzer engine')
+    parser.add_argument('--reload-interval', type=float, default=5.0,
+                        help='Seconds between layer file checks (0 disables hot reload)')
+    parser.add_argument('--max-batch', type=int, default=10000,
+                        help='Maximum locations per batch request')
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help='Memoize up to this many assessments per geohash cell (0 disables)')
+    parser.add_argument('--cache-precision', type=int, default=7,
+                        help='Geohash length of cached cells (7 is about 150 m)')
+    parser.add_argument('--metrics', action='store_true',
+                        help='Collect query metrics and serve them at /metrics')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ThrivingRoots Scoring Service")
+    print("=" * 60)
+
+    service = ScoringService(args.output_dir, engine=args.engine,
+                             reload_interval=args.reload_interval,
+                             cache_size=args.cache_size, cache_precision=args.cache_precision,
+                             instrumentation=Instrumentation(enabled=args.metrics))
+    service.start()
+    server = make_server(service, args.host, args.port, args.max_batch)
+    print(f"\nListening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        print("\nScoring service stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,17 +4,78 @@ Spatial Analysis Module
 Environmental Justice and Remediation Prioritization Algorithms
 """
 
+import argparse
+import bisect
+import heapq
 import json
 import math
+import multiprocessing
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Sequence, Tuple, Any, Union
+
+from geojson_stream import iter_features
+from incremental import LayerDelta, LayerManifest, content_hash
+from instrumentation import Instrumentation, from_args, timed, write_reports
+from point_layer import PointLayer, PointRecord
+from postgis_backend import PostGISBackend, PostGISLayer
+from spatial_index import SpatialIndex
+
+try:
+    import haversine_kernel
+    import heatmap_grid
+    import layer_store
+except ImportError:  # NumPy is optional; the vectorized engine, heatmap grids and columnar layers need it
+    haversine_kernel = None
+    heatmap_grid = None
+    layer_store = None
 
 
 class SpatialAnalyzer:
     """Spatial analysis for environmental justice and risk assessment"""
     
-    def __init__(self):
+    ENGINES = ('scan', 'index', 'vectorized')
+    
+    # Assessment distances are rounded to 0.01 km; changes within this much
+    # of a previous nearest distance or buffer edge trigger a rescore
+    RESCORE_SLACK_KM = 0.01
+    
+    # Per-layer artifacts (indexes, coordinate arrays) kept for reuse; the
+    # least recently used are dropped beyond this many
+    LAYER_CACHE_ENTRIES = 16
+    
+    def __init__(self, index_threshold: int = 32, engine: str = 'index',
+                 dtype: str = 'float64', instrumentation: Instrumentation = None):
+        """
+        Args:
+            index_threshold: Layers with at least this many points are queried
+                through a cached SpatialIndex when engine is 'index'
+            engine: 'scan' (linear haversine), 'index' (KD-tree) or
+                'vectorized' (NumPy kernel, requires numpy)
+            dtype: Precision of the vectorized kernel ('float32' or 'float64')
+            instrumentation: Collects stage timings and counters (disabled by default)
+        """
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine: {engine}")
+        if engine == 'vectorized' and haversine_kernel is None:
+            raise ImportError("The vectorized engine requires NumPy (pip install numpy)")
+        
         self.earth_radius_km = 6371.0
+        self.index_threshold = index_threshold
+        self.engine = engine
+        self.dtype = dtype
+        self.metrics = instrumentation or Instrumentation(enabled=False)
+        self._layer_cache = OrderedDict()
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Cache keys are object ids, which are meaningless in another process
+        state['_layer_cache'] = OrderedDict()
+        return state
     
     def haversine_distance(self, lat1: float, lon1: float, 
                           lat2: float, lon2: float) -> float:
@@ -42,63 +103,356 @@ class SpatialAnalyzer:
         
         return self.earth_radius_km * c
     
+    def distance_matrix(self, origins: Union[List[Dict], SpatialIndex],
+                        targets: Union[List[Dict], SpatialIndex],
+                        dtype: str = None):
+        """
+        Calculate all origin-to-target distances with the vectorized kernel
+        
+        Args:
+            origins: Points, a SpatialIndex or an (n, 2) lat/lon array
+            targets: Points, a SpatialIndex or an (m, 2) lat/lon array
+            dtype: Kernel precision (defaults to the analyzer's dtype)
+        
+        Returns:
+            NumPy array of shape (n, m) with distances in km
+        """
+        self._require_kernel()
+        return haversine_kernel.haversine_matrix(
+            self._coord_array(origins), self._coord_array(targets),
+            earth_radius_km=self.earth_radius_km, dtype=dtype or self.dtype
+        )
+    
+    def nearest_distances(self, origins: Union[List[Dict], SpatialIndex],
+                          targets: Union[List[Dict], SpatialIndex],
+                          dtype: str = None):
+        """
+        Calculate the nearest target for every origin with the vectorized kernel
+        
+        Args:
+            origins: Points, a SpatialIndex or an (n, 2) lat/lon array
+            targets: Points, a SpatialIndex or an (m, 2) lat/lon array
+            dtype: Kernel precision (defaults to the analyzer's dtype)
+        
+        Returns:
+            Tuple of NumPy arrays (minimum distances in km, target indices)
+        """
+        self._require_kernel()
+        return haversine_kernel.haversine_argmin(
+            self._coord_array(origins), self._coord_array(targets),
+            earth_radius_km=self.earth_radius_km, dtype=dtype or self.dtype
+        )
+    
+    @timed('load.layer')
+    def load_layer(self, path: str):
+        """
+        Load a point layer from a columnar layer directory or a GeoJSON file
+        
+        Args:
+            path: Columnar layer directory (memory-mapped) or GeoJSON path
+        
+        Returns:
+            ColumnarLayer, or a PointLayer for GeoJSON
+        """
+        if layer_store is not None and layer_store.is_columnar_layer(path):
+            layer = layer_store.ColumnarLayer(path)
+        else:
+            layer = PointLayer.from_features(iter_features(path))
+        self.metrics.count('features_loaded', len(layer))
+        return layer
+    
+    def build_index(self, target_points: List[Dict]) -> SpatialIndex:
+        """
+        Build a reusable spatial index over a layer
+        
+        Args:
+            target_points: List of points with lat/lon, a PointLayer or a ColumnarLayer
+        
+        Returns:
+            SpatialIndex that can be passed wherever target_points is accepted
+        """
+        if isinstance(target_points, PointLayer):
+            coords = list(target_points.coord_pairs())
+        elif callable(getattr(target_points, 'coords', None)):
+            coords = target_points.coords().tolist()  # ColumnarLayer
+        else:
+            coords = [self._extract_coords(target) for target in target_points]
+        return SpatialIndex(coords, self.haversine_distance,
+                            earth_radius_km=self.earth_radius_km,
+                            items=target_points)
+    
+    def _require_kernel(self):
+        """Raise if the NumPy kernel is unavailable"""
+        if haversine_kernel is None:
+            raise ImportError("Batch distance APIs require NumPy (pip install numpy)")
+    
+    def _cacheable(self, target_points) -> bool:
+        """
+        True for layers whose records cannot be replaced in place
+        
+        PointLayers (from load_layer), ColumnarLayers and SpatialIndexes only
+        grow by appending, which the length check catches. A plain list may
+        have an element swapped between calls, so it is never cached; pass
+        it through build_index to reuse an index across calls.
+        """
+        return (isinstance(target_points, (PointLayer, SpatialIndex))
+                or callable(getattr(target_points, 'coords', None)))
+    
+    def _cached_layer(self, target_points: List[Dict], kind: str, builder):
+        """Build a per-layer artifact once and reuse it on later calls"""
+        if not self._cacheable(target_points):
+            return builder(target_points)
+        # The cache holds a reference to the layer so its id cannot be
+        # reused by another object while the entry lives
+        key = (id(target_points), kind)
+        cached = self._layer_cache.get(key)
+        if cached is None or len(cached[0]) != len(target_points):
+            # Index and coordinate builds are timed per kind, e.g. layer.index
+            with self.metrics.timer(f'layer.{kind}'):
+                cached = (target_points, builder(target_points))
+            self._layer_cache[key] = cached
+            while len(self._layer_cache) > self.LAYER_CACHE_ENTRIES:
+                self._layer_cache.popitem(last=False)
+        self._layer_cache.move_to_end(key)
+        return cached[1]
+    
+    def _query_layer(self, target_points):
+        """
+        A layer prepared for one batch of queries
+        
+        Plain lists large enough for the index engine get an index built
+        for this call only, so a batch pays for it once without the
+        analyzer holding on to a list the caller may change.
+        """
+        if (self.engine == 'index' and isinstance(target_points, (list, tuple))
+                and len(target_points) >= self.index_threshold):
+            return self.build_index(target_points)
+        return target_points
+    
+    def _layer_items(self, target_points: Union[List[Dict], SpatialIndex]) -> List[Dict]:
+        """Return the point records of a layer"""
+        if isinstance(target_points, SpatialIndex):
+            return target_points.items
+        return target_points
+    
+    def _coord_array(self, points):
+        """Return an (n, 2) lat/lon array for points, cached per layer"""
+        if isinstance(points, SpatialIndex):
+            return self._cached_layer(points, 'coords',
+                                      lambda index: haversine_kernel.to_coord_array(index.coords))
+        if hasattr(points, 'shape'):
+            return points
+        if isinstance(points, PointLayer):
+            return self._cached_layer(
+                points, 'coords',
+                lambda layer: haversine_kernel.to_coord_array(list(layer.coord_pairs())))
+        if callable(getattr(points, 'coords', None)):
+            return self._cached_layer(points, 'coords', lambda layer: layer.coords())
+        return self._cached_layer(
+            points, 'coords',
+            lambda layer: haversine_kernel.to_coord_array(
+                [self._extract_coords(p) for p in layer])
+        )
+    
+    def _layer_coords(self, target_points: List[Dict]) -> Tuple[Sequence[float], Sequence[float]]:
+        """Latitude and longitude sequences of a layer, resolved once per layer"""
+        if isinstance(target_points, PointLayer):
+            return target_points.latitudes, target_points.longitudes
+        
+        def resolve(layer):
+            if callable(getattr(layer, 'coords', None)):  # ColumnarLayer
+                coords = layer.coords()
+                return coords[:, 0].tolist(), coords[:, 1].tolist()
+            lats, lons = array('d'), array('d')
+            for point in layer:
+                lat, lon = self._extract_coords(point)
+                lats.append(lat)
+                lons.append(lon)
+            return lats, lons
+        
+        return self._cached_layer(target_points, 'latlon', resolve)
+    
+    def _with_distance(self, target: Dict, distance: float) -> Dict:
+        """A buffer hit: a plain dict copy of the target with its rounded distance"""
+        return dict(target, distance_km=round(distance, 2))
+    
+    def _get_index(self, target_points: Union[List[Dict], SpatialIndex]):
+        """Return a cached index for a layer, or None to use a linear scan"""
+        if isinstance(target_points, SpatialIndex):
+            return target_points
+        if (self.engine != 'index' or len(target_points) < self.index_threshold
+                or not self._cacheable(target_points)):
+            return None
+        return self._cached_layer(target_points, 'index', self.build_index)
+    
+    def _kernel_candidates(self, lat: float, lon: float,
+                           target_points: Union[List[Dict], SpatialIndex],
+                           radius_km: float = None) -> List[int]:
+        """
+        Indices of targets that may be nearest (or within radius_km)
+        
+        The kernel only narrows the search; callers confirm every candidate
+        with haversine_distance so results match the scalar scan exactly.
+        """
+        coords = self._coord_array(target_points)
+        if len(coords) == 0:
+            return []
+        row = next(haversine_kernel.iter_distance_chunks(
+            [(lat, lon)], coords, self.earth_radius_km, self.dtype))[2][0]
+        threshold = row.min() if radius_km is None else radius_km
+        tolerance = haversine_kernel.distance_tolerance_km(self.dtype, threshold)
+        return (row <= threshold + tolerance).nonzero()[0].tolist()
+    
     def buffer_analysis(self, point: Dict, radius_km: float, 
-                       target_points: List[Dict]) -> List[Dict]:
+                       target_points: Union[List[Dict], SpatialIndex],
+                       max_results: int = None,
+                       sort_by_distance: bool = False) -> List[Dict]:
         """
         Find all points within radius of a given point
         
         Args:
             point: Center point with lat/lon
             radius_km: Buffer radius in kilometers
-            target_points: List of points to check
+            target_points: List of points to check, a SpatialIndex or a PostGISLayer
+            max_results: Return only this many nearest points (sorted by distance)
+            sort_by_distance: Sort by distance instead of layer order
         
         Returns:
-            List of points within buffer
+            List of points within buffer as plain dicts with a distance_km,
+            in layer order unless sorted; distance ties keep layer order
         """
         lat1, lon1 = self._extract_coords(point)
-        within_buffer = []
         
-        for target in target_points:
-            lat2, lon2 = self._extract_coords(target)
-            distance = self.haversine_distance(lat1, lon1, lat2, lon2)
-            
-            if distance <= radius_km:
-                target_copy = target.copy()
-                target_copy['distance_km'] = round(distance, 2)
-                within_buffer.append(target_copy)
+        in_database = isinstance(target_points, PostGISLayer)
+        index = None if in_database else self._get_index(target_points)
+        if in_database:
+            # Rows come back in layer order
+            found = target_points.within([(lat1, lon1)], radius_km, self.earth_radius_km)[0]
+            items = [target for target, _ in found]
+            hits = [(i, distance) for i, (_, distance) in enumerate(found)]
+        elif index is not None:
+            items = index.items
+            hits = index.within(lat1, lon1, radius_km)
+        else:
+            items = self._layer_items(target_points)
+            lats, lons = self._layer_coords(items)
+            if self.engine == 'vectorized':
+                candidates = self._kernel_candidates(lat1, lon1, target_points, radius_km)
+            else:
+                candidates = self._window_candidates(lat1, lon1, radius_km, items)
+            hits = []
+            for i in candidates:
+                distance = self.haversine_distance(lat1, lon1, lats[i], lons[i])
+                if distance <= radius_km:
+                    hits.append((i, distance))
+        
+        if max_results is not None:
+            hits = heapq.nsmallest(max_results, hits, key=lambda hit: (hit[1], hit[0]))
+        elif sort_by_distance:
+            hits.sort(key=lambda hit: (hit[1], hit[0]))
+        
+        return [self._with_distance(items[i], distance) for i, distance in hits]
+    
+    def _window_candidates(self, lat: float, lon: float, radius_km: float,
+                           targets: List[Dict]) -> List[int]:
+        """
+        Indices of targets inside a lat/lon box around a search circle
+        
+        The box bounds the circle exactly (it widens toward the poles and
+        spans all longitudes once the circle reaches one), so every point
+        within radius_km is kept. Latitude is narrowed by binary search over
+        the layer sorted by latitude, longitude by a wrapped difference.
+        
+        Returns:
+            Candidate indices in layer order
+        """
+        if radius_km < 0:
+            return []
+        if not self._cacheable(targets):
+            # Sorting an uncached list per query costs more than scanning it
+            return list(range(len(targets)))
+        lat_keys, lat_order = self._cached_layer(targets, 'lat_order', self._latitude_order)
+        angle = radius_km / self.earth_radius_km
+        # Slack keeps float rounding from excluding a point on the boundary
+        lat_margin = math.degrees(angle) * (1 + 1e-9) + 1e-9
+        lo = bisect.bisect_left(lat_keys, lat - lat_margin)
+        hi = bisect.bisect_right(lat_keys, lat + lat_margin)
+        band = lat_order[lo:hi]
         
-        return within_buffer
+        if angle < math.pi / 2 - math.radians(abs(lat)):
+            # Widest longitude offset on a circle that excludes both poles
+            lon_margin = math.degrees(math.asin(
+                min(1.0, math.sin(angle) / math.cos(math.radians(lat))))) * (1 + 1e-9) + 1e-9
+            _, lons = self._layer_coords(targets)
+            band = [i for i in band
+                    if abs((lons[i] - lon + 180.0) % 360.0 - 180.0) <= lon_margin]
+        
+        band.sort()
+        return band
+    
+    def _latitude_order(self, targets: List[Dict]) -> Tuple[List[float], List[int]]:
+        """Latitudes of a layer in ascending order, with their point indices"""
+        lats, _ = self._layer_coords(targets)
+        order = sorted(range(len(lats)), key=lats.__getitem__)
+        return [lats[i] for i in order], order
     
     def nearest_neighbor(self, point: Dict, 
-                        target_points: List[Dict]) -> Tuple[Dict, float]:
+                        target_points: Union[List[Dict], SpatialIndex]) -> Tuple[Dict, float]:
         """
         Find nearest neighbor to a given point
         
         Args:
             point: Source point
-            target_points: List of potential neighbors
+            target_points: List of potential neighbors, a SpatialIndex or a PostGISLayer
         
         Returns:
-            Tuple of (nearest point, distance in km)
+            Tuple of (nearest point, distance in km); records of a loaded
+            PointLayer come back as plain dicts
         """
+        nearest, distance = self._nearest(point, target_points)
+        if isinstance(nearest, PointRecord):
+            nearest = nearest.copy()
+        return nearest, distance
+    
+    def _nearest(self, point: Dict,
+                 target_points: Union[List[Dict], SpatialIndex]) -> Tuple[Dict, float]:
+        """nearest_neighbor, returning layer records as they are stored"""
         lat1, lon1 = self._extract_coords(point)
         min_distance = float('inf')
         nearest = None
         
-        for target in target_points:
-            lat2, lon2 = self._extract_coords(target)
-            distance = self.haversine_distance(lat1, lon1, lat2, lon2)
+        if isinstance(target_points, PostGISLayer):
+            nearest, min_distance = target_points.nearest([(lat1, lon1)], self.earth_radius_km)[0]
+            return nearest, round(min_distance, 2)
+        
+        index = self._get_index(target_points)
+        if index is not None:
+            for i, distance in index.nearest(lat1, lon1, k=1):
+                nearest, min_distance = index.items[i], distance
+            return nearest, round(min_distance, 2)
+        
+        targets = self._layer_items(target_points)
+        lats, lons = self._layer_coords(targets)
+        candidates = range(len(targets))
+        if self.engine == 'vectorized':
+            candidates = self._kernel_candidates(lat1, lon1, target_points)
+        
+        nearest_index = None
+        for i in candidates:
+            distance = self.haversine_distance(lat1, lon1, lats[i], lons[i])
             
             if distance < min_distance:
                 min_distance = distance
-                nearest = target
+                nearest_index = i
         
+        if nearest_index is not None:
+            nearest = targets[nearest_index]
         return nearest, round(min_distance, 2)
     
     def calculate_ej_risk_score(self, location: Dict, 
-                                superfund_sites: List[Dict],
-                                air_quality_data: List[Dict],
-                                water_sources: List[Dict],
+                                superfund_sites: Union[List[Dict], SpatialIndex],
+                                air_quality_data: Union[List[Dict], SpatialIndex],
+                                water_sources: Union[List[Dict], SpatialIndex],
                                 demographic_vulnerability: float = 0.5) -> Dict:
         """
         Calculate Environmental Justice risk score
@@ -119,37 +473,389 @@ class SpatialAnalyzer:
         nearest_superfund, superfund_distance = self.nearest_neighbor(
             location, superfund_sites
         )
-        proximity_risk = max(0, 1.0 - (superfund_distance / 10.0))
+        proximity_risk = self._proximity_risk(superfund_distance)
         
         # 2. Air quality assessment
         nearest_air, air_distance = self.nearest_neighbor(
             location, air_quality_data
         )
-        if nearest_air and 'aqi' in nearest_air:
-            air_risk = min(nearest_air['aqi'] / 200.0, 1.0)
-        else:
-            air_risk = 0.5  # Default moderate risk
+        air_risk = self._air_risk(nearest_air)
         
         # 3. Water source vulnerability
         water_within_5km = self.buffer_analysis(
             location, 5.0, water_sources
         )
+        water_risk = self._water_risk(water_within_5km)
+        
+        # 4. Composite risk calculation
+        composite_risk = self._composite_risk(
+            proximity_risk, air_risk, water_risk, demographic_vulnerability
+        )
+        
+        return self._assessment_record(
+            location, lat, lon, composite_risk,
+            proximity_risk, air_risk, water_risk, demographic_vulnerability,
+            nearest_superfund, superfund_distance,
+            nearest_air, air_distance,
+            len(water_within_5km), datetime.now().isoformat()
+        )
+    
+    @timed('score.batch')
+    def calculate_ej_risk_scores(self, locations: List[Dict],
+                                 superfund_sites: Union[List[Dict], SpatialIndex],
+                                 air_quality_data: Union[List[Dict], SpatialIndex],
+                                 water_sources: Union[List[Dict], SpatialIndex],
+                                 demographic_vulnerability: Union[float, List[float]] = 0.5,
+                                 columnar: bool = False,
+                                 workers: int = 1) -> Union[List[Dict], Dict]:
+        """
+        Calculate Environmental Justice risk scores for many locations at once
+        
+        Each layer's coordinates are normalized once and the proximity, air,
+        water and demographic factors are computed column-wise. Every record
+        matches calculate_ej_risk_score for the same location, except that
+        the whole batch shares one timestamp.
+        
+        Args:
+            locations: Locations to assess
+            superfund_sites: List of Superfund sites
+            air_quality_data: Air quality measurements
+            water_sources: Water quality measurements
+            demographic_vulnerability: Demographic risk factor (0-1), either
+                one value for all locations or one value per location
+            columnar: Return a dict of columns instead of per-location dicts
+            workers: Number of worker processes; locations are sharded across
+                a process pool when greater than 1. Ignored when a layer is a
+                PostGISLayer, whose lookups already run in the database.
+                Workers are forked only while this is the sole thread; from
+                threaded hosts (the pipeline, the scoring service) they are
+                started by a forkserver and receive the layers pickled
+        
+        Returns:
+            List of risk assessments, or a columnar dict keyed by field
+        """
+        timestamp = datetime.now().isoformat()
+        demographics = self._demographic_column(demographic_vulnerability, len(locations))
+        
+        layers = tuple(self._query_layer(layer)
+                       for layer in (superfund_sites, air_quality_data, water_sources))
+        in_database = any(isinstance(layer, PostGISLayer) for layer in layers)
+        if workers and workers > 1 and len(locations) > 1 and not in_database:
+            records = self._score_parallel(locations, layers, demographics,
+                                           timestamp, workers)
+        else:
+            records = self._score_batch(locations, layers, demographics, timestamp)
+        self.metrics.count('locations_scored', len(records))
+        
+        if columnar:
+            return self._to_columns(records, timestamp)
+        return records
+    
+    @timed('score.incremental')
+    def calculate_ej_risk_scores_incremental(self, locations: List[Dict],
+                                             superfund_sites: Union[List[Dict], SpatialIndex],
+                                             air_quality_data: Union[List[Dict], SpatialIndex],
+                                             water_sources: Union[List[Dict], SpatialIndex],
+                                             previous_assessments: List[Dict],
+                                             layer_deltas: Dict[str, LayerDelta],
+                                             demographic_vulnerability: Union[float, List[float]] = 0.5,
+                                             workers: int = 1) -> Tuple[List[Dict], List[int]]:
+        """
+        Rescore only the locations whose nearby inputs changed
+        
+        A location keeps its previous assessment unless it is new, its
+        demographic factor changed, or a changed feature position (new or
+        old) lies within its previous nearest Superfund or air distance, or
+        within its 5 km water buffer. Any other change cannot alter its
+        nearest features or buffer contents, so the reused assessment is
+        identical to a full rescore apart from its timestamp.
+        
+        Args:
+            locations: Locations to assess
+            superfund_sites: List of Superfund sites
+            air_quality_data: Air quality measurements
+            water_sources: Water quality measurements
+            previous_assessments: Assessments from the previous run
+            layer_deltas: LayerDelta per layer since previous_assessments were
+                computed, keyed 'superfund', 'air' and 'water'
+            demographic_vulnerability: Demographic risk factor (0-1), either
+                one value for all locations or one value per location
+            workers: Number of worker processes for the rescored locations
+        
+        Returns:
+            Tuple of (assessments for all locations, indices that were rescored)
+        """
+        demographics = self._demographic_column(demographic_vulnerability, len(locations))
+        
+        previous = {}
+        for assessment in previous_assessments:
+            key = (assessment['location'], assessment['latitude'], assessment['longitude'])
+            previous.setdefault(key, assessment)
+        
+        # Index the positions each delta touched so every location is
+        # checked with one radius query per layer
+        touched = {
+            name: SpatialIndex(layer_deltas[name].positions, self.haversine_distance,
+                               earth_radius_km=self.earth_radius_km)
+            for name in ('superfund', 'air', 'water')
+        }
+        
+        records = []
+        affected = []
+        for i, location in enumerate(locations):
+            lat, lon = self._extract_coords(location)
+            old = previous.get((location.get('location', 'Unknown'), lat, lon))
+            if old is None or self._inputs_changed(old, lat, lon, demographics[i], touched):
+                affected.append(i)
+            records.append(old)
+        
+        if affected:
+            rescored = self.calculate_ej_risk_scores(
+                [locations[i] for i in affected],
+                superfund_sites, air_quality_data, water_sources,
+                demographic_vulnerability=[demographics[i] for i in affected],
+                workers=workers
+            )
+            for i, record in zip(affected, rescored):
+                records[i] = record
+        
+        self.metrics.count('assessments_reused', len(records) - len(affected))
+        return records, affected
+    
+    def _inputs_changed(self, assessment: Dict, lat: float, lon: float,
+                        demographic: float, touched: Dict[str, SpatialIndex]) -> bool:
+        """True if a previous assessment may be stale for this location"""
+        if round(demographic, 3) != assessment['risk_factors']['demographic_vulnerability']:
+            return True
+        
+        radii = (
+            ('superfund', assessment['nearest_superfund']['distance_km']),
+            ('air', assessment['air_quality']['distance_km']),
+            ('water', 5.0)
+        )
+        for name, radius in radii:
+            if touched[name].within(lat, lon, radius + self.RESCORE_SLACK_KM):
+                return True
+        return False
+    
+    def _demographic_column(self, demographic_vulnerability: Union[float, List[float]],
+                            count: int) -> List[float]:
+        """Expand a scalar demographic factor to one value per location"""
+        if isinstance(demographic_vulnerability, (int, float)):
+            return [demographic_vulnerability] * count
+        demographics = list(demographic_vulnerability)
+        if len(demographics) != count:
+            raise ValueError("demographic_vulnerability must match the number of locations")
+        return demographics
+    
+    def _score_parallel(self, locations: List[Dict], layers: Tuple,
+                        demographics: List[float], timestamp: str,
+                        workers: int) -> List[Dict]:
+        """Score location shards across a process pool, preserving order"""
+        # Build indexes and coordinate arrays once in the parent so forked
+        # workers inherit them instead of rebuilding per shard
+        shared_layers = tuple(self._shareable_layer(layer) for layer in layers)
+        state = {
+            'analyzer': self,
+            'locations': locations,
+            'layers': shared_layers,
+            'demographics': demographics,
+            'timestamp': timestamp
+        }
+        
+        # Several shards per worker keep the pool busy when shards are uneven
+        shard_size = max(1, math.ceil(len(locations) / (workers * 4)))
+        shards = [(start, min(start + shard_size, len(locations)))
+                  for start in range(0, len(locations), shard_size)]
+        
+        start_methods = multiprocessing.get_all_start_methods()
+        if 'fork' in start_methods and threading.active_count() == 1:
+            # Workers inherit the state through fork; only shard bounds are
+            # pickled. The lock keeps the shared state to one pool at a time
+            with _SCORING_LOCK:
+                _SCORING_STATE.update(state)
+                try:
+                    results = self._run_shards(shards, workers,
+                                               multiprocessing.get_context('fork'))
+                finally:
+                    _SCORING_STATE.clear()
+        else:
+            # Forking with other threads alive can copy a held lock into the
+            # child and deadlock it, so threaded hosts use a forkserver (or
+            # the platform default); the state is pickled once per worker
+            context = (multiprocessing.get_context('forkserver')
+                       if 'forkserver' in start_methods else None)
+            results = self._run_shards(shards, workers, context,
+                                       _init_scoring_worker, (state,))
+        
+        return [record for shard in results for record in shard]
+    
+    def _run_shards(self, shards: List[Tuple[int, int]], workers: int, context,
+                    initializer=None, initargs: Tuple = ()) -> List[List[Dict]]:
+        """Map _score_shard over shard bounds in a fresh process pool"""
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=initializer,
+                                 initargs=initargs) as executor:
+            return list(executor.map(_score_shard, shards))
+    
+    def _shareable_layer(self, layer: Union[List[Dict], SpatialIndex]):
+        """Prepare a layer for sharing with scoring workers"""
+        index = self._get_index(layer)
+        if index is not None:
+            return index
+        if self.engine == 'vectorized':
+            self._coord_array(layer)
+        return layer
+    
+    def _score_batch(self, locations: List[Dict], layers: Tuple,
+                     demographics: List[float], timestamp: str) -> List[Dict]:
+        """Score a batch of locations in the current process"""
+        superfund_sites, air_quality_data, water_sources = layers
+        coords = [self._extract_coords(location) for location in locations]
+        
+        # Nearest-feature and buffer lookups, one pass per layer
+        superfund = self._nearest_many(coords, superfund_sites)
+        air = self._nearest_many(coords, air_quality_data)
+        water = self._within_many(coords, 5.0, water_sources)
+        
+        # Risk factor columns
+        proximity_risks = [self._proximity_risk(distance) for _, distance in superfund]
+        air_risks = [self._air_risk(nearest) for nearest, _ in air]
+        water_risks = [self._water_risk(hits) for hits in water]
+        composite_risks = [
+            self._composite_risk(proximity, air_risk, water_risk, demographic)
+            for proximity, air_risk, water_risk, demographic
+            in zip(proximity_risks, air_risks, water_risks, demographics)
+        ]
+        
+        records = [
+            self._assessment_record(
+                location, lat, lon, composite,
+                proximity, air_risk, water_risk, demographic,
+                nearest_superfund, superfund_distance,
+                nearest_air, air_distance,
+                len(hits), timestamp
+            )
+            for (location, (lat, lon), composite, proximity, air_risk, water_risk,
+                 demographic, (nearest_superfund, superfund_distance),
+                 (nearest_air, air_distance), hits)
+            in zip(locations, coords, composite_risks, proximity_risks, air_risks,
+                   water_risks, demographics, superfund, air, water)
+        ]
+        
+        return records
+    
+    def _nearest_many(self, coords: List[Tuple[float, float]],
+                      target_points: Union[List[Dict], SpatialIndex]) -> List[Tuple[Dict, float]]:
+        """Nearest neighbor (record, rounded distance) for every coordinate"""
+        if isinstance(target_points, PostGISLayer):
+            # One KNN statement per chunk of locations
+            return [(nearest, round(distance, 2)) for nearest, distance
+                    in target_points.nearest(coords, self.earth_radius_km)]
+        
+        targets = self._layer_items(target_points)
+        index = self._get_index(target_points)
+        
+        if index is None and self.engine == 'vectorized' and coords and len(targets):
+            results = []
+            layer = self._coord_array(target_points)
+            lats, lons = self._layer_coords(targets)
+            for start, stop, block in haversine_kernel.iter_distance_chunks(
+                    coords, layer, self.earth_radius_km, self.dtype):
+                for (lat, lon), row in zip(coords[start:stop], block):
+                    threshold = row.min()
+                    tolerance = haversine_kernel.distance_tolerance_km(self.dtype, threshold)
+                    nearest_index, min_distance = None, float('inf')
+                    for i in (row <= threshold + tolerance).nonzero()[0].tolist():
+                        distance = self.haversine_distance(lat, lon, lats[i], lons[i])
+                        if distance < min_distance:
+                            nearest_index, min_distance = i, distance
+                    nearest = targets[nearest_index] if nearest_index is not None else None
+                    results.append((nearest, round(min_distance, 2)))
+            return results
+        
+        if index is not None:
+            results = []
+            for lat, lon in coords:
+                nearest, min_distance = None, float('inf')
+                for i, distance in index.nearest(lat, lon, k=1):
+                    nearest, min_distance = index.items[i], distance
+                results.append((nearest, round(min_distance, 2)))
+            return results
+        
+        return [self._nearest({'latitude': lat, 'longitude': lon}, targets)
+                for lat, lon in coords]
+    
+    def _within_many(self, coords: List[Tuple[float, float]], radius_km: float,
+                     target_points: Union[List[Dict], SpatialIndex]) -> List[List[Dict]]:
+        """Records within radius_km of every coordinate, in layer order"""
+        if isinstance(target_points, PostGISLayer):
+            # One ST_DWithin statement per chunk of locations (layer order)
+            return [[record for record, _ in hits] for hits
+                    in target_points.within(coords, radius_km, self.earth_radius_km)]
+        
+        targets = self._layer_items(target_points)
+        index = self._get_index(target_points)
+        
+        if index is None and self.engine == 'vectorized' and coords and len(targets):
+            tolerance = haversine_kernel.distance_tolerance_km(self.dtype, radius_km)
+            candidates = haversine_kernel.haversine_within(
+                coords, self._coord_array(target_points), radius_km + tolerance,
+                self.earth_radius_km, self.dtype)
+            results = []
+            lats, lons = self._layer_coords(targets)
+            for (lat, lon), hits in zip(coords, candidates):
+                within = []
+                for i in hits.tolist():
+                    if self.haversine_distance(lat, lon, lats[i], lons[i]) <= radius_km:
+                        within.append(targets[i])
+                results.append(within)
+            return results
+        
+        if index is not None:
+            return [[index.items[i] for i, _ in index.within(lat, lon, radius_km)]
+                    for lat, lon in coords]
+        
+        return [self.buffer_analysis({'latitude': lat, 'longitude': lon}, radius_km, targets)
+                for lat, lon in coords]
+    
+    def _proximity_risk(self, superfund_distance: float) -> float:
+        """Risk from the (rounded) distance to the nearest Superfund site"""
+        return max(0, 1.0 - (superfund_distance / 10.0))
+    
+    def _air_risk(self, nearest_air: Dict) -> float:
+        """Risk from the AQI of the nearest air quality station"""
+        if nearest_air and 'aqi' in nearest_air:
+            return min(nearest_air['aqi'] / 200.0, 1.0)
+        return 0.5  # Default moderate risk
+    
+    def _water_risk(self, water_within_5km: List[Dict]) -> float:
+        """Risk from dissolved oxygen of nearby water sources"""
         if water_within_5km:
             # Average dissolved oxygen (lower is worse)
             avg_do = sum(w.get('dissolved_oxygen', 8.0) 
                         for w in water_within_5km) / len(water_within_5km)
-            water_risk = max(0, (8.0 - avg_do) / 8.0)
-        else:
-            water_risk = 0.3  # Default if no data
-        
-        # 4. Composite risk calculation
-        composite_risk = (
+            return max(0, (8.0 - avg_do) / 8.0)
+        return 0.3  # Default if no data
+    
+    def _composite_risk(self, proximity_risk: float, air_risk: float,
+                        water_risk: float, demographic_vulnerability: float) -> float:
+        """Weighted composite of the four risk factors"""
+        return (
             proximity_risk * 0.3 +
             air_risk * 0.3 +
             water_risk * 0.2 +
             demographic_vulnerability * 0.2
         )
-        
+    
+    def _assessment_record(self, location: Dict, lat: float, lon: float,
+                           composite_risk: float, proximity_risk: float,
+                           air_risk: float, water_risk: float,
+                           demographic_vulnerability: float,
+                           nearest_superfund: Dict, superfund_distance: float,
+                           nearest_air: Dict, air_distance: float,
+                           water_count: int, timestamp: str) -> Dict:
+        """Assemble the risk assessment dict for one location"""
         # Categorize risk
         if composite_risk >= 0.7:
             category = 'High Risk - Priority Intervention'
@@ -186,10 +892,33 @@ class SpatialAnalyzer:
                 'aqi': nearest_air.get('aqi', 'N/A') if nearest_air else 'N/A',
                 'distance_km': air_distance
             },
-            'water_sources_within_5km': len(water_within_5km),
-            'timestamp': datetime.now().isoformat()
+            'water_sources_within_5km': water_count,
+            'timestamp': timestamp
         }
     
+    def _to_columns(self, records: List[Dict], timestamp: str) -> Dict:
+        """Convert risk assessment records to a columnar layout"""
+        return {
+            'location': [r['location'] for r in records],
+            'latitude': [r['latitude'] for r in records],
+            'longitude': [r['longitude'] for r in records],
+            'composite_risk': [r['composite_risk'] for r in records],
+            'proximity_to_superfund': [r['risk_factors']['proximity_to_superfund'] for r in records],
+            'air_quality_risk': [r['risk_factors']['air_quality_risk'] for r in records],
+            'water_vulnerability': [r['risk_factors']['water_vulnerability'] for r in records],
+            'demographic_vulnerability': [r['risk_factors']['demographic_vulnerability'] for r in records],
+            'category': [r['category'] for r in records],
+            'priority': [r['priority'] for r in records],
+            'nearest_superfund_name': [r['nearest_superfund']['name'] for r in records],
+            'nearest_superfund_distance_km': [r['nearest_superfund']['distance_km'] for r in records],
+            'air_quality_station': [r['air_quality']['nearest_station'] for r in records],
+            'air_quality_aqi': [r['air_quality']['aqi'] for r in records],
+            'air_quality_distance_km': [r['air_quality']['distance_km'] for r in records],
+            'water_sources_within_5km': [r['water_sources_within_5km'] for r in records],
+            'timestamp': timestamp
+        }
+    
+    @timed('prioritize')
     def prioritize_remediation_areas(self, risk_assessments: List[Dict],
                                     population_density: Dict = None,
                                     infrastructure_data: Dict = None) -> List[Dict]:
@@ -275,14 +1004,31 @@ class SpatialAnalyzer:
         
         return actions if actions else ['Continue routine monitoring']
     
+    @timed('heatmap')
     def generate_heatmap_data(self, risk_assessments: List[Dict], 
-                             grid_resolution: float = 0.1) -> Dict:
+                             grid_resolution: float = 0.1,
+                             method: str = 'idw',
+                             cutoff_km: float = 50.0,
+                             power: float = 2.0,
+                             bandwidth_km: float = None,
+                             encoding: str = 'uint8') -> Dict:
         """
         Generate heatmap data for visualization
         
+        With NumPy available the composite risk is interpolated server-side
+        onto a north-up raster of grid_resolution cells, so clients receive
+        a fixed-size grid instead of the point cloud. The input points are
+        still included for existing clients.
+        
         Args:
             risk_assessments: List of risk assessments
             grid_resolution: Grid cell size in degrees
+            method: 'idw' (inverse-distance-weighted risk) or 'kde'
+                (risk-weighted Gaussian density)
+            cutoff_km: Assessments farther than this do not affect a cell
+            power: IDW distance exponent
+            bandwidth_km: KDE kernel width (defaults to cutoff_km / 3)
+            encoding: Grid encoding, 'uint8' or 'float32'
         
         Returns:
             Heatmap data structure
@@ -294,7 +1040,6 @@ class SpatialAnalyzer:
         min_lat, max_lat = min(lats), max(lats)
         min_lon, max_lon = min(lons), max(lons)
         
-        # Create grid
         heatmap_points = []
         for assessment in risk_assessments:
             heatmap_points.append({
@@ -304,7 +1049,7 @@ class SpatialAnalyzer:
                 'category': assessment['category']
             })
         
-        return {
+        heatmap = {
             'type': 'heatmap',
             'bounds': {
                 'min_lat': min_lat,
@@ -318,9 +1063,48 @@ class SpatialAnalyzer:
                 'generated_at': datetime.now().isoformat()
             }
         }
+        
+        if heatmap_grid is not None:
+            heatmap['grid'] = self._heatmap_grid(
+                lats, lons, [a['composite_risk'] for a in risk_assessments],
+                grid_resolution, method, cutoff_km, power, bandwidth_km, encoding
+            )
+        
+        return heatmap
+    
+    def _heatmap_grid(self, lats: List[float], lons: List[float], risks: List[float],
+                      grid_resolution: float, method: str, cutoff_km: float,
+                      power: float, bandwidth_km: float, encoding: str) -> Dict:
+        """Rasterize risk onto a grid covering the assessments"""
+        if method not in heatmap_grid.METHODS:
+            raise ValueError(f"Unknown heatmap method: {method}")
+        
+        spec = heatmap_grid.grid_spec(min(lats), max(lats), min(lons), max(lons),
+                                      grid_resolution)
+        points = list(zip(lats, lons))
+        if method == 'idw':
+            grid = heatmap_grid.idw_grid(spec, points, risks, cutoff_km, power,
+                                         self.earth_radius_km, self.dtype)
+            # Interpolated risk stays within the 0-1 risk scale
+            encoded = heatmap_grid.encode_grid(grid, encoding, value_range=(0.0, 1.0))
+        else:
+            bandwidth_km = bandwidth_km or cutoff_km / 3.0
+            grid = heatmap_grid.kde_grid(spec, points, risks, bandwidth_km, cutoff_km,
+                                         self.earth_radius_km, self.dtype)
+            encoded = heatmap_grid.encode_grid(grid, encoding)
+        
+        return dict(encoded,
+                    method=method,
+                    resolution=grid_resolution,
+                    cutoff_km=cutoff_km,
+                    origin='north-west',
+                    bounds={key: spec[key] for key in
+                            ('min_lat', 'max_lat', 'min_lon', 'max_lon')})
     
     def _extract_coords(self, point: Dict) -> Tuple[float, float]:
         """Extract latitude and longitude from various formats"""
+        if isinstance(point, PointRecord):
+            return point.latitude, point.longitude
         if 'latitude' in point and 'longitude' in point:
             return float(point['latitude']), float(point['longitude'])
         elif 'LATITUDE' in point and 'LONGITUDE' in point:
@@ -332,52 +1116,156 @@ class SpatialAnalyzer:
             raise ValueError(f"Cannot extract coordinates from point: {point}")
 
 
+# Scoring state inherited by forked pool workers, or installed by
+# _init_scoring_worker in spawned ones (see _score_parallel)
+_SCORING_STATE = {}
+_SCORING_LOCK = threading.Lock()
+
+
+def demographic_vulnerability(locations: List[Dict]) -> List[float]:
+    """
+    Demographic vulnerability factor per location
+    
+    Varies by location name for now; in production this would come from
+    census data.
+    """
+    return [0.7 if 'Los Angeles' in location.get('location', '') else 0.5
+            for location in locations]
+
+
+def _init_scoring_worker(state: Dict):
+    """Install the shared scoring state in a spawned worker"""
+    _SCORING_STATE.update(state)
+
+
+def _score_shard(bounds: Tuple[int, int]) -> List[Dict]:
+    """Score locations[start:stop] against the shared reference layers"""
+    start, stop = bounds
+    state = _SCORING_STATE
+    return state['analyzer']._score_batch(
+        state['locations'][start:stop],
+        state['layers'],
+        state['demographics'][start:stop],
+        state['timestamp']
+    )
+
+
 def main():
     """Main execution function"""
+    parser = argparse.ArgumentParser(description='ThrivingRoots Spatial Analysis Module')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes for risk scoring')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Rescore only locations whose nearby inputs changed since the last run')
+    parser.add_argument('--postgis', action='store_true',
+                        help='Read layers from PostGIS (see postgis_loader.py) and run lookups there')
+    parser.add_argument('--dsn', default=os.environ.get('EIC_POSTGIS_DSN', ''),
+                        help='PostgreSQL connection string (default: $EIC_POSTGIS_DSN, then PG* variables)')
+    parser.add_argument('--metrics', default=None,
+                        help='Write a JSON run report (stage timings, counters, peak RSS) here')
+    parser.add_argument('--prometheus', default=None,
+                        help='Write the run report in Prometheus text format here')
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("ThrivingRoots Spatial Analysis Module")
     print("=" * 60)
     
+    # Initialize analyzer
+    metrics = from_args(args.metrics, args.prometheus)
+    analyzer = SpatialAnalyzer(instrumentation=metrics)
+    
     # Load data
     print("\nLoading environmental data...")
-    with open('../outputs/california_air_quality.geojson', 'r') as f:
-        air_data = json.load(f)
-    
-    with open('../outputs/california_water_quality.geojson', 'r') as f:
-        water_data = json.load(f)
+    backend = None
+    if args.postgis:
+        # Reference layers stay in the database; nearest-neighbor and buffer
+        # lookups for all locations run there as set-based queries
+        backend = PostGISBackend(args.dsn)
+        backend.ensure_indexes()
+        superfund_sites = backend.layer('superfund_sites')
+        water_sources = backend.layer('water_quality')
+        air_reference = backend.layer('air_quality')
+        air_quality = list(air_reference)
+    else:
+        # Columnar layers are memory-mapped when present; GeoJSON is streamed
+        # into a compact PointLayer
+        layers = {}
+        for name in ('california_air_quality', 'california_water_quality',
+                     'california_superfund_sites'):
+            path = f'../outputs/{name}.geojson'
+            if layer_store is not None and layer_store.is_columnar_layer(f'../outputs/{name}.layer'):
+                path = f'../outputs/{name}.layer'
+            layers[name] = analyzer.load_layer(path)
+        
+        air_quality = layers['california_air_quality']
+        water_sources = layers['california_water_quality']
+        superfund_sites = layers['california_superfund_sites']
+        air_reference = air_quality
     
-    with open('../outputs/california_superfund_sites.geojson', 'r') as f:
-        superfund_data = json.load(f)
+    # Perform risk assessments for each air quality location
+    print("\nPerforming Environmental Justice Risk Assessments...")
     
-    # Extract features
-    air_quality = [f['properties'] | {'geometry': f['geometry']} 
-                  for f in air_data['features']]
-    water_sources = [f['properties'] | {'geometry': f['geometry']} 
-                    for f in water_data['features']]
-    superfund_sites = [f['properties'] | {'geometry': f['geometry']} 
-                      for f in superfund_data['features']]
+    demo_vuln = demographic_vulnerability(air_quality)
     
-    # Initialize analyzer
-    analyzer = SpatialAnalyzer()
+    # The manifest records the layers the saved assessments were scored
+    # against. PostGIS runs build it from the stored data_hash column (a
+    # different hash, so switching sources rescores everything once); file
+    # runs hash every record and only do so with --incremental
+    manifest = LayerManifest('../outputs/analysis_manifest.json')
+    layer_deltas = None
+    if backend is not None:
+        with metrics.timer('incremental.refresh'):
+            layer_deltas = {
+                name: manifest.refresh(name, backend.iter_hashes(layer_type),
+                                       lambda row: (row[1], row[2]), lambda row: row[0],
+                                       lambda row: row[3])
+                for name, layer_type in (('superfund', 'superfund_sites'),
+                                         ('air', 'air_quality'), ('water', 'water_quality'))
+            }
+    elif args.incremental:
+        with metrics.timer('incremental.refresh'):
+            layer_deltas = {
+                name: manifest.refresh(name, layer, analyzer._extract_coords,
+                                       lambda record: record,
+                                       lambda record: content_hash(dict(record)))
+                for name, layer in (('superfund', superfund_sites), ('air', air_reference),
+                                    ('water', water_sources))
+            }
     
-    # Perform risk assessments for each air quality location
-    print("\nPerforming Environmental Justice Risk Assessments...")
-    risk_assessments = []
+    previous_assessments = None
+    if (args.incremental and manifest.generated_at is not None
+            and os.path.exists('../outputs/risk_assessments.json')):
+        with open('../outputs/risk_assessments.json', 'r') as f:
+            previous_assessments = json.load(f)
+        for name, delta in layer_deltas.items():
+            print(f"  {name}: {delta.summary()}")
     
-    for location in air_quality:
-        # Vary demographic vulnerability based on location
-        # In production, this would come from census data
-        demo_vuln = 0.7 if 'Los Angeles' in location.get('location', '') else 0.5
-        
-        assessment = analyzer.calculate_ej_risk_score(
-            location,
+    if previous_assessments is not None:
+        risk_assessments, rescored = analyzer.calculate_ej_risk_scores_incremental(
+            air_quality,
             superfund_sites,
+            air_reference,
+            water_sources,
+            previous_assessments,
+            layer_deltas,
+            demographic_vulnerability=demo_vuln,
+            workers=args.workers
+        )
+        print(f"  Rescored {len(rescored)} of {len(risk_assessments)} locations")
+        assessments_to_print = [risk_assessments[i] for i in rescored]
+    else:
+        risk_assessments = analyzer.calculate_ej_risk_scores(
             air_quality,
+            superfund_sites,
+            air_reference,
             water_sources,
-            demographic_vulnerability=demo_vuln
+            demographic_vulnerability=demo_vuln,
+            workers=args.workers
         )
-        risk_assessments.append(assessment)
-        
+        assessments_to_print = risk_assessments
+    
+    for assessment in assessments_to_print:
         print(f"\n  Location: {assessment['location']}")
         print(f"  Composite Risk: {assessment['composite_risk']} ({assessment['category']})")
         print(f"  Priority: {assessment['priority']}")
@@ -400,17 +1288,30 @@ def main():
     
     # Save outputs
     print("\nSaving analysis results...")
-    with open('../outputs/risk_assessments.json', 'w') as f:
-        json.dump(risk_assessments, f, indent=2)
-    print("  Saved: risk_assessments.json")
-    
-    with open('../outputs/priority_areas.json', 'w') as f:
-        json.dump(priority_areas, f, indent=2)
-    print("  Saved: priority_areas.json")
+    with metrics.timer('write.json'):
+        with open('../outputs/risk_assessments.json', 'w') as f:
+            json.dump(risk_assessments, f, indent=2)
+        print("  Saved: risk_assessments.json")
+        
+        with open('../outputs/priority_areas.json', 'w') as f:
+            json.dump(priority_areas, f, indent=2)
+        print("  Saved: priority_areas.json")
+        
+        with open('../outputs/heatmap_data.json', 'w') as f:
+            json.dump(heatmap, f, indent=2)
+        print("  Saved: heatmap_data.json")
+        
+        if layer_deltas is not None:
+            manifest.save()
+            print("  Saved: analysis_manifest.json")
+        elif os.path.exists(manifest.path):
+            # The new assessments were not recorded against it, so the next
+            # --incremental run must start over with a full scoring
+            os.remove(manifest.path)
+            print("  Removed stale analysis_manifest.json")
     
-    with open('../outputs/heatmap_data.json', 'w') as f:
-        json.dump(heatmap, f, indent=2)
-    print("  Saved: heatmap_data.json")
+    if backend is not None:
+        backend.close()
     
     print("\n" + "=" * 60)
     print("Spatial Analysis Complete!")
@@ -418,6 +1319,10 @@ def main():
     print(f"\nAssessed {len(risk_assessments)} locations")
     print(f"Identified {sum(1 for a in risk_assessments if a['priority'] == 1)} high-priority areas")
     print(f"Generated heatmap with {len(heatmap['points'])} data points")
+    if 'grid' in heatmap:
+        rows, cols = heatmap['grid']['shape']
+        print(f"Heatmap grid: {rows} x {cols} cells ({heatmap['grid']['encoding']})")
+    write_reports(metrics, args.metrics, args.prometheus, 'spatial_analysis')
 
 
 if __name__ == '__main__':
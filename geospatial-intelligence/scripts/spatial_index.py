@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Spatial Index
+KD-tree over unit-sphere vectors for nearest-neighbor and radius queries
+"""
+
+import heapq
+import math
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+class SpatialIndex:
+    """
+    KD-tree over 3D unit-sphere vectors built once per layer
+
+    Points are projected from lat/lon onto the unit sphere, where the
+    straight-line (chord) distance grows monotonically with great-circle
+    distance. The tree prunes candidates by chord distance and every
+    reported distance is recomputed with the exact great-circle function,
+    so results match a linear haversine scan.
+    """
+
+    # Slack added to chord thresholds so float rounding never drops a
+    # candidate that the exact haversine check would accept
+    CHORD_TOLERANCE = 1e-9
+
+    def __init__(self, coords: Sequence[Tuple[float, float]],
+                 distance_fn: Callable[[float, float, float, float], float],
+                 earth_radius_km: float = 6371.0,
+                 items: Optional[Sequence[Any]] = None,
+                 leaf_size: int = 16):
+        """
+        Build the index
+
+        Args:
+            coords: (lat, lon) pairs in degrees
+            distance_fn: Exact distance function (lat1, lon1, lat2, lon2) -> km
+            earth_radius_km: Sphere radius used to convert km to chord length
+            items: Optional sequence of payload objects aligned with coords
+            leaf_size: Maximum number of points stored in a leaf
+        """
+        self.coords = [(float(lat), float(lon)) for lat, lon in coords]
+        self.items = items
+        self.distance_fn = distance_fn
+        self.earth_radius_km = earth_radius_km
+        self.leaf_size = max(1, leaf_size)
+
+        self._xyz = [self._to_unit_vector(lat, lon) for lat, lon in self.coords]
+        self._order = list(range(len(self._xyz)))
+
+        # Flat node arrays: leaves have axis == -1 and own _order[start:end]
+        self._axis = []
+        self._split = []
+        self._left = []
+        self._right = []
+        self._start = []
+        self._end = []
+
+        if self._xyz:
+            self._build(0, len(self._order))
+
+    def __len__(self) -> int:
+        return len(self.coords)
+
+    @staticmethod
+    def _to_unit_vector(lat: float, lon: float) -> Tuple[float, float, float]:
+        """Project lat/lon (degrees) onto the unit sphere"""
+        lat_rad = math.radians(lat)
+        lon_rad = math.radians(lon)
+        cos_lat = math.cos(lat_rad)
+        return (cos_lat * math.cos(lon_rad),
+                cos_lat * math.sin(lon_rad),
+                math.sin(lat_rad))
+
+    def _build(self, start: int, end: int) -> int:
+        """Recursively build the subtree over _order[start:end]"""
+        node = len(self._axis)
+        self._axis.append(-1)
+        self._split.append(0.0)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._start.append(start)
+        self._end.append(end)
+
+        if end - start <= self.leaf_size:
+            return node
+
+        # Split on the axis with the widest spread
+        members = self._order[start:end]
+        spreads = []
+        for axis in range(3):
+            values = [self._xyz[i][axis] for i in members]
+            spreads.append(max(values) - min(values))
+        axis = spreads.index(max(spreads))
+        if spreads[axis] == 0.0:
+            return node  # All points coincide; keep as a leaf
+
+        members.sort(key=lambda i: self._xyz[i][axis])
+        self._order[start:end] = members
+        mid = start + (end - start) // 2
+
+        self._axis[node] = axis
+        self._split[node] = self._xyz[self._order[mid]][axis]
+        self._left[node] = self._build(start, mid)
+        self._right[node] = self._build(mid, end)
+        return node
+
+    def _chord_for_km(self, distance_km: float) -> float:
+        """Convert a great-circle distance to a unit-sphere chord length"""
+        angle = distance_km / self.earth_radius_km
+        if angle >= math.pi:
+            return 2.0
+        return 2.0 * math.sin(angle / 2.0)
+
+    def _nearest_chord_sq(self, q: Tuple[float, float, float], k: int) -> float:
+        """Squared chord distance of the k-th nearest point to q"""
+        heap = []  # max-heap of -d2 holding the k best candidates
+        stack = [0]
+        xyz = self._xyz
+        order = self._order
+
+        while stack:
+            node = stack.pop()
+            axis = self._axis[node]
+            if axis == -1:
+                for i in order[self._start[node]:self._end[node]]:
+                    p = xyz[i]
+                    d2 = ((p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 +
+                          (p[2] - q[2]) ** 2)
+                    if len(heap) < k:
+                        heapq.heappush(heap, -d2)
+                    elif d2 < -heap[0]:
+                        heapq.heapreplace(heap, -d2)
+                continue
+
+            diff = q[axis] - self._split[node]
+            near, far = ((self._left[node], self._right[node]) if diff < 0
+                         else (self._right[node], self._left[node]))
+            if len(heap) < k or diff * diff <= -heap[0]:
+                stack.append(far)
+            stack.append(near)
+
+        return -heap[0]
+
+    def _within_chord(self, q: Tuple[float, float, float],
+                      chord: float) -> List[int]:
+        """Indices of points whose chord distance to q is at most chord"""
+        limit = chord + self.CHORD_TOLERANCE
+        limit_sq = limit * limit
+        hits = []
+        stack = [0]
+        xyz = self._xyz
+        order = self._order
+
+        while stack:
+            node = stack.pop()
+            axis = self._axis[node]
+            if axis == -1:
+                for i in order[self._start[node]:self._end[node]]:
+                    p = xyz[i]
+                    d2 = ((p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 +
+                          (p[2] - q[2]) ** 2)
+                    if d2 <= limit_sq:
+                        hits.append(i)
+                continue
+
+            diff = q[axis] - self._split[node]
+            if diff <= limit:
+                stack.append(self._left[node])
+            if diff >= -limit:
+                stack.append(self._right[node])
+
+        return hits
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> List[Tuple[int, float]]:
+        """
+        Find the k nearest points
+
+        Args:
+            lat, lon: Query coordinates
+            k: Number of neighbors
+
+        Returns:
+            List of (point index, distance in km) sorted by distance, ties
+            broken by lowest index
+        """
+        if not self._xyz or k <= 0:
+            return []
+
+        q = self._to_unit_vector(lat, lon)
+        kth_chord = math.sqrt(self._nearest_chord_sq(q, min(k, len(self._xyz))))
+
+        # Re-rank every near-tie with the exact distance function
+        candidates = []
+        for i in self._within_chord(q, kth_chord):
+            lat2, lon2 = self.coords[i]
+            candidates.append((self.distance_fn(lat, lon, lat2, lon2), i))
+        candidates.sort()
+
+        return [(i, distance) for distance, i in candidates[:k]]
+
+    def within(self, lat: float, lon: float, radius_km: float) -> List[Tuple[int, float]]:
+        """
+        Find all points within a great-circle radius
+
+        Args:
+            lat, lon: Query coordinates
+            radius_km: Search radius in kilometers
+
+        Returns:
+            List of (point index, distance in km) in original point order
+        """
+        if not self._xyz or radius_km < 0:
+            return []
+
+        q = self._to_unit_vector(lat, lon)
+        hits = []
+        for i in sorted(self._within_chord(q, self._chord_for_km(radius_km))):
+            lat2, lon2 = self.coords[i]
+            distance = self.distance_fn(lat, lon, lat2, lon2)
+            if distance <= radius_km:
+                hits.append((i, distance))
+
+        return hits
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Tile Pyramid Generator
+Cuts point layers and the risk surface into z/x/y JSON tiles for the web client
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from geojson_stream import iter_features
+
+try:
+    import numpy as np
+    import heatmap_grid
+except ImportError:  # NumPy is optional; only the risk surface layer needs it
+    np = None
+    heatmap_grid = None
+
+TILE_SIZE = 256
+
+# Web Mercator latitude limit
+MAX_LATITUDE = 85.0511287798
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def mercator_unit(lat: float, lon: float) -> Tuple[float, float]:
+    """Project lat/lon to Web Mercator coordinates in [0, 1), y pointing south"""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    x = (lon + 180.0) / 360.0
+    sin_lat = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return min(max(x, 0.0), 1.0 - 1e-12), min(max(y, 0.0), 1.0 - 1e-12)
+
+
+def coordinate_precision(z: int) -> int:
+    """Decimal places that keep coordinates within about a pixel at zoom z"""
+    pixels_per_degree = TILE_SIZE * 2 ** z / 360.0
+    return max(0, math.ceil(math.log10(pixels_per_degree)))
+
+
+class TileLayer:
+    """
+    A point layer prepared for tiling
+
+    Args:
+        name: Layer name (directory under the tile root)
+        features: GeoJSON Point features
+        value_property: Numeric property summarized (mean/max) in clusters
+    """
+
+    def __init__(self, name: str, features: Iterable[Dict], value_property: str = None):
+        self.name = name
+        self.value_property = value_property
+        self.features = []
+        self.positions = []  # Web Mercator unit coordinates per feature
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') != 'Point':
+                continue
+            lon, lat = geometry['coordinates'][:2]
+            self.features.append(feature)
+            self.positions.append(mercator_unit(float(lat), float(lon)))
+
+    def content_hash(self) -> str:
+        """SHA-256 of the layer's features and tiling parameters"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps(self.value_property).encode())
+        for feature in self.features:
+            digest.update(json.dumps(feature, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def bounds(self) -> Optional[Dict]:
+        """Lat/lon bounds of the layer, or None if it is empty"""
+        if not self.features:
+            return None
+        lons = [f['geometry']['coordinates'][0] for f in self.features]
+        lats = [f['geometry']['coordinates'][1] for f in self.features]
+        return {'min_lat': min(lats), 'max_lat': max(lats),
+                'min_lon': min(lons), 'max_lon': max(lons)}
+
+
+class TilePyramid:
+    """
+    Build z/x/y JSON tile pyramids and rebuild only tiles that changed
+
+    Each tile is a compact GeoJSON FeatureCollection at
+    <output_dir>/<layer>/<z>/<x>/<y>.json. Below cluster_zoom, points are
+    merged into grid clusters of cluster_pixels screen pixels carrying
+    point_count and summary values; from cluster_zoom up tiles hold the
+    original features with coordinates rounded to the zoom's precision.
+    A manifest of per-tile content hashes lets later runs skip unchanged
+    layers entirely and rewrite only tiles whose contents differ.
+    """
+
+    def __init__(self, output_dir: str = '../outputs/tiles', min_zoom: int = 4,
+                 max_zoom: int = 12, cluster_zoom: int = 10, cluster_pixels: int = 64):
+        """
+        Args:
+            output_dir: Root directory of the tile pyramid
+            min_zoom: Lowest zoom level generated
+            max_zoom: Highest zoom level generated
+            cluster_zoom: First zoom level that holds unclustered features
+            cluster_pixels: Cluster cell size in pixels (must divide 256)
+        """
+        if TILE_SIZE % cluster_pixels:
+            raise ValueError("cluster_pixels must divide the tile size")
+        if min_zoom > max_zoom:
+            raise ValueError("min_zoom must not exceed max_zoom")
+        self.output_dir = output_dir
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.cluster_zoom = cluster_zoom
+        self.cluster_pixels = cluster_pixels
+        self.manifest = {'layers': {}}
+        manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as f:
+                self.manifest = json.load(f)
+        self.stats = {'written': 0, 'unchanged': 0, 'removed': 0, 'skipped_layers': 0}
+
+    def _settings(self) -> Dict:
+        return {
+            'min_zoom': self.min_zoom,
+            'max_zoom': self.max_zoom,
+            'cluster_zoom': self.cluster_zoom,
+            'cluster_pixels': self.cluster_pixels
+        }
+
+    def build_layer(self, layer: TileLayer, force: bool = False) -> Dict:
+        """
+        Tile one layer, writing only tiles whose content changed
+
+        Args:
+            layer: Layer to tile
+            force: Rebuild even if the layer hash matches the manifest
+
+        Returns:
+            The layer's manifest entry
+        """
+        layer_hash = layer.content_hash()
+        previous = self.manifest['layers'].get(layer.name, {})
+        if (not force and previous.get('hash') == layer_hash
+                and previous.get('settings') == self._settings()):
+            self.stats['skipped_layers'] += 1
+            return previous
+
+        old_tiles = previous.get('tiles', {})
+        tiles = {}
+        for z in range(self.min_zoom, self.max_zoom + 1):
+            for (x, y), collection in self.layer_tiles(layer, z).items():
+                tile_id = f"{z}/{x}/{y}"
+                content = json.dumps(collection, separators=(',', ':'), sort_keys=True)
+                digest = hashlib.sha256(content.encode()).hexdigest()
+                tiles[tile_id] = digest
+                path = os.path.join(self.output_dir, layer.name, f"{tile_id}.json")
+                if old_tiles.get(tile_id) == digest and os.path.exists(path):
+                    self.stats['unchanged'] += 1
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w') as f:
+                    f.write(content)
+                self.stats['written'] += 1
+
+        for tile_id in old_tiles:
+            if tile_id not in tiles:
+                path = os.path.join(self.output_dir, layer.name, f"{tile_id}.json")
+                if os.path.exists(path):
+                    os.remove(path)
+                self.stats['removed'] += 1
+
+        entry = {
+            'hash': layer_hash,
+            'settings': self._settings(),
+            'feature_count': len(layer.features),
+            'bounds': layer.bounds(),
+            'url_template': f"{layer.name}/{{z}}/{{x}}/{{y}}.json",
+            'tiles': tiles
+        }
+        self.manifest['layers'][layer.name] = entry
+        return entry
+
+    def layer_tiles(self, layer: TileLayer, z: int) -> Dict[Tuple[int, int], Dict]:
+        """
+        Cut a layer into the tiles of one zoom level
+
+        Returns:
+            {(x, y): FeatureCollection} for every non-empty tile
+        """
+        world = TILE_SIZE * 2 ** z
+        precision = coordinate_precision(z)
+        features_by_tile: Dict[Tuple[int, int], List[Dict]] = {}
+
+        if z >= self.cluster_zoom:
+            for feature, (ux, uy) in zip(layer.features, layer.positions):
+                tile = (int(ux * world) // TILE_SIZE, int(uy * world) // TILE_SIZE)
+                features_by_tile.setdefault(tile, []).append(
+                    self._rounded(feature, precision))
+        else:
+            # Cells are aligned with tiles, so a cluster never spans two tiles
+            cells: Dict[Tuple[int, int], List[int]] = {}
+            for i, (ux, uy) in enumerate(layer.positions):
+                cell = (int(ux * world) // self.cluster_pixels,
+                        int(uy * world) // self.cluster_pixels)
+                cells.setdefault(cell, []).append(i)
+            per_tile = TILE_SIZE // self.cluster_pixels
+            for (cx, cy), members in cells.items():
+                tile = (cx // per_tile, cy // per_tile)
+                if len(members) == 1:
+                    feature = self._rounded(layer.features[members[0]], precision)
+                else:
+                    feature = self._cluster(layer, members, precision)
+                features_by_tile.setdefault(tile, []).append(feature)
+
+        return {
+            (x, y): {'type': 'FeatureCollection', 'features': features}
+            for (x, y), features in features_by_tile.items()
+        }
+
+    def _rounded(self, feature: Dict, precision: int) -> Dict:
+        """Copy of a feature with coordinates rounded for the zoom level"""
+        lon, lat = feature['geometry']['coordinates'][:2]
+        return {
+            'type': 'Feature',
+            'geometry': {'type': 'Point',
+                         'coordinates': [round(lon, precision), round(lat, precision)]},
+            'properties': feature.get('properties') or {}
+        }
+
+    def _cluster(self, layer: TileLayer, members: List[int], precision: int) -> Dict:
+        """Merge several features into one cluster point at their centroid"""
+        lons = [layer.features[i]['geometry']['coordinates'][0] for i in members]
+        lats = [layer.features[i]['geometry']['coordinates'][1] for i in members]
+        properties = {'cluster': True, 'point_count': len(members)}
+
+        if layer.value_property:
+            values = [layer.features[i]['properties'].get(layer.value_property)
+                      for i in members]
+            values = [v for v in values
+                      if isinstance(v, (int, float)) and not isinstance(v, bool)]
+            if values:
+                properties[f"{layer.value_property}_mean"] = round(sum(values) / len(values), 3)
+                properties[f"{layer.value_property}_max"] = max(values)
+
+        return {
+            'type': 'Feature',
+            'geometry': {'type': 'Point',
+                         'coordinates': [round(sum(lons) / len(lons), precision),
+                                         round(sum(lats) / len(lats), precision)]},
+            'properties': properties
+        }
+
+    def save_manifest(self):
+        """Write the tile manifest (layer hashes, bounds and tile hashes)"""
+        self.manifest['generated_at'] = datetime.now().isoformat()
+        self.manifest['tile_size'] = TILE_SIZE
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+
+
+def assessment_features(risk_assessments: List[Dict]) -> Iterable[Dict]:
+    """Risk assessments as Point features for tiling"""
+    for assessment in risk_assessments:
+        yield {
+            'type': 'Feature',
+            'geometry': {'type': 'Point',
+                         'coordinates': [assessment['longitude'], assessment['latitude']]},
+            'properties': {
+                'location': assessment['location'],
+                'composite_risk': assessment['composite_risk'],
+                'category': assessment['category'],
+                'priority': assessment['priority']
+            }
+        }
+
+
+def surface_features(grid: Dict) -> Iterable[Dict]:
+    """Cells of a heatmap grid (see SpatialAnalyzer.generate_heatmap_data) as Point features"""
+    values = heatmap_grid.decode_grid(grid)
+    bounds = grid['bounds']
+    resolution = grid['resolution']
+    for row, col in zip(*(~np.isnan(values)).nonzero()):
+        lat = bounds['max_lat'] - (row + 0.5) * resolution
+        lon = bounds['min_lon'] + (col + 0.5) * resolution
+        yield {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [round(lon, 6), round(lat, 6)]},
+            'properties': {'risk': round(float(values[row, col]), 3)}
+        }
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='ThrivingRoots Tile Pyramid Generator')
+    parser.add_argument('--output-dir', default='../outputs/tiles',
+                        help='Root directory of the tile pyramid')
+    parser.add_argument('--min-zoom', type=int, default=4)
+    parser.add_argument('--max-zoom', type=int, default=12)
+    parser.add_argument('--cluster-zoom', type=int, default=10,
+                        help='First zoom level with unclustered points')
+    parser.add_argument('--force', action='store_true',
+                        help='Rebuild every layer even if unchanged')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ThrivingRoots Tile Pyramid Generator")
+    print("=" * 60)
+
+    pyramid = TilePyramid(args.output_dir, args.min_zoom, args.max_zoom, args.cluster_zoom)
+
+    layers = [
+        TileLayer('air_quality', iter_features('../outputs/california_air_quality.geojson'), 'aqi'),
+        TileLayer('water_quality', iter_features('../outputs/california_water_quality.geojson'),
+                  'dissolved_oxygen'),
+        TileLayer('superfund_sites', iter_features('../outputs/california_superfund_sites.geojson'))
+    ]
+
+    with open('../outputs/risk_assessments.json', 'r') as f:
+        layers.append(TileLayer('risk_assessments', assessment_features(json.load(f)),
+                                'composite_risk'))
+
+    with open('../outputs/heatmap_data.json', 'r') as f:
+        heatmap = json.load(f)
+    if 'grid' in heatmap and heatmap_grid is not None:
+        layers.append(TileLayer('risk_surface', surface_features(heatmap['grid']), 'risk'))
+    else:
+        print("Skipping risk surface: heatmap grid unavailable (requires numpy)")
+
+    for layer in layers:
+        entry = pyramid.build_layer(layer, force=args.force)
+        print(f"  {layer.name}: {entry['feature_count']} features, {len(entry['tiles'])} tiles")
+
+    pyramid.save_manifest()
+
+    print("\n" + "=" * 60)
+    print("Tiling Complete!")
+    print("=" * 60)
+    print(f"\nTiles written: {pyramid.stats['written']}, unchanged: {pyramid.stats['unchanged']}, "
+          f"removed: {pyramid.stats['removed']}, layers skipped: {pyramid.stats['skipped_layers']}")
+
+
+if __name__ == '__main__':
+    main()
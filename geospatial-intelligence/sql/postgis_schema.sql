@@ -50,10 +50,14 @@ CREATE TABLE IF NOT EXISTS environmental_layers (
 
 -- Indexes for performance
 CREATE INDEX idx_env_layers_geom ON environmental_layers USING GIST(spatial_data);
+-- Geography KNN (<->) and ST_DWithin lookups used by scripts/postgis_backend.py
+CREATE INDEX idx_env_layers_geog ON environmental_layers USING GIST((spatial_data::geography));
 CREATE INDEX idx_env_layers_type ON environmental_layers(layer_type);
 CREATE INDEX idx_env_layers_source ON environmental_layers(data_source);
 CREATE INDEX idx_env_layers_active ON environmental_layers(is_active);
 CREATE INDEX idx_env_layers_attrs ON environmental_layers USING GIN(attributes);
+-- One row per feature content hash; scripts/postgis_loader.py upserts on it
+CREATE UNIQUE INDEX idx_env_layers_hash ON environmental_layers(data_hash);
 
 -- ----------------------------------------------------------------------------
 -- Table: analysis_results
@@ -83,7 +87,10 @@ CREATE TABLE IF NOT EXISTS analysis_results (
     
     -- Quality and validation
     confidence_level FLOAT CHECK (confidence_level >= 0 AND confidence_level <= 1),
-    validation_notes TEXT
+    validation_notes TEXT,
+    
+    -- Data provenance (hash of the analysis record)
+    data_hash VARCHAR(64)
 );
 
 -- Indexes
@@ -91,6 +98,7 @@ CREATE INDEX idx_analysis_geom ON analysis_results USING GIST(result_data);
 CREATE INDEX idx_analysis_type ON analysis_results(analysis_type);
 CREATE INDEX idx_analysis_generated ON analysis_results(generated_at);
 CREATE INDEX idx_analysis_scores ON analysis_results USING GIN(risk_scores);
+CREATE UNIQUE INDEX idx_analysis_hash ON analysis_results(data_hash);
 
 -- ----------------------------------------------------------------------------
 -- Table: priority_areas
@@ -0,0 +1,53 @@
+"""
+Test configuration
+The scripts import each other as siblings, so tests import them the same way
+"""
+
+import os
+import sys
+import uuid
+
+import pytest
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+OUTPUTS_DIR = os.path.join(os.path.dirname(SCRIPTS_DIR), 'outputs')
+SCHEMA_SQL = os.path.join(os.path.dirname(SCRIPTS_DIR), 'sql', 'postgis_schema.sql')
+
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+
+def sample_layers():
+    """PostGISLoader.load_layers arguments for the sample outputs"""
+    from postgis_loader import DEFAULT_LAYERS
+    return [{'path': os.path.join(OUTPUTS_DIR, filename), 'layer_type': layer_type,
+             'data_source': data_source}
+            for filename, layer_type, data_source in DEFAULT_LAYERS]
+
+
+@pytest.fixture
+def postgis_dsn():
+    """
+    Connection string of a throwaway schema holding sql/postgis_schema.sql
+
+    Skipped unless $EIC_POSTGIS_DSN is set and psycopg is installed. The
+    schema is created first on the search_path and dropped afterwards.
+    """
+    dsn = os.environ.get('EIC_POSTGIS_DSN')
+    if not dsn:
+        pytest.skip('EIC_POSTGIS_DSN is not set')
+    psycopg = pytest.importorskip('psycopg')
+    pytest.importorskip('psycopg_pool')
+    from psycopg.conninfo import make_conninfo
+
+    schema = f"eic_test_{uuid.uuid4().hex[:12]}"
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute(f"CREATE SCHEMA {schema}")
+        conn.execute(f"SET search_path TO {schema}, public")
+        with open(SCHEMA_SQL) as f:
+            conn.execute(f.read())
+    try:
+        yield make_conninfo(dsn, options=f"-c search_path={schema},public")
+    finally:
+        with psycopg.connect(dsn, autocommit=True) as conn:
+            conn.execute(f"DROP SCHEMA {schema} CASCADE")
@@ -0,0 +1,258 @@
+"""
+AsyncFetcher and EnvironmentalDataProcessor.fetch_all_concurrently against a
+local stub of the AirNow, USGS and Envirofacts endpoints
+"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from async_fetcher import AsyncFetcher, FetchError
+from environmental_data_processor import EnvironmentalDataProcessor
+from http_cache import ResponseCache
+from instrumentation import Instrumentation
+
+# Neighboring zip codes share the Central LA reporting area
+AIRNOW = {
+    '90001': [
+        {'ReportingArea': 'Central LA', 'Latitude': 34.0663, 'Longitude': -118.2266,
+         'ParameterName': 'PM2.5', 'AQI': 68, 'DateObserved': '2026-10-17'},
+        {'ReportingArea': 'South Coastal LA', 'Latitude': 33.8, 'Longitude': -118.2,
+         'ParameterName': 'PM2.5', 'AQI': 55, 'DateObserved': '2026-10-17'}
+    ],
+    '90002': [
+        {'ReportingArea': 'Central LA', 'Latitude': 34.0663, 'Longitude': -118.2266,
+         'ParameterName': 'PM2.5', 'AQI': 68, 'DateObserved': '2026-10-17'},
+        {'ReportingArea': 'Southeast LA County', 'Latitude': 33.92, 'Longitude': -118.13,
+         'ParameterName': 'PM2.5', 'AQI': 72, 'DateObserved': '2026-10-17'}
+    ]
+}
+
+USGS_SITES = [
+    ('11074000', 'SANTA ANA R BL PRADO DAM CA', 33.8836, -117.6450),
+    ('11101250', 'RIO HONDO AB WHITTIER NARROWS DAM CA', 34.0303, -118.0873)
+]
+
+USGS_VALUES = {'00010': 21.5, '00095': 845.0, '00300': 8.2}
+
+SUPERFUND = [
+    {'SITE_NAME': 'Omega Chemical Corp', 'LATITUDE': 33.9286, 'LONGITUDE': -118.0553},
+    {'SITE_NAME': 'San Gabriel Valley Area 1', 'LATITUDE': 34.0686, 'LONGITUDE': -118.0253}
+]
+
+
+def usgs_response(parameter_code: str):
+    """NWIS instantaneous-values document for one parameter at every stub site"""
+    return {'value': {'timeSeries': [
+        {
+            'sourceInfo': {
+                'siteName': name,
+                'siteCode': [{'value': code}],
+                'geoLocation': {'geogLocation': {'latitude': lat, 'longitude': lon}}
+            },
+            'variable': {'variableCode': [{'value': parameter_code}], 'noDataValue': -999999.0},
+            'values': [{'value': [
+                {'value': str(USGS_VALUES[parameter_code] - 1), 'dateTime': '2026-10-17T08:00:00-07:00'},
+                {'value': str(USGS_VALUES[parameter_code]), 'dateTime': '2026-10-17T09:00:00-07:00'}
+            ]}]
+        }
+        for code, name, lat, lon in USGS_SITES
+    ]}}
+
+
+class StubUpstream:
+    """
+    Threaded HTTP server standing in for the upstream APIs
+
+    Every JSON response carries an ETag and conditional requests that match
+    it get 304. Requests matching one of fail_first, given as (path, query
+    parameters), answer 503 with Retry-After the first time they are made.
+    """
+
+    def __init__(self, fail_first=()):
+        self.fail_first = list(fail_first)
+        self.log = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def statuses(self, path_prefix=''):
+        """Statuses returned so far for paths starting with path_prefix"""
+        with self.lock:
+            return [status for path, status in self.log if path.startswith(path_prefix)]
+
+    def handle(self, request):
+        parts = urlsplit(request.path)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        key = f"{parts.path}?{parts.query}"
+
+        with self.lock:
+            first = all(path != key for path, _ in self.log)
+            if first and any(parts.path == path and all(query.get(name) == value
+                                                        for name, value in params.items())
+                             for path, params in self.fail_first):
+                self.log.append((key, 503))
+                request.send_response(503)
+                request.send_header('Retry-After', '1')
+                request.send_header('Content-Length', '0')
+                request.end_headers()
+                return
+
+        if parts.path == '/aq/observation/zipCode/current/':
+            payload = AIRNOW.get(query.get('zipCode'), [])
+        elif parts.path == '/nwis/iv/':
+            payload = usgs_response(query['parameterCd'])
+        elif parts.path.startswith('/efservice/SEMS_SITE_INFO/STATE_CODE/'):
+            payload = SUPERFUND
+        else:
+            payload = None
+
+        if payload is None:
+            status, body = 404, b''
+        else:
+            body = json.dumps(payload).encode()
+            etag = f'"{len(body)}-{hash(key) & 0xffffffff:x}"'
+            status = 304 if request.headers.get('If-None-Match') == etag else 200
+
+        with self.lock:
+            self.log.append((key, status))
+        request.send_response(status)
+        if payload is not None:
+            request.send_header('ETag', etag)
+            request.send_header('Content-Type', 'application/json')
+        if status == 200:
+            request.send_header('Content-Length', str(len(body)))
+            request.end_headers()
+            request.wfile.write(body)
+        else:
+            request.send_header('Content-Length', '0')
+            request.end_headers()
+
+
+def stub_processor(upstream, tmp_path, ttl=3600):
+    """Processor pointed at the stub, caching responses under tmp_path"""
+    processor = EnvironmentalDataProcessor(
+        output_dir=str(tmp_path),
+        cache_dir=str(tmp_path / 'cache'),
+        cache_ttls={source: ttl for source in ('epa_air_quality', 'usgs_water', 'epa_superfund')},
+        instrumentation=Instrumentation()
+    )
+    processor.data_sources = {
+        'epa_air_quality': f"{upstream.base_url}/aq/observation/zipCode/current/",
+        'usgs_water': f"{upstream.base_url}/nwis/iv/",
+        'epa_superfund': f"{upstream.base_url}/efservice/"
+    }
+    return processor
+
+
+def fetch_all(processor):
+    return processor.fetch_all_concurrently(zip_codes=('90001', '90002'), api_key='test-key',
+                                            max_retries=2, backoff_max=0.05)
+
+
+def test_retries_honor_retry_after_then_succeed(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache'))
+    with StubUpstream(fail_first=[('/nwis/iv/', {})]) as upstream:
+        url = f"{upstream.base_url}/nwis/iv/"
+
+        async def run():
+            async with AsyncFetcher(cache=cache, max_retries=2, backoff_max=0.05) as fetcher:
+                data = await fetcher.fetch_json(url, {'parameterCd': '00010'}, 'usgs_water')
+                return fetcher.stats, data
+
+        stats, data = asyncio.run(run())
+
+    assert upstream.statuses() == [503, 200]
+    assert stats['requests'] == 2
+    assert stats['retries'] == 1
+    assert stats['failures'] == 0
+    assert len(data['value']['timeSeries']) == len(USGS_SITES)
+    assert cache.stats['misses'] == 1
+
+
+def test_retries_exhausted_raise_fetch_error(tmp_path):
+    with StubUpstream(fail_first=[('/nwis/iv/', {})]) as upstream:
+        url = f"{upstream.base_url}/nwis/iv/"
+
+        async def run():
+            async with AsyncFetcher(max_retries=0, backoff_max=0.05) as fetcher:
+                results = await fetcher.fetch_many([(url, {'parameterCd': '00010'}),
+                                                    (f"{upstream.base_url}/missing", None)])
+                return fetcher.stats, results
+
+        stats, results = asyncio.run(run())
+
+    assert all(isinstance(result, FetchError) for result in results)
+    assert [result.status for result in results] == [503, 404]
+    assert stats['retries'] == 0
+    assert stats['failures'] == 2
+
+
+def test_fetch_all_concurrently_dedups_air_and_merges_water(tmp_path):
+    with StubUpstream(fail_first=[('/aq/observation/zipCode/current/',
+                                   {'zipCode': '90001'})]) as upstream:
+        processor = stub_processor(upstream, tmp_path)
+        results = fetch_all(processor)
+
+    # Two zip codes, three USGS parameters, one Superfund state, one retry
+    assert processor.metrics.counters['http_requests'] == 2 + 3 + 1 + 1
+    assert upstream.statuses('/aq/').count(503) == 1
+
+    areas = [observation['ReportingArea'] for observation in results['air_quality']]
+    assert sorted(areas) == ['Central LA', 'South Coastal LA', 'Southeast LA County']
+
+    water = {record['site_code']: record for record in results['water_quality']}
+    assert set(water) == {code for code, _, _, _ in USGS_SITES}
+    for record in water.values():
+        assert record['temperature'] == USGS_VALUES['00010']
+        assert record['conductivity'] == USGS_VALUES['00095']
+        assert record['dissolved_oxygen'] == USGS_VALUES['00300']
+        assert record['timestamp'] == '2026-10-17T09:00:00-07:00'
+
+    assert results['superfund_sites'] == SUPERFUND
+
+
+def test_fetch_all_concurrently_revalidates_through_cache(tmp_path):
+    with StubUpstream() as upstream:
+        first = fetch_all(stub_processor(upstream, tmp_path))
+        assert upstream.statuses() == [200] * 6
+
+        # A TTL of zero makes every cached entry stale, so each is revalidated
+        stale = stub_processor(upstream, tmp_path, ttl=0)
+        second = fetch_all(stale)
+        assert upstream.statuses()[6:] == [304] * 6
+
+        # Fresh entries are served without a request
+        fresh = stub_processor(upstream, tmp_path)
+        third = fetch_all(fresh)
+        assert len(upstream.statuses()) == 12
+
+    assert second == first
+    assert third == first
+    assert stale.cache.stats['revalidated'] == 6
+    assert stale.cache.stats['misses'] == 0
+    assert fresh.cache.stats['hits'] == 6
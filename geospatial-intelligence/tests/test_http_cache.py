@@ -0,0 +1,47 @@
+"""
+ResponseCache LRU order and index persistence across runs
+"""
+
+import json
+import os
+
+from http_cache import ResponseCache
+
+
+def index_keys(cache_dir):
+    with open(os.path.join(cache_dir, ResponseCache.INDEX_FILE)) as f:
+        return [key for key, _ in json.load(f)]
+
+
+def test_fresh_hits_keep_lru_order_across_runs(tmp_path):
+    cache_dir = str(tmp_path)
+    cache = ResponseCache(cache_dir)
+    cache.store('usgs_water', 'https://example.test/a', None, b'{"a": 1}')
+    cache.store('usgs_water', 'https://example.test/b', None, b'{"b": 2}')
+
+    # Next run reads a, then persists the order at its end
+    cache = ResponseCache(cache_dir)
+    assert cache.fresh_body('usgs_water', 'https://example.test/a') == b'{"a": 1}'
+    cache.flush()
+    assert index_keys(cache_dir) == [cache.key('https://example.test/b'),
+                                     cache.key('https://example.test/a')]
+
+    # A third run over budget evicts b, the least recently used entry
+    cache = ResponseCache(cache_dir)
+    cache.max_bytes = sum(entry['size'] for entry in cache._index.values())
+    cache.store('usgs_water', 'https://example.test/c', None, b'{"c": 3}')
+    assert cache.stats['evictions'] == 1
+    assert cache.fresh_body('usgs_water', 'https://example.test/b') is None
+    assert cache.fresh_body('usgs_water', 'https://example.test/a') == b'{"a": 1}'
+
+
+def test_missing_body_is_dropped_from_persisted_index(tmp_path):
+    cache_dir = str(tmp_path)
+    cache = ResponseCache(cache_dir)
+    cache.store(None, 'https://example.test/a', None, b'{"a": 1}')
+    cache.store(None, 'https://example.test/b', None, b'{"b": 2}')
+    key = cache.key('https://example.test/a')
+
+    os.remove(cache._body_path(key))
+    assert cache.fresh_body(None, 'https://example.test/a') is None
+    assert index_keys(cache_dir) == [cache.key('https://example.test/b')]
@@ -0,0 +1,30 @@
+"""
+Pipeline reruns only the stages whose inputs changed
+"""
+
+from environmental_data_processor import EnvironmentalDataProcessor
+from pipeline import build_pipeline
+
+
+def test_second_identical_run_skips(tmp_path, monkeypatch):
+    # Sample data everywhere (no API key for air); every record is stamped
+    # with the time it was generated, as live fetches are
+    monkeypatch.setattr(EnvironmentalDataProcessor, 'fetch_water_quality_data',
+                        EnvironmentalDataProcessor._generate_sample_water_quality)
+    monkeypatch.setattr(EnvironmentalDataProcessor, 'fetch_superfund_sites',
+                        EnvironmentalDataProcessor._generate_sample_superfund)
+
+    def run():
+        results = build_pipeline(str(tmp_path), workers=2).run()
+        return sorted(name for name, result in results.items() if result['status'] == 'ran')
+
+    first = run()
+    assert len(first) == 16
+    assert run() == ['fetch.air_quality', 'fetch.superfund_sites', 'fetch.water_quality']
+
+    samples = EnvironmentalDataProcessor._generate_sample_water_quality
+    monkeypatch.setattr(EnvironmentalDataProcessor, 'fetch_water_quality_data',
+                        lambda self: [dict(site, temperature=25.0) for site in samples(self)])
+    rerun = run()
+    assert 'normalize.water_quality' in rerun and 'score' in rerun
+    assert 'normalize.air_quality' not in rerun
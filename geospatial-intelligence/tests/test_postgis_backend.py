@@ -0,0 +1,117 @@
+"""
+PostGISBackend push-down queries match the in-memory engines (set
+EIC_POSTGIS_DSN to run)
+"""
+
+import pytest
+
+from conftest import sample_layers
+
+# Two sites the same distance east and west of TIE_LOCATION, and two more
+# sharing one position: every lookup here has to break a distance tie
+TIE_LOCATION = {'location': 'Tie', 'latitude': 34.05, 'longitude': -118.0}
+TIE_SITES = [
+    ('West', 34.05, -118.1),
+    ('East', 34.05, -117.9),
+    ('Twin A', 34.2, -118.0),
+    ('Twin B', 34.2, -118.0)
+]
+
+
+def tie_features():
+    return [{'type': 'Feature',
+             'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+             'properties': {'site_name': name, 'latitude': lat, 'longitude': lon}}
+            for name, lat, lon in TIE_SITES]
+
+
+@pytest.fixture
+def backend(postgis_dsn):
+    from postgis_backend import PostGISBackend
+    from postgis_loader import PostGISLoader
+
+    with PostGISLoader(postgis_dsn) as loader:
+        loader.ensure_upsert_keys()
+        loader.load_layers(sample_layers())
+        loader.load_layer(tie_features(), 'tie_sites', 'test')
+
+    with PostGISBackend(postgis_dsn, chunk_locations=7) as backend:
+        backend.ensure_indexes()
+        yield backend
+
+
+def in_memory(layer):
+    """The same records in the backend's layer order"""
+    return list(layer)
+
+
+def without_timestamps(records):
+    return [{key: value for key, value in record.items() if key != 'timestamp'}
+            for record in records]
+
+
+def test_risk_scores_match_index_engine(backend):
+    from spatial_analysis import SpatialAnalyzer
+
+    superfund, air, water = (backend.layer(layer_type) for layer_type
+                             in ('superfund_sites', 'air_quality', 'water_quality'))
+    locations = in_memory(air) + in_memory(water)[::25] + [TIE_LOCATION]
+    vulnerability = [0.3 + 0.05 * (i % 10) for i in range(len(locations))]
+
+    analyzer = SpatialAnalyzer(engine='index', index_threshold=1)
+    in_database = analyzer.calculate_ej_risk_scores(locations, superfund, air, water,
+                                                    demographic_vulnerability=vulnerability)
+    expected = analyzer.calculate_ej_risk_scores(
+        locations, in_memory(superfund), in_memory(air), in_memory(water),
+        demographic_vulnerability=vulnerability)
+
+    assert len(in_database) == len(locations)
+    assert without_timestamps(in_database) == without_timestamps(expected)
+
+
+def test_buffer_analysis_matches_index_engine(backend):
+    from spatial_analysis import SpatialAnalyzer
+
+    analyzer = SpatialAnalyzer(engine='index', index_threshold=1)
+    for layer_type, radius_km in (('water_quality', 50), ('tie_sites', 20)):
+        layer = backend.layer(layer_type)
+        records = in_memory(layer)
+        for center in records[::40] + [TIE_LOCATION]:
+            for options in ({}, {'sort_by_distance': True}, {'max_results': 3}):
+                assert (analyzer.buffer_analysis(center, radius_km, layer, **options)
+                        == analyzer.buffer_analysis(center, radius_km, records, **options))
+
+
+def test_nearest_tie_goes_to_first_in_layer_order(backend):
+    from spatial_analysis import SpatialAnalyzer
+
+    layer = backend.layer('tie_sites')
+    records = in_memory(layer)
+    analyzer = SpatialAnalyzer(engine='index', index_threshold=1)
+
+    twin_location = {'latitude': 34.25, 'longitude': -118.0}
+    for location in (TIE_LOCATION, twin_location):
+        nearest, distance = analyzer.nearest_neighbor(location, layer)
+        assert (nearest, distance) == analyzer.nearest_neighbor(location, records)
+        distances = [analyzer.haversine_distance(location['latitude'], location['longitude'],
+                                                 record['latitude'], record['longitude'])
+                     for record in records]
+        tied = [record for record, d in zip(records, distances) if d == min(distances)]
+        assert len(tied) == 2
+        assert nearest == tied[0]
+
+    scan = SpatialAnalyzer(engine='scan')
+    assert (scan.nearest_neighbor(TIE_LOCATION, records)
+            == analyzer.nearest_neighbor(TIE_LOCATION, layer))
+
+
+def test_iter_hashes_match_loaded_features(backend):
+    from incremental import feature_key
+    from provenance import canonical_hash
+
+    rows = list(backend.iter_hashes('tie_sites'))
+    features = tie_features()
+    assert [row[3] for row in rows] == [canonical_hash(feature) for feature in features]
+    assert ([feature_key(properties, lat, lon) for properties, lat, lon, _ in rows]
+            == [f"site_name:{name}" for name, _, _ in TIE_SITES])
+    assert [(lat, lon) for _, lat, lon, _ in rows] == [(lat, lon) for _, lat, lon in TIE_SITES]
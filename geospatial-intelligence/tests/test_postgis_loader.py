@@ -0,0 +1,64 @@
+"""
+PostGISLoader against a live database (set EIC_POSTGIS_DSN to run)
+"""
+
+import json
+import os
+
+from conftest import OUTPUTS_DIR, sample_layers
+
+
+def test_reload_is_idempotent_and_deactivates_missing(postgis_dsn):
+    from postgis_loader import PostGISLoader
+
+    with PostGISLoader(postgis_dsn) as loader:
+        loader.ensure_upsert_keys()
+        first = loader.load_layers(sample_layers())
+        assert all(result['staged'] > 0 for result in first)
+        assert all(result['inserted'] > 0 for result in first)
+
+        for result in loader.load_layers(sample_layers()):
+            assert result['inserted'] == 0
+            assert result['reactivated'] == 0
+            assert result['unchanged'] == result['staged']
+            assert result['deactivated'] == 0
+
+        with open(os.path.join(OUTPUTS_DIR, 'california_superfund_sites.geojson')) as f:
+            features = json.load(f)['features']
+        dropped = loader.load_layer(features[1:], 'superfund_sites', 'EPA Superfund')
+        assert dropped['inserted'] == 0
+        assert dropped['unchanged'] == dropped['staged'] == len(features) - 1
+        assert dropped['deactivated'] == 1
+
+        restored = loader.load_layer(features, 'superfund_sites', 'EPA Superfund')
+        assert restored['inserted'] == 0
+        assert restored['reactivated'] == 1
+        assert restored['deactivated'] == 0
+
+
+def test_assessments_record_input_layers(postgis_dsn):
+    from postgis_loader import PostGISLoader
+
+    with open(os.path.join(OUTPUTS_DIR, 'risk_assessments.json')) as f:
+        risk_assessments = json.load(f)
+
+    with PostGISLoader(postgis_dsn) as loader:
+        loader.ensure_upsert_keys()
+        loader.load_layers(sample_layers())
+
+        first = loader.load_assessments(risk_assessments)
+        assert first['inserted'] == first['staged'] == len(risk_assessments)
+        second = loader.load_assessments(risk_assessments)
+        assert second['inserted'] == 0
+        assert second['unchanged'] == second['staged']
+
+        with loader.pool.connection() as conn:
+            active = {row[0] for row in conn.execute("""
+                SELECT layer_id FROM environmental_layers
+                WHERE is_active AND layer_type IN ('air_quality', 'water_quality', 'superfund_sites')
+            """)}
+            lineage = [set(row[0]) for row in conn.execute(
+                "SELECT input_layers FROM analysis_results WHERE analysis_type = 'risk_assessment'")]
+
+    assert active
+    assert lineage == [active] * len(risk_assessments)
@@ -0,0 +1,38 @@
+"""
+Canonical hashes match the documented json.dumps digests
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from conftest import OUTPUTS_DIR
+from provenance import canonical_hash, hash_collection
+
+
+def dumps_hash(data, **kwargs):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, **kwargs).encode()).hexdigest()
+
+
+def test_canonical_hash_matches_json_dumps():
+    with open(os.path.join(OUTPUTS_DIR, 'california_water_quality.geojson')) as f:
+        collection = json.load(f)
+
+    samples = [collection, collection['features'], collection['features'][0],
+               {'b': [1, 2.5, None, True], 'a': {'z': 'café', 'y': '水'}},
+               [], {}, 'text', 0.1, None]
+    for data in samples:
+        assert canonical_hash(data) == dumps_hash(data)
+
+    stamped = {'generated_at': datetime(2026, 1, 2, 3, 4, 5), 'count': 3}
+    assert canonical_hash(stamped, default=str) == dumps_hash(stamped, default=str)
+
+
+def test_collection_hash_matches_canonical_hash():
+    with open(os.path.join(OUTPUTS_DIR, 'california_air_quality.geojson')) as f:
+        collection = json.load(f)
+
+    document_hash, feature_hashes, _ = hash_collection(collection)
+    assert document_hash == canonical_hash(collection) == dumps_hash(collection)
+    assert feature_hashes == [dumps_hash(feature) for feature in collection['features']]
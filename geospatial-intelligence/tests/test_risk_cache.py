@@ -0,0 +1,63 @@
+"""
+RiskScoreCache generations, LRU eviction and cell-center scoring
+"""
+
+from risk_cache import RiskScoreCache, geohash_cell
+
+OLD = {'superfund': 'a1', 'air': 'b1', 'water': 'c1'}
+NEW = {'superfund': 'a2', 'air': 'b1', 'water': 'c1'}
+
+
+def fake_compute(calls):
+    """Scores cell centers with their coordinates, recording every call"""
+    def compute(centers, factors):
+        calls.append(len(centers))
+        return [{'composite_risk': factor, 'risk_factors': {'demographic': factor},
+                 'center': (center['latitude'], center['longitude'])}
+                for center, factor in zip(centers, factors)]
+    return compute
+
+
+def test_stale_snapshot_bypasses_without_invalidating():
+    calls = []
+    cache = RiskScoreCache(max_entries=100)
+    cache.set_layer_hashes(OLD)
+    cache.set_layer_hashes(NEW)
+    location = {'location': 'Central LA', 'latitude': 34.0522, 'longitude': -118.2437}
+
+    cache.score([location], [0.5], NEW, fake_compute(calls))
+    # A request that started before the reload still holds the old hashes
+    stale = cache.score([location], [0.5], OLD, fake_compute(calls))
+    fresh = cache.score([location], [0.5], NEW, fake_compute(calls))
+
+    assert calls == [1, 1]
+    assert stale == fresh
+    assert cache.stats['invalidations'] == 1
+    assert cache.stats['hits'] == 1
+    assert cache.stats['misses'] == 1
+    assert cache.stats['bypassed'] == 1
+    assert len(cache) == 1
+
+
+def test_cells_share_assessments_and_evict_lru():
+    calls = []
+    cache = RiskScoreCache(max_entries=2, precision=5)
+    cache.set_layer_hashes(OLD)
+    compute = fake_compute(calls)
+
+    cell, lat, lon = geohash_cell(34.0522, -118.2437, 5)
+    near = [{'latitude': 34.0522, 'longitude': -118.2437},
+            {'latitude': 34.0530, 'longitude': -118.2440}]
+    assert geohash_cell(34.0530, -118.2440, 5)[0] == cell
+    first, second = cache.score(near, [0.5, 0.5], OLD, compute)
+    assert calls == [1]
+    assert first['center'] == second['center'] == (lat, lon)
+    assert (second['latitude'], second['longitude']) == (34.0530, -118.2440)
+    assert second['location'] == 'Unknown'
+
+    cache.score([{'latitude': 37.7749, 'longitude': -122.4194}], [0.5], OLD, compute)
+    cache.score(near[:1], [0.5], OLD, compute)
+    cache.score([{'latitude': 32.7157, 'longitude': -117.1611}], [0.5], OLD, compute)
+    assert cache.stats['evictions'] == 1
+    cache.score(near[:1], [0.5], OLD, compute)
+    assert calls == [1, 1, 1]
@@ -0,0 +1,100 @@
+"""
+Scoring service HTTP API and hot reloads
+"""
+
+import json
+import os
+import shutil
+import threading
+from urllib.request import Request, urlopen
+
+import pytest
+
+from conftest import OUTPUTS_DIR
+from provenance import file_hash
+from scoring_service import LAYER_FILES, ScoringService, make_server
+
+LOS_ANGELES = {'latitude': 34.0522, 'longitude': -118.2437}
+
+
+def copy_layers(directory):
+    for stem in LAYER_FILES.values():
+        shutil.copy(os.path.join(OUTPUTS_DIR, f'{stem}.geojson'), directory)
+
+
+def replace_water(directory, keep):
+    """Atomically swap in a water layer holding its first keep features"""
+    path = os.path.join(directory, f"{LAYER_FILES['water']}.geojson")
+    with open(path) as f:
+        collection = json.load(f)
+    collection['features'] = collection['features'][:keep]
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(collection, f)
+    os.replace(f'{path}.tmp', path)
+    # Step the mtime past the filesystem's timestamp granularity
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    return path
+
+
+@pytest.fixture
+def server(tmp_path):
+    copy_layers(tmp_path)
+    service = ScoringService(str(tmp_path), reload_interval=0, cache_size=100)
+    service.start()
+    httpd = make_server(service, '127.0.0.1', 0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{httpd.server_address[1]}', service
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def call(url, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = Request(url, data=data, headers={'Content-Type': 'application/json'})
+    with urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def test_risk_batch_and_hot_reload(server, tmp_path):
+    base, service = server
+
+    single = call(f"{base}/risk?lat={LOS_ANGELES['latitude']}&lon={LOS_ANGELES['longitude']}")
+    batch = call(f'{base}/risk/batch', {'locations': [LOS_ANGELES, {'latitude': 37.7749,
+                                                                    'longitude': -122.4194}]})
+    assert len(batch['assessments']) == 2
+    assert batch['assessments'][0]['composite_risk'] == single['composite_risk']
+
+    path = replace_water(tmp_path, keep=1)
+    reload = call(f'{base}/reload', {})
+    assert reload == {'reloaded': True, 'version': 2, 'elapsed_ms': reload['elapsed_ms']}
+
+    health = call(f'{base}/health')
+    assert health['layers']['water']['features'] == 1
+    assert health['layers']['water']['content_hash'] == file_hash(path)
+    assert health['cache']['invalidations'] == 1
+    assert call(f'{base}/reload', {})['reloaded'] is False
+    assert len(call(f'{base}/risk/batch', {'locations': [LOS_ANGELES]})['assessments']) == 1
+
+
+def test_file_replaced_during_load_is_reloaded(tmp_path, monkeypatch):
+    copy_layers(tmp_path)
+    service = ScoringService(str(tmp_path), reload_interval=0)
+    warm = ScoringService._warm
+    replaced = []
+
+    def warm_then_replace(self, analyzer, layers):
+        warm(self, analyzer, layers)
+        if not replaced:
+            replaced.append(replace_water(tmp_path, keep=2))
+
+    monkeypatch.setattr(ScoringService, '_warm', warm_then_replace)
+    service.start()
+
+    snapshot = service.snapshot
+    assert len(snapshot.layers['water']) == 2
+    assert snapshot.hashes['water'] == file_hash(replaced[0])
+    assert service.reload() is False
@@ -0,0 +1,90 @@
+"""
+SpatialAnalyzer index and scan engines agree, and only owned layers are cached
+"""
+
+import os
+
+from conftest import OUTPUTS_DIR
+from spatial_analysis import SpatialAnalyzer
+
+WATER_PATH = os.path.join(OUTPUTS_DIR, 'california_water_quality.geojson')
+CENTER = {'latitude': 34.0522, 'longitude': -118.2437}
+
+
+def without_timestamps(records):
+    return [{key: value for key, value in record.items() if key != 'timestamp'}
+            for record in records]
+
+
+def test_index_and_scan_engines_agree():
+    index = SpatialAnalyzer(engine='index', index_threshold=1)
+    scan = SpatialAnalyzer(engine='scan')
+    layer = index.load_layer(WATER_PATH)
+
+    for targets in (layer, [dict(record) for record in layer]):
+        locations = [dict(record) for record in targets][::25] + [CENTER]
+        for location in locations:
+            assert (index.nearest_neighbor(location, targets)
+                    == scan.nearest_neighbor(location, targets))
+            for options in ({}, {'sort_by_distance': True}, {'max_results': 3}):
+                assert (index.buffer_analysis(location, 60, targets, **options)
+                        == scan.buffer_analysis(location, 60, targets, **options))
+
+        assert (without_timestamps(index.calculate_ej_risk_scores(
+                    locations, targets, targets, targets))
+                == without_timestamps(scan.calculate_ej_risk_scores(
+                    locations, targets, targets, targets)))
+
+
+def test_plain_lists_are_not_cached():
+    analyzer = SpatialAnalyzer(engine='index', index_threshold=1)
+    points = [{'latitude': 34.0 + i * 0.01, 'longitude': -118.0} for i in range(40)]
+    assert analyzer.nearest_neighbor(CENTER, points)[0] is points[5]
+
+    # Replacing a record the analyzer has already queried is seen next call
+    points[5] = {'latitude': 40.0, 'longitude': -100.0}
+    nearest, _ = analyzer.nearest_neighbor(CENTER, points)
+    assert nearest is points[6]
+
+    for _ in range(1000):
+        analyzer.nearest_neighbor(CENTER, list(points))
+        analyzer.buffer_analysis(CENTER, 10, list(points))
+    assert not analyzer._layer_cache
+
+    for _ in range(100):
+        analyzer.nearest_neighbor(CENTER, analyzer.load_layer(WATER_PATH))
+    assert len(analyzer._layer_cache) <= SpatialAnalyzer.LAYER_CACHE_ENTRIES
+
+
+def test_parallel_scoring_from_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    analyzer = SpatialAnalyzer(engine='index')
+    layer = analyzer.load_layer(WATER_PATH)
+    batches = [[dict(record) for record in layer][start::40] for start in range(4)]
+    expected = [without_timestamps(analyzer.calculate_ej_risk_scores(batch, layer, layer, layer))
+                for batch in batches]
+
+    # Concurrent callers each get their own shards back
+    with ThreadPoolExecutor(max_workers=len(batches)) as threads:
+        results = list(threads.map(
+            lambda batch: analyzer.calculate_ej_risk_scores(batch, layer, layer, layer,
+                                                            workers=2),
+            batches))
+    assert [without_timestamps(result) for result in results] == expected
+
+
+def test_query_results_are_plain_dicts():
+    import json
+
+    analyzer = SpatialAnalyzer(engine='index', index_threshold=1)
+    layer = analyzer.load_layer(WATER_PATH)
+
+    nearest, distance = analyzer.nearest_neighbor(CENTER, layer)
+    hits = analyzer.buffer_analysis(CENTER, 60, layer, sort_by_distance=True)
+    assert hits and type(nearest) is dict and all(type(hit) is dict for hit in hits)
+    assert json.loads(json.dumps(hits)) == hits
+    assert hits[0]['distance_km'] == distance
+
+    hits[0]['visited'] = True
+    assert 'visited' not in analyzer.buffer_analysis(CENTER, 60, layer, sort_by_distance=True)[0]